@@ -21,6 +21,14 @@ class ProductLineAttributeValueInline(admin.TabularInline):
     form = ProductLineAttributeValueForm
     formset = ProductLineAttributeValueFormSet
 
+    def get_queryset(self, request):
+        # loads the attribute value and the product line shown by the row title
+        return (
+            super()
+            .get_queryset(request)
+            .select_related('attribute_value__attribute_id', 'product_line__product_id')
+        )
+
 
 class EditButton(object):
     def edit(self, instance):
@@ -38,11 +46,24 @@ class EditButton(object):
     edit.short_description = "Edit"
 
 
+class BigTableAdmin(admin.ModelAdmin):
+    """
+    Changelist settings of tables with many rows: related names come from the
+    base query (list_select_related) and the page count is not computed over
+    the whole table.
+    """
+
+    list_per_page = 50
+    show_full_result_count = False
+
+
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ('name', 'is_active')
+    list_display = ('name', 'parent', 'is_active')
     list_editable = ('is_active',)
+    list_select_related = ('parent',)
     search_fields = ('name',)
     list_filter = ('is_active',)
+    autocomplete_fields = ('parent',)
 
 
 class ProductLineImageInline(admin.TabularInline):
@@ -53,7 +74,12 @@ class AttributeInline(admin.TabularInline):
     model = Attribute.product_type_attribute.through
 
 
-class ProductLineAdmin(admin.ModelAdmin):
+class ProductLineAdmin(BigTableAdmin):
+    list_display = ('sku', 'product_id', 'price', 'quantity', 'is_active')
+    list_select_related = ('product_id',)
+    list_filter = ('is_active',)
+    search_fields = ('sku', 'slug', 'product_id__name')
+    autocomplete_fields = ('product_id',)
     inlines = [
         ProductLineImageInline,
         ProductLineAttributeValueInline,
@@ -66,20 +92,45 @@ class ProductLineInline(EditButton, admin.TabularInline):
     readonly_fields = ['edit']
 
 
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(BigTableAdmin):
+    list_display = ('name', 'slug', 'category_id', 'product_type_id', 'is_active')
+    list_select_related = ('category_id', 'product_type_id')
+    list_filter = ('is_active', 'is_digital')
+    search_fields = ('name', 'slug', 'pid')
+    autocomplete_fields = ('category_id',)
     inlines = [
         ProductLineInline,
     ]
 
 
+class ProductImageAdmin(BigTableAdmin):
+    list_display = ('__str__', 'product_line_id', 'alternative_text')
+    # ProductLine.__str__ reads the product name
+    list_select_related = ('product_line_id__product_id',)
+    search_fields = ('product_line_id__sku', 'alternative_text')
+    autocomplete_fields = ('product_line_id',)
+
+
+class AttributeAdmin(admin.ModelAdmin):
+    search_fields = ('name',)
+
+
+class AttributeValueAdmin(BigTableAdmin):
+    list_display = ('value', 'attribute_id')
+    list_select_related = ('attribute_id',)
+    list_filter = ('attribute_id',)
+    search_fields = ('value', 'attribute_id__name')
+
+
 class ProductTypeAdmin(admin.ModelAdmin):
+    search_fields = ('type_name',)
     inlines = [AttributeInline]
 
 
 admin.site.register(Category, CategoryAdmin)
-admin.site.register(ProductImage)
+admin.site.register(ProductImage, ProductImageAdmin)
 admin.site.register(Product, ProductAdmin)
 admin.site.register(ProductLine, ProductLineAdmin)
-admin.site.register(AttributeValue)
-admin.site.register(Attribute)
+admin.site.register(AttributeValue, AttributeValueAdmin)
+admin.site.register(Attribute, AttributeAdmin)
 admin.site.register(ProductType, ProductTypeAdmin)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ProductConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "ecommerce.product"
+
+    def ready(self):
+        # register signal handlers which invalidate the response cache
+        from . import signals  # noqa: F401
@@ -0,0 +1,227 @@
+"""
+Async versions of the catalogue view sets, served natively under ASGI.
+
+urls.py registers them instead of the view sets of views.py when the
+CATALOGUE_ASYNC_VIEWS setting is on. The list and retrieve handlers are
+coroutines using the async ORM and cache API, the other actions are the
+synchronous ones of views.py, run in a thread by sync_to_async as Django
+does for synchronous views.
+
+The DRF serializers read relations loaded by prefetch_related(), which
+`aiterator()` does not support in Django 4.2, so the async handlers always
+serialize with the `.values()` based fast serializers, whose output is the
+same. Filtered product lists and lists served from product documents are
+left to the synchronous handler. The export streams async generators.
+"""
+
+from functools import update_wrapper
+from inspect import iscoroutinefunction
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from .cache import (
+    CATALOGUE_VERSION_KEY,
+    CATEGORY_LIST_VERSION_KEY,
+    aget_or_set_response_data,
+    category_version_key,
+    product_version_key,
+)
+from .conditional import (
+    acategory_list_validators,
+    aconditional_response,
+    aproduct_list_validators,
+    aproduct_validators,
+)
+from .fast_serializers import (
+    FastCategorySerializer,
+    FastProductLineSerializer,
+    FastProductSerializer,
+)
+from .filters import ProductFilter
+from .models import Product, ProductDocument
+from .streaming import (
+    EXPORT_CHUNK_SIZE,
+    aiter_serialized,
+    astream_json_array,
+    astream_ndjson,
+)
+from .views import CategoryViewSet, ProductLineViewSet, ProductViewSet
+
+
+class AsyncViewSetMixin:
+    """
+    Dispatch requests to coroutine handlers without leaving the event loop.
+    """
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+
+        # the view of DRF returns the coroutine of dispatch()
+        async def async_view(request, *args, **kwargs):
+            return await view(request, *args, **kwargs)
+
+        # cls, initkwargs, actions and csrf_exempt of the DRF view
+        return update_wrapper(async_view, view)
+
+    def perform_authentication(self, request):
+        # the catalogue is public, `request.user` is resolved lazily instead
+        # of loading the session with a synchronous query on every request
+        pass
+
+    async def dispatch(self, request, *args, **kwargs):
+        """
+        APIView.dispatch() awaiting the handler.
+        """
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            self.initial(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(
+                    self, request.method.lower(), self.http_method_not_allowed
+                )
+            else:
+                handler = self.http_method_not_allowed
+
+            if iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+class AsyncCategoryViewSet(AsyncViewSetMixin, CategoryViewSet):
+    async def list(self, request):
+        async def build():
+            paginator = self.pagination_class()
+            page = await paginator.apaginate_queryset(
+                FastCategorySerializer.get_rows(self.queryset.all()),
+                request,
+                view=self,
+            )
+            data = await FastCategorySerializer(page, many=True).adata()
+            return paginator.get_paginated_response(data).data
+
+        async def get_version_keys():
+            return [CATEGORY_LIST_VERSION_KEY]
+
+        async def respond():
+            return Response(
+                await aget_or_set_response_data(
+                    self.get_list_cache_key(request), build, get_version_keys
+                )
+            )
+
+        return await aconditional_response(
+            request, await acategory_list_validators(), respond
+        )
+
+
+class AsyncProductViewSet(AsyncViewSetMixin, ProductViewSet):
+    async def retrieve(self, request, slug=None):
+        async def build():
+            if settings.CATALOGUE_PRODUCT_DOCUMENTS:
+                document = (
+                    await ProductDocument.objects.filter(slug=slug, is_dirty=False)
+                    .values_list('data', flat=True)
+                    .afirst()
+                )
+                if document is not None:
+                    return [document]
+            rows = FastProductSerializer.get_rows(self.queryset.filter(slug=slug))
+            return await FastProductSerializer(rows, many=True).adata()
+
+        async def get_version_keys():
+            product = (
+                await Product.active.filter(slug=slug)
+                .values_list('id', 'category_id')
+                .afirst()
+            )
+            if product is None:
+                return None
+            product_id, category_id = product
+            return [
+                CATALOGUE_VERSION_KEY,
+                product_version_key(product_id),
+                category_version_key(category_id),
+            ]
+
+        async def respond():
+            return Response(
+                await aget_or_set_response_data(
+                    f'product:{slug}', build, get_version_keys
+                )
+            )
+
+        return await aconditional_response(
+            request, await aproduct_validators(slug), respond
+        )
+
+    async def list(self, request):
+        if settings.CATALOGUE_PRODUCT_DOCUMENTS or any(
+            param in request.query_params for param in ProductFilter.params
+        ):
+            return await sync_to_async(super().list)(request)
+
+        async def respond():
+            paginator = self.pagination_class()
+            page = await paginator.apaginate_queryset(
+                FastProductSerializer.get_rows(self.queryset.all()),
+                request,
+                view=self,
+            )
+            data = await FastProductSerializer(page, many=True).adata()
+            return paginator.get_paginated_response(data)
+
+        return await aconditional_response(
+            request, await aproduct_list_validators(), respond
+        )
+
+    @action(detail=False, methods=['get'])
+    async def export(self, request):
+        # an iterator of the sync view would be collected in a thread by
+        # StreamingHttpResponse under ASGI, the async generators are streamed
+        output = self.get_export_output(request)
+        products = aiter_serialized(
+            FastProductSerializer.get_rows(self.queryset.order_by('pk')),
+            FastProductSerializer,
+            EXPORT_CHUNK_SIZE,
+        )
+        if output == 'ndjson':
+            return StreamingHttpResponse(
+                astream_ndjson(products), content_type='application/x-ndjson'
+            )
+        return StreamingHttpResponse(
+            astream_json_array(products), content_type='application/json'
+        )
+
+
+class AsyncProductLineViewSet(AsyncViewSetMixin, ProductLineViewSet):
+    async def list(self, request):
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(
+            FastProductLineSerializer.get_rows(self.queryset.all()),
+            request,
+            view=self,
+        )
+        data = await FastProductLineSerializer(page, many=True).adata()
+        return paginator.get_paginated_response(data)
+
+    async def retrieve(self, request, pk=None):
+        rows = FastProductLineSerializer.get_rows(self.queryset.filter(pk=pk))
+        return Response(await FastProductLineSerializer(rows, many=True).adata())
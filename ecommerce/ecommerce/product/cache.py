@@ -0,0 +1,151 @@
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .routers import get_replica_database
+
+
+# bumped on changes of attributes and product types which are shared by many products
+CATALOGUE_VERSION_KEY = 'version:catalogue'
+CATEGORY_LIST_VERSION_KEY = 'version:category-list'
+# bumped on any change of the category tree
+CATEGORY_TREE_VERSION_KEY = 'version:category-tree'
+
+
+def product_version_key(product_id) -> str:
+    """Version of a product together with its lines, images and attributes."""
+    return f'version:product:{product_id}'
+
+
+def category_version_key(category_id) -> str:
+    """Version of the category row itself (name, slug, position in the tree)."""
+    return f'version:category:{category_id}'
+
+
+def category_products_version_key(category_id) -> str:
+    """Version of the set of products in a category and of their content."""
+    return f'version:category-products:{category_id}'
+
+
+def category_subtree_version_key(category_id) -> str:
+    """Version of the products of a category and all its descendants."""
+    return f'version:category-subtree:{category_id}'
+
+
+def get_versions(version_keys: list) -> dict:
+    """
+    Return current values of the version keys.
+
+    Missing keys (never bumped or evicted) are initialized with a new value,
+    so a response cached against them is never mistaken for a valid one.
+    """
+    versions = cache.get_many(version_keys)
+    missing_keys = [key for key in version_keys if key not in versions]
+    if missing_keys:
+        for key in missing_keys:
+            # add() keeps the value of a concurrent bump
+            cache.add(key, uuid4().hex, timeout=None)
+        versions.update(cache.get_many(missing_keys))
+    return versions
+
+
+def bump_versions(version_keys) -> None:
+    """
+    Invalidate every cached response which depends on the version keys.
+
+    Versions are bumped immediately and once more after the transaction
+    commits: a response built from the old rows while the transaction
+    was still open is not served after the commit.
+    """
+    version_keys = list(version_keys)
+    if not version_keys:
+        return
+
+    def bump():
+        cache.set_many({key: uuid4().hex for key in version_keys}, timeout=None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def get_response_timeout():
+    timeout = getattr(settings, 'CATALOGUE_CACHE_TIMEOUT', 60 * 15)
+    if get_replica_database():
+        # a replica lagging behind a write may return rows older than the
+        # bumped versions, such a response is kept only for the lag window
+        timeout = min(timeout, settings.CATALOGUE_REPLICA_PIN_SECONDS)
+    return timeout
+
+
+def get_or_set_response_data(cache_key: str, build, get_version_keys):
+    """
+    Return response data from the cache or build and cache it.
+
+    Args:
+        cache_key (str): Key of the cached response data.
+        build (callable): Builds the response data from the database.
+        get_version_keys (callable): Returns the version keys the response
+            depends on, or None when the response must not be cached.
+
+    The versions are read before the data is built, so a concurrent write
+    always leaves the cached entry outdated rather than stale.
+    """
+    entry = cache.get(cache_key)
+    if entry is not None:
+        data, versions = entry
+        if cache.get_many(list(versions)) == versions:
+            return data
+
+    version_keys = get_version_keys()
+    if version_keys is None:
+        return build()
+
+    versions = get_versions(version_keys)
+    data = build()
+    cache.set(
+        cache_key,
+        (data, versions),
+        timeout=get_response_timeout(),
+    )
+    return data
+
+
+# async views, see product/async_views.py
+
+
+async def aget_versions(version_keys: list) -> dict:
+    """get_versions() with the async cache API."""
+    versions = await cache.aget_many(version_keys)
+    missing_keys = [key for key in version_keys if key not in versions]
+    if missing_keys:
+        for key in missing_keys:
+            await cache.aadd(key, uuid4().hex, timeout=None)
+        versions.update(await cache.aget_many(missing_keys))
+    return versions
+
+
+async def aget_or_set_response_data(cache_key: str, build, get_version_keys):
+    """
+    get_or_set_response_data() with the async cache API, `build` and
+    `get_version_keys` are coroutine functions.
+    """
+    entry = await cache.aget(cache_key)
+    if entry is not None:
+        data, versions = entry
+        if await cache.aget_many(list(versions)) == versions:
+            return data
+
+    version_keys = await get_version_keys()
+    if version_keys is None:
+        return await build()
+
+    versions = await aget_versions(version_keys)
+    data = await build()
+    await cache.aset(
+        cache_key,
+        (data, versions),
+        timeout=get_response_timeout(),
+    )
+    return data
@@ -0,0 +1,120 @@
+"""
+Conditional GET (ETag / Last-Modified) for the catalogue endpoints.
+
+The validators are computed with one aggregate query over the updated_at
+columns, an unchanged resource is answered with 304 before serializing.
+"""
+
+from hashlib import md5
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+from .models import Category, Product
+
+
+def conditional_response(request, validators, respond):
+    """
+    Return 304 if the request validators match, else the response of `respond()`.
+
+    `validators` is a (last_modified, *parts) tuple or None for a missing
+    resource; the ETag is derived from all parts, the negotiated format and
+    the requested url.
+    """
+    if validators is None:
+        return respond()
+
+    etag, last_modified = get_etag_and_last_modified(request, validators)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = respond()
+        if response.status_code != 200:
+            return response
+    return set_validator_headers(response, etag, last_modified)
+
+
+async def aconditional_response(request, validators, respond):
+    """conditional_response() of async views, `respond` is a coroutine function."""
+    if validators is None:
+        return await respond()
+
+    etag, last_modified = get_etag_and_last_modified(request, validators)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = await respond()
+        if response.status_code != 200:
+            return response
+    return set_validator_headers(response, etag, last_modified)
+
+
+def get_etag_and_last_modified(request, validators):
+    last_modified = max(
+        (value for value in validators if hasattr(value, 'timestamp')),
+        default=None,
+    )
+    etag = quote_etag(
+        md5(
+            repr(
+                (
+                    validators,
+                    request.accepted_renderer.format,
+                    request.get_full_path(),
+                )
+            ).encode()
+        ).hexdigest()
+    )
+    return etag, (int(last_modified.timestamp()) if last_modified is not None else None)
+
+
+def set_validator_headers(response, etag, last_modified):
+    response.headers.setdefault('ETag', etag)
+    if last_modified is not None:
+        response.headers.setdefault('Last-Modified', http_date(last_modified))
+    return response
+
+
+def product_validators(slug):
+    # a product also changes with its category name and slug
+    return (
+        Product.active.filter(slug=slug)
+        .values_list('updated_at', 'category_id__updated_at')
+        .first()
+    )
+
+
+def product_list_validators():
+    # the count changes when a product is deleted
+    return tuple(
+        Product.active.aggregate(
+            Max('updated_at'), Max('category_id__updated_at'), Count('pk')
+        ).values()
+    )
+
+
+def category_list_validators():
+    return tuple(Category.active.aggregate(Max('updated_at'), Count('pk')).values())
+
+
+async def aproduct_validators(slug):
+    return (
+        await Product.active.filter(slug=slug)
+        .values_list('updated_at', 'category_id__updated_at')
+        .afirst()
+    )
+
+
+async def aproduct_list_validators():
+    return tuple(
+        (
+            await Product.active.aaggregate(
+                Max('updated_at'), Max('category_id__updated_at'), Count('pk')
+            )
+        ).values()
+    )
+
+
+async def acategory_list_validators():
+    return tuple(
+        (await Category.active.aaggregate(Max('updated_at'), Count('pk'))).values()
+    )
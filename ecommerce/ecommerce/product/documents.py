@@ -0,0 +1,95 @@
+"""
+Maintenance and lookup of ProductDocument rows.
+"""
+
+from django.db import transaction
+from django.db.models import F
+
+from .fast_serializers import FastProductSerializer
+from .models import Product, ProductDocument
+
+REBUILD_BATCH_SIZE = 500
+
+
+def mark_documents_dirty(product_ids):
+    """
+    Mark the documents of the products dirty, `product_ids` may be a queryset.
+    """
+    return ProductDocument.objects.filter(product_id__in=product_ids).update(
+        is_dirty=True, version=F('version') + 1
+    )
+
+
+def build_documents(queryset):
+    """
+    Serialize the active products of a queryset, return {product_id: (slug, data)}.
+    """
+    rows = list(FastProductSerializer.get_rows(queryset.filter(is_active=True)))
+    data = FastProductSerializer(rows, many=True).data
+    return {row['id']: (row['slug'], item) for row, item in zip(rows, data)}
+
+
+def get_documents(product_ids):
+    """
+    Return the data of the products in the given order.
+
+    Clean documents are read in one query, the products without a clean
+    document are serialized on the fly.
+    """
+    documents = dict(
+        ProductDocument.objects.filter(
+            product_id__in=product_ids, is_dirty=False
+        ).values_list('product_id', 'data')
+    )
+    missing = [pk for pk in product_ids if pk not in documents]
+    if missing:
+        for pk, (_, data) in build_documents(
+            Product.objects.filter(pk__in=missing)
+        ).items():
+            documents[pk] = data
+    return [documents[pk] for pk in product_ids if pk in documents]
+
+
+def rebuild_documents(batch_size=REBUILD_BATCH_SIZE):
+    """
+    Create the documents of active products which have none and rebuild all
+    dirty documents. Documents of inactive products are deleted.
+
+    Returns a (rebuilt, deleted) tuple.
+    """
+    ProductDocument.objects.bulk_create(
+        [
+            ProductDocument(product_id=pk)
+            for pk in Product.active.filter(document__isnull=True).values_list(
+                'pk', flat=True
+            )
+        ],
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+
+    rebuilt = deleted = 0
+    last_pk = 0
+    while True:
+        versions = dict(
+            ProductDocument.objects.filter(is_dirty=True, product_id__gt=last_pk)
+            .order_by('product_id')
+            .values_list('product_id', 'version')[:batch_size]
+        )
+        if not versions:
+            break
+        last_pk = max(versions)
+
+        documents = build_documents(Product.objects.filter(pk__in=versions))
+        with transaction.atomic():
+            for pk, version in versions.items():
+                # skipped if marked dirty again, the next run picks it up
+                document = ProductDocument.objects.filter(
+                    product_id=pk, version=version
+                )
+                if pk in documents:
+                    slug, data = documents[pk]
+                    rebuilt += document.update(slug=slug, data=data, is_dirty=False)
+                else:
+                    deleted += document.delete()[0]
+    return rebuilt, deleted
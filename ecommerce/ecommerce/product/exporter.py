@@ -0,0 +1,105 @@
+"""
+Incremental export of the catalogue for downstream feeds.
+
+`manage.py export_catalogue` writes the products changed after a watermark
+as gzipped NDJSON, one product per line in the format of the product
+endpoint. A changed product which is no longer active is written as
+{"slug": ..., "is_active": false}, so a feed can drop it. Deleted products
+leave no row behind and are not exported.
+
+A product has changed when its own row, its category, one of its lines,
+images or attribute values, or the attributes of its product type have a
+newer updated_at. product/signals.py moves Product.updated_at on most of
+these changes, the timestamps of the related rows also cover writes which
+send no signals, like bulk_create().
+"""
+
+import gzip
+import os
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .documents import get_documents
+from .models import (
+    Product,
+    ProductAttributeValue,
+    ProductImage,
+    ProductLine,
+    ProductLineAttributeValue,
+)
+from .streaming import stream_ndjson
+
+EXPORT_BATCH_SIZE = 500
+# a transaction still open when an export starts commits rows with an older
+# updated_at, the next export starts this much before the start of the last
+EXPORT_OVERLAP = timedelta(minutes=1)
+
+
+def get_changed_product_ids(since=None):
+    """
+    Return the sorted ids of the products changed after `since`, of all the
+    active products without it.
+    """
+    if since is None:
+        return list(Product.active.order_by('pk').values_list('pk', flat=True))
+
+    querysets = [
+        Product.objects.filter(updated_at__gt=since).values_list('pk'),
+        Product.objects.filter(category_id__updated_at__gt=since).values_list('pk'),
+        Product.objects.filter(
+            product_type_id__product_type_attribute_pt__updated_at__gt=since
+        ).values_list('pk'),
+        ProductAttributeValue.objects.filter(updated_at__gt=since).values_list(
+            'product_id'
+        ),
+        ProductLine.objects.filter(updated_at__gt=since).values_list('product_id'),
+        ProductImage.objects.filter(updated_at__gt=since).values_list(
+            'product_line_id__product_id'
+        ),
+        ProductLineAttributeValue.objects.filter(updated_at__gt=since).values_list(
+            'product_line__product_id'
+        ),
+    ]
+    # UNION removes the duplicates
+    return sorted(pk for pk, in querysets[0].union(*querysets[1:]))
+
+
+def iter_products(product_ids, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield the data of the active products, then the markers of the inactive
+    ones, for each batch of ids.
+
+    Clean product documents are read as they are, the other products are
+    serialized, one batch of ids at a time.
+    """
+    for start in range(0, len(product_ids), batch_size):
+        batch = product_ids[start : start + batch_size]
+        yield from get_documents(batch)
+        for slug in Product.objects.filter(pk__in=batch, is_active=False).values_list(
+            'slug', flat=True
+        ):
+            yield {'slug': slug, 'is_active': False}
+
+
+def export_catalogue(path, since=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Write the products changed after `since` to a gzipped NDJSON file.
+
+    The file is written under a temporary name and renamed when complete.
+
+    Returns:
+        tuple: The number of exported products and the watermark of the
+            next export.
+    """
+    watermark = timezone.now() - EXPORT_OVERLAP
+    product_ids = get_changed_product_ids(since)
+
+    count = 0
+    temporary = f'{path}.tmp'
+    with gzip.open(temporary, 'wb') as file:
+        for line in stream_ndjson(iter_products(product_ids, batch_size)):
+            file.write(line)
+            count += 1
+    os.replace(temporary, path)
+    return count, watermark
@@ -0,0 +1,232 @@
+"""
+Read-only serializers building the catalogue JSON from `.values()` rows.
+
+They return exactly the data of CategorySerializer, ProductSerializer and
+ProductLineSerializer, but build it with plain dicts instead of the DRF field
+machinery and load the related rows with one `.values()` query per relation.
+Endpoints listed in the CATALOGUE_FAST_SERIALIZERS setting use them.
+
+Usage mirrors the DRF serializers:
+
+    rows = FastProductSerializer.get_rows(Product.active.all())
+    data = FastProductSerializer(rows, many=True).data
+
+Async views await `adata()` instead, which loads the same rows with the
+async ORM.
+"""
+
+from collections import defaultdict
+
+from django.db.models import QuerySet
+
+from .models import Attribute, AttributeValue, ProductImage, ProductLine
+from .serializers import ProductLineSerializer
+
+# DecimalField of ProductLineSerializer, keeps the decimal formatting identical
+price_to_representation = ProductLineSerializer().fields['price'].to_representation
+image_storage = ProductImage._meta.get_field('url').storage
+
+
+class FastSerializer:
+    # fields loaded by get_rows(); 'id' and 'created_at' are needed by
+    # CatalogueCursorPagination and the related rows, they are not serialized
+    values = ()
+
+    def __init__(self, instance, many=False):
+        self.instance = instance
+        self.many = many
+
+    @classmethod
+    def get_rows(cls, queryset):
+        """Turn a queryset into the `.values()` rows the serializer expects."""
+        return queryset.prefetch_related(None).values(*cls.values)
+
+    def get_related(self, rows):
+        """Return {name: `.values_list()` queryset} of the related rows."""
+        return {}
+
+    def load(self, rows):
+        """Load the related rows, passed to to_representation() as `related`."""
+        return {
+            name: list(queryset) for name, queryset in self.get_related(rows).items()
+        }
+
+    async def aload(self, rows):
+        """load() with the async ORM."""
+        # not aiterator(), which runs `.values_list()` queries in the event
+        # loop thread in Django 4.2
+        return {
+            name: [row async for row in queryset]
+            for name, queryset in self.get_related(rows).items()
+        }
+
+    def to_representation(self, rows, related):
+        raise NotImplementedError
+
+    @property
+    def data(self):
+        rows = list(self.instance) if self.many else [self.instance]
+        data = self.to_representation(rows, self.load(rows))
+        return data if self.many else data[0]
+
+    async def adata(self):
+        """`data` of async views, all rows are loaded with the async ORM."""
+        if not self.many:
+            rows = [self.instance]
+        elif isinstance(self.instance, QuerySet):
+            rows = [row async for row in self.instance]
+        else:
+            rows = list(self.instance)
+        data = self.to_representation(rows, await self.aload(rows))
+        return data if self.many else data[0]
+
+
+class FastCategorySerializer(FastSerializer):
+    values = ('id', 'created_at', 'name', 'slug')
+
+    def to_representation(self, rows, related):
+        return [{'category_name': row['name'], 'slug': row['slug']} for row in rows]
+
+
+class FastProductLineSerializer(FastSerializer):
+    values = (
+        'id',
+        'created_at',
+        'product_id',
+        'price',
+        'slug',
+        'second_name',
+        'second_description',
+        'quantity',
+        'sku',
+        'display_order',
+        'is_active',
+    )
+
+    def get_related(self, rows):
+        product_line_ids = [row['id'] for row in rows]
+        return {
+            'attributes': AttributeValue.objects.filter(
+                product_line_attribute_value__in=product_line_ids
+            ).values_list('product_line_attribute_value', 'attribute_id', 'value'),
+            'images': ProductImage.objects.filter(
+                product_line_id__in=product_line_ids
+            ).values_list(
+                'product_line_id', 'alternative_text', 'url', 'display_order'
+            ),
+        }
+
+    def to_representation(self, rows, related):
+        attributes = defaultdict(list)
+        for product_line_id, attribute_id, value in related['attributes']:
+            attributes[product_line_id].append((attribute_id, value))
+
+        images = defaultdict(list)
+        for product_line_id, alternative_text, url, display_order in related['images']:
+            images[product_line_id].append(
+                {
+                    'alternative_text': alternative_text,
+                    'url': image_storage.url(url) if url else None,
+                    'display_order': display_order,
+                }
+            )
+
+        data = []
+        for row in rows:
+            item = {
+                'price': price_to_representation(row['price']),
+                'slug': row['slug'],
+            }
+            # empty values are removed as by utils.remove_empty_fields
+            if row['second_name']:
+                item['second_name'] = row['second_name']
+            if row['second_description']:
+                item['second_description'] = row['second_description']
+            item['quantity'] = row['quantity']
+            item['sku'] = row['sku']
+
+            if attributes[row['id']]:
+                flatten_attributes = {}
+                for attribute_id, value in attributes[row['id']]:
+                    if attribute_id in flatten_attributes:
+                        raise ValueError(
+                            f"Attribute with name \"{attribute_id}\" already exists"
+                        )
+                    flatten_attributes[attribute_id] = value
+                item['attributes'] = flatten_attributes
+
+            item['display_order'] = row['display_order']
+            item['is_active'] = row['is_active']
+            item['product_image'] = images[row['id']]
+            data.append(item)
+        return data
+
+
+class FastProductSerializer(FastSerializer):
+    values = (
+        'id',
+        'created_at',
+        'name',
+        'slug',
+        'description',
+        'product_type_id',
+        'category_id__name',
+        'category_id__slug',
+    )
+
+    def get_line_rows(self, rows):
+        return FastProductLineSerializer.get_rows(
+            ProductLine.active.filter(product_id__in=[row['id'] for row in rows])
+        )
+
+    def get_related(self, rows):
+        return {
+            'attributes': Attribute.objects.filter(
+                product_type_attribute__in={row['product_type_id'] for row in rows}
+            ).values_list('product_type_attribute', 'id', 'name'),
+        }
+
+    def load(self, rows):
+        # the lines come serialized, with their own related rows
+        related = super().load(rows)
+        line_rows = list(self.get_line_rows(rows))
+        related['product_lines'] = zip(
+            line_rows, FastProductLineSerializer(line_rows, many=True).data
+        )
+        return related
+
+    async def aload(self, rows):
+        related = await super().aload(rows)
+        line_rows = [row async for row in self.get_line_rows(rows)]
+        related['product_lines'] = zip(
+            line_rows, await FastProductLineSerializer(line_rows, many=True).adata()
+        )
+        return related
+
+    def to_representation(self, rows, related):
+        product_lines = defaultdict(list)
+        for line_row, item in related['product_lines']:
+            product_lines[line_row['product_id']].append(item)
+
+        product_attributes = defaultdict(dict)
+        for product_type_id, attribute_id, name in related['attributes']:
+            product_attributes[product_type_id][attribute_id] = name
+
+        data = []
+        for row in rows:
+            item = {
+                'name': row['name'],
+                'slug': row['slug'],
+                'description': row['description'],
+            }
+            # DRF skips the dotted source fields of a product without category
+            if row['category_id__slug'] is not None:
+                item['category_name'] = row['category_id__name']
+                item['category_slug'] = row['category_id__slug']
+            item['product_line'] = product_lines[row['id']]
+            # an empty list, as ProductSerializer leaves it unflattened
+            item['product_attributes'] = (
+                product_attributes[row['product_type_id']] or []
+            )
+            data.append(item)
+        return data
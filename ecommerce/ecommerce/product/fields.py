@@ -1,16 +1,37 @@
-from django.db import models
+from django.db import connections, models, router
 from django.core import checks
-from django.db.models import Max
 from django.core.exceptions import ValidationError
 
 
 class OrderingField(models.PositiveIntegerField):
     description = 'Ordering model instances in scope of related FK attribute'
+    # number of scopes per statement of allocate_many()
+    ALLOCATE_BATCH_SIZE = 500
 
     def __init__(self, unique_for_field=None, *args, **kwargs):
         self.unique_for_field = unique_for_field
         super().__init__(*args, **kwargs)
 
+    def contribute_to_class(self, cls, name, **kwargs):
+        super().contribute_to_class(cls, name, **kwargs)
+        if not cls._meta.abstract:
+            models.signals.post_init.connect(self._remember_value, sender=cls)
+
+    def _get_position(self, instance):
+        scope_attname = instance._meta.get_field(self.unique_for_field).attname
+        return (
+            instance.__dict__.get(scope_attname),
+            instance.__dict__.get(self.attname),
+        )
+
+    def _remember_value(self, instance, **kwargs):
+        # the scope and order the row was loaded or last saved with, an
+        # unchanged order of an existing row is neither checked nor allocated
+        # again
+        instance.__dict__[f'_ordering_saved_{self.attname}'] = self._get_position(
+            instance
+        )
+
     def check(self, **kwargs):
         return [
             *super().check(**kwargs),
@@ -31,24 +52,158 @@ class OrderingField(models.PositiveIntegerField):
 
         return []
 
+    def _allocate(self, model_instance, scope_id, value=None):
+        """
+        Allocate the next order number in scope of the related object.
+
+        The last number of each scope is kept in the OrderingCounter table
+        and incremented with a single INSERT ... ON CONFLICT DO UPDATE statement,
+        which the database executes atomically. Concurrent inserts for the same
+        scope therefore never get the same number. A new counter starts from
+        the current maximum of the scope.
+
+        If `value` is given, the counter is only raised to it, so the numbers
+        allocated later follow the manually set order.
+        """
+        # avoid circular import, models.py imports this module
+        from .models import OrderingCounter
+
+        model = model_instance.__class__
+        connection = connections[router.db_for_write(model, instance=model_instance)]
+        qn = connection.ops.quote_name
+        counter_table = qn(OrderingCounter._meta.db_table)
+        greatest = 'MAX' if connection.vendor == 'sqlite' else 'GREATEST'
+        current_max = (
+            f'SELECT COALESCE(MAX({qn(self.column)}), 0) '
+            f'FROM {qn(model._meta.db_table)} '
+            f'WHERE {qn(model._meta.get_field(self.unique_for_field).column)} = %s'
+        )
+
+        if value is None:
+            initial = f'({current_max}) + 1'
+            updated = f'{counter_table}.value + 1'
+            params = []
+        else:
+            initial = f'{greatest}(({current_max}), %s)'
+            updated = f'{greatest}({counter_table}.value, %s)'
+            params = [value]
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {counter_table} (model, scope_id, value) '
+                f'VALUES (%s, %s, {initial}) '
+                f'ON CONFLICT (model, scope_id) '
+                f'DO UPDATE SET value = {updated} '
+                f'RETURNING value',
+                [model._meta.label_lower, scope_id, scope_id, *params, *params],
+            )
+            return cursor.fetchone()[0]
+
+    def allocate_many(self, model, using, scope_counts, scope_max_values=None):
+        """
+        Allocate order numbers for many new rows of many scopes at once.
+
+        Args:
+            model: Model class the field belongs to.
+            using (str): Database alias.
+            scope_counts (dict): Number of rows to allocate per scope id.
+            scope_max_values (dict): Highest manually set order per scope id,
+                the counters are raised to it first.
+
+        Returns:
+            dict: The first allocated number per scope id, the rows of a scope
+                take the following numbers consecutively.
+
+        Every counter is created or raised with a single statement for all the
+        scopes and then incremented by the row count with a second one.
+        """
+        # avoid circular import, models.py imports this module
+        from .models import OrderingCounter
+
+        scope_max_values = scope_max_values or {}
+        label = model._meta.label_lower
+        connection = connections[using]
+        qn = connection.ops.quote_name
+        counter_table = qn(OrderingCounter._meta.db_table)
+        greatest = 'MAX' if connection.vendor == 'sqlite' else 'GREATEST'
+        current_max = (
+            f'SELECT COALESCE(MAX({qn(self.column)}), 0) '
+            f'FROM {qn(model._meta.db_table)} '
+            f'WHERE {qn(model._meta.get_field(self.unique_for_field).column)} = %s'
+        )
+        scope_ids = list(scope_counts.keys() | scope_max_values.keys())
+        first_numbers = {}
+
+        with connection.cursor() as cursor:
+            for start in range(0, len(scope_ids), self.ALLOCATE_BATCH_SIZE):
+                batch = scope_ids[start : start + self.ALLOCATE_BATCH_SIZE]
+                cursor.execute(
+                    f'INSERT INTO {counter_table} (model, scope_id, value) VALUES '
+                    + ', '.join(
+                        [f'(%s, %s, {greatest}(({current_max}), %s))'] * len(batch)
+                    )
+                    + ' ON CONFLICT (model, scope_id) DO UPDATE SET value = '
+                    f'{greatest}({counter_table}.value, excluded.value)',
+                    [
+                        param
+                        for scope_id in batch
+                        for param in (
+                            label,
+                            scope_id,
+                            scope_id,
+                            scope_max_values.get(scope_id, 0),
+                        )
+                    ],
+                )
+
+            scope_ids = [pk for pk in scope_ids if scope_counts.get(pk)]
+            for start in range(0, len(scope_ids), self.ALLOCATE_BATCH_SIZE):
+                batch = scope_ids[start : start + self.ALLOCATE_BATCH_SIZE]
+                cursor.execute(
+                    f'INSERT INTO {counter_table} (model, scope_id, value) VALUES '
+                    + ', '.join(['(%s, %s, %s)'] * len(batch))
+                    + ' ON CONFLICT (model, scope_id) DO UPDATE SET value = '
+                    f'{counter_table}.value + excluded.value '
+                    'RETURNING scope_id, value',
+                    [
+                        param
+                        for scope_id in batch
+                        for param in (label, scope_id, scope_counts[scope_id])
+                    ],
+                )
+                for scope_id, value in cursor.fetchall():
+                    first_numbers[scope_id] = value - scope_counts[scope_id] + 1
+
+        return first_numbers
+
     def pre_save(self, model_instance, add):
+        if getattr(model_instance, '_ordering_allocated', False):
+            # the order was allocated by OrderingQuerySet.bulk_create_ordered()
+            return super().pre_save(model_instance, add)
+
+        value = getattr(model_instance, self.attname)
+        if (
+            not add
+            and value is not None
+            and self._get_position(model_instance)
+            == model_instance.__dict__.get(f'_ordering_saved_{self.attname}')
+        ):
+            # e.g. a price edit, the counter row is not locked
+            return super().pre_save(model_instance, add)
+
         related_field = getattr(model_instance, self.unique_for_field)
         # queryset = ProductLine.objects.filter(product_id=product)
         queryset = model_instance.__class__.objects.filter(
             **{self.unique_for_field: related_field}
         )
-        value = getattr(model_instance, self.attname)
 
         if value is None:
-            max_order_number = queryset.aggregate(Max(self.attname)).get(
-                f'{self.attname}__max'
+            setattr(
+                model_instance,
+                self.attname,
+                self._allocate(model_instance, related_field.pk),
             )
 
-            if max_order_number is None:
-                max_order_number = 0
-
-            setattr(model_instance, self.attname, max_order_number + 1)
-
         else:
             # logic of checking uniqueness
             _pk_field = model_instance._meta.pk.name
@@ -63,4 +218,6 @@ class OrderingField(models.PositiveIntegerField):
                         self.attname: f'The display order "{value}" is already in use. Please choose a different value.'
                     }
                 )
+            self._allocate(model_instance, related_field.pk, value)
+        self._remember_value(model_instance)
         return super().pre_save(model_instance, add)
@@ -0,0 +1,171 @@
+"""
+Filtering of the product list by attribute values, price and is_digital,
+with product counts per attribute value (facets).
+
+    /api/product/?attribute_value=3,7&attribute_value=12&price_min=10&is_digital=false
+
+Values of the same attribute are OR-ed and different attributes are AND-ed.
+A product matches if one of its active lines has the attribute values and
+a price within the range, so colour=red AND size=M selects products sold
+as a red M line.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Count, Exists, OuterRef
+from rest_framework import serializers
+
+from .models import AttributeValue, ProductLine, ProductLineAttributeValue
+
+
+class ProductFilterSerializer(serializers.Serializer):
+    attribute_value = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False
+    )
+    # the digits of ProductLine.price
+    price_min = serializers.DecimalField(
+        max_digits=7, decimal_places=2, min_value=Decimal('0'), required=False
+    )
+    price_max = serializers.DecimalField(
+        max_digits=7, decimal_places=2, min_value=Decimal('0'), required=False
+    )
+    is_digital = serializers.BooleanField(required=False)
+    facets = serializers.BooleanField(required=False)
+
+    def validate_attribute_value(self, value):
+        # {attribute_id: {attribute_value_id, ...}}
+        attribute_values = defaultdict(set)
+        for pk, attribute_id in AttributeValue.objects.filter(pk__in=value).values_list(
+            'pk', 'attribute_id'
+        ):
+            attribute_values[attribute_id].add(pk)
+        unknown = set(value).difference(*attribute_values.values())
+        if unknown:
+            raise serializers.ValidationError(
+                f'Unknown attribute values: {", ".join(map(str, sorted(unknown)))}'
+            )
+        return dict(attribute_values)
+
+    def validate(self, data):
+        price_min, price_max = data.get('price_min'), data.get('price_max')
+        if price_min is not None and price_max is not None and price_min > price_max:
+            raise serializers.ValidationError(
+                {'price_max': 'Must be greater than or equal to price_min.'}
+            )
+        return data
+
+
+class ProductFilter:
+    params = ('attribute_value', 'price_min', 'price_max', 'is_digital', 'facets')
+
+    def __init__(self, query_params):
+        data = {}
+        for param in self.params:
+            if param == 'attribute_value':
+                # repeated and comma separated values
+                values = [
+                    value
+                    for item in query_params.getlist(param)
+                    for value in item.split(',')
+                    if value
+                ]
+                if values:
+                    data[param] = values
+            elif param in query_params:
+                data[param] = query_params[param]
+
+        serializer = ProductFilterSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        self.attribute_values = serializer.validated_data.get('attribute_value', {})
+        self.price_min = serializer.validated_data.get('price_min')
+        self.price_max = serializer.validated_data.get('price_max')
+        self.is_digital = serializer.validated_data.get('is_digital')
+        # facets are returned for filtered lists or on request
+        self.with_facets = serializer.validated_data.get('facets', bool(data))
+
+    def filter_lines(self, exclude_attribute=None):
+        """
+        Active lines matching the filters, optionally ignoring the selected
+        values of one attribute.
+        """
+        lines = ProductLine.active.all()
+        for attribute_id, value_ids in self.attribute_values.items():
+            if attribute_id != exclude_attribute:
+                lines = lines.filter(
+                    Exists(
+                        ProductLineAttributeValue.objects.filter(
+                            product_line=OuterRef('pk'), attribute_value__in=value_ids
+                        )
+                    )
+                )
+        if self.price_min is not None:
+            lines = lines.filter(price__gte=self.price_min)
+        if self.price_max is not None:
+            lines = lines.filter(price__lte=self.price_max)
+        return lines
+
+    def filter_queryset(self, queryset):
+        if self.is_digital is not None:
+            queryset = queryset.filter(is_digital=self.is_digital)
+        if (
+            self.attribute_values
+            or self.price_min is not None
+            or self.price_max is not None
+        ):
+            queryset = queryset.filter(
+                Exists(self.filter_lines().filter(product_id=OuterRef('pk')))
+            )
+        return queryset
+
+    def get_facets(self, queryset):
+        """
+        Count the matching products per attribute value.
+
+        Counts of an attribute with selected values ignore its own selection,
+        so the other values of that attribute show how many products they add.
+        One query for the attributes without selected values and one per
+        attribute with selected values.
+        """
+        if self.is_digital is not None:
+            queryset = queryset.filter(is_digital=self.is_digital)
+
+        facets = []
+        for exclude_attribute in [None, *self.attribute_values]:
+            lines = self.filter_lines(exclude_attribute).filter(
+                product_id__in=queryset.values('pk')
+            )
+            rows = ProductLineAttributeValue.objects.filter(product_line__in=lines)
+            if exclude_attribute is None:
+                rows = rows.exclude(
+                    attribute_value__attribute_id__in=list(self.attribute_values)
+                )
+            else:
+                rows = rows.filter(attribute_value__attribute_id=exclude_attribute)
+            facets.extend(
+                rows.values(
+                    'attribute_value_id',
+                    'attribute_value__value',
+                    'attribute_value__attribute_id',
+                    'attribute_value__attribute_id__name',
+                )
+                .annotate(count=Count('product_line__product_id', distinct=True))
+                .order_by()
+            )
+
+        return [
+            {
+                'attribute_id': row['attribute_value__attribute_id'],
+                'attribute': row['attribute_value__attribute_id__name'],
+                'attribute_value_id': row['attribute_value_id'],
+                'value': row['attribute_value__value'],
+                'count': row['count'],
+            }
+            for row in sorted(
+                facets,
+                key=lambda row: (
+                    row['attribute_value__attribute_id'],
+                    row['attribute_value_id'],
+                ),
+            )
+        ]
@@ -1,6 +1,7 @@
 from django import forms
 from django.forms import BaseInlineFormSet
 from django.core.exceptions import ValidationError
+from django.utils.functional import cached_property
 
 from .models import AttributeValue
 
@@ -16,16 +17,29 @@ class ProductLineAttributeValueFormSet(BaseInlineFormSet):
     def add_fields(self, form, index):
         super().add_fields(form, index)
 
-        attrs_ids = self.instance.product_type_id.attributes.all().values_list(
-            'id', flat=True
-        )
-
-        related_attributes_qs = AttributeValue.objects.filter(
-            attribute_id__in=attrs_ids
-        )
-
-        # Dynamically set the queryset for the 'attribute_value' field
-        form.fields['attribute_value'].queryset = related_attributes_qs
+        # Dynamically set the queryset for the 'attribute_value' field, the
+        # choices are rendered once and shared by all the forms
+        field = form.fields['attribute_value']
+        field.queryset = self.attribute_value_queryset
+        field.choices = self.attribute_value_choices
+
+    @cached_property
+    def attribute_value_queryset(self):
+        # filtered by the foreign key column, which is also set on the
+        # product line of the add page
+        return AttributeValue.objects.filter(
+            attribute_id__product_type_attribute=self.instance.product_type_id_id
+        ).select_related('attribute_id')
+
+    @cached_property
+    def attribute_value_choices(self):
+        # the choices of ModelChoiceField.choices, with one query instead of
+        # a count and a select
+        field = self.form.base_fields['attribute_value']
+        iterator = field.iterator(field)
+        choices = [('', field.empty_label)] if field.empty_label is not None else []
+        choices += [iterator.choice(value) for value in self.attribute_value_queryset]
+        return choices
 
     def clean(self):
         super().clean()
@@ -37,15 +51,16 @@ class ProductLineAttributeValueFormSet(BaseInlineFormSet):
             if form.cleaned_data and not form.cleaned_data.get('DELETE', False):
                 attribute_value = form.cleaned_data.get('attribute_value')
 
-                if attribute_value and attribute_value.attribute_id:
+                # the id column, the attribute itself is not loaded
+                if attribute_value and attribute_value.attribute_id_id:
 
-                    if attribute_value.attribute_id in attribute_ids:
+                    if attribute_value.attribute_id_id in attribute_ids:
 
                         raise ValidationError(
                             f'Allowed only one unique attribute name per product line.'
                         )
 
-                    attribute_ids.add(attribute_value.attribute_id)
+                    attribute_ids.add(attribute_value.attribute_id_id)
 
 
 class ProductLineAttributeValueForm(forms.ModelForm):
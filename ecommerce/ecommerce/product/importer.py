@@ -0,0 +1,866 @@
+"""
+Bulk import of the catalogue from CSV or NDJSON files.
+
+`manage.py import_catalogue` imports one or more files per kind of row. The
+kind comes from the file name (categories.csv, product_lines.ndjson, ...).
+Files are imported in the order of KINDS, so a row may refer to the rows of
+the kinds before it:
+
+    categories      slug, name, parent (slug), is_active
+    attributes      name, values (list)
+    product_types   name, parent (name), attributes (list of attribute names)
+    products        slug, name, pid, category (slug), product_type (name),
+                    description, is_digital, is_active
+    product_lines   slug, sku, product (slug), product_type (name), price,
+                    quantity, weight, display_order, second_name,
+                    second_description, is_active,
+                    attributes (list of "attribute:value")
+    images          product_line (slug), display_order, url, alternative_text
+
+List cells of CSV files are separated by `|`. In NDJSON the attributes of a
+product line may also be an {attribute: value} object.
+
+Categories, products, product lines and images are upserted with
+INSERT ... ON CONFLICT DO UPDATE on their slug (the product line and display
+order of images). An image without display order updates the image of its
+product line with the same url, or is appended. Attributes, attribute values
+and product types have no unique column, they are matched by name and only
+the missing ones are created. The display order of an existing product line
+is kept.
+
+Products, product lines, their attributes and images are written by upsert()
+with multi-row INSERT statements of plain values, bulk_create() spends most of
+the time of a batch on the model instances and the per-field preparation of
+their values. The rows a batch refers to are resolved and validated with maps
+loaded once per import, the writes return the ids of the new rows. Besides
+them, a batch only queries the attributes of the updated lines and the images
+given without display order.
+
+Every batch is committed on its own, an interrupted import is resumed after
+the last committed batch. Categories are imported in one transaction and the
+MPTT fields are computed by a single rebuild of the tree at the end. When a
+batch fails, a value of another unique column (the name of a category or
+product, the pid of a product, the sku of a product line) taken by a row with
+another slug is reported with its line.
+
+bulk_create() sends no post_save. The importer collects the products changed
+by the batches of products, product lines and images, and flush() invalidates
+their cached responses and documents and reindexes them once, at the end of
+the import or every FLUSH_SIZE products. A product changed by several files
+is reindexed once. Categories, attributes and product types send
+post_bulk_create.
+"""
+
+import csv
+import json
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from itertools import islice
+from pathlib import Path
+
+from django.db import IntegrityError, connections, router, transaction
+from django.utils import timezone
+
+from .managers import post_bulk_create
+from .models import (
+    Attribute,
+    AttributeValue,
+    Category,
+    Product,
+    ProductImage,
+    ProductLine,
+    ProductLineAttributeValue,
+    ProductType,
+    ProductTypeAttribute,
+)
+from .search import update_search_index
+from .signals import bump_products
+
+IMPORT_BATCH_SIZE = 1000
+# changed products kept for flush() before it runs during an import
+FLUSH_SIZE = 100_000
+# order of the import, a row may refer to the rows of the kinds before it
+KINDS = (
+    'categories',
+    'attributes',
+    'product_types',
+    'products',
+    'product_lines',
+    'images',
+)
+LIST_SEPARATOR = '|'
+TRUE_VALUES = {'1', 'true', 'yes'}
+FALSE_VALUES = {'0', 'false', 'no'}
+
+# updated on conflict, with the auto_now fields
+PRODUCT_FIELDS = [
+    'name',
+    'pid',
+    'description',
+    'is_digital',
+    'is_active',
+    'category_id',
+    'product_type_id',
+]
+PRODUCT_LINE_FIELDS = [
+    'sku',
+    'product_id',
+    'product_type_id',
+    'price',
+    'quantity',
+    'weight',
+    'second_name',
+    'second_description',
+    'is_active',
+]
+# unique columns besides the slug, checked when a batch fails
+UNIQUE_FIELDS = {
+    'categories': (Category, ['name']),
+    'products': (Product, ['name', 'pid']),
+    'product_lines': (ProductLine, ['sku']),
+}
+
+_missing = object()
+
+
+class CatalogueImportError(Exception):
+    pass
+
+
+def get_kind(path):
+    kind = Path(path).name.split('.')[0]
+    if kind not in KINDS:
+        raise CatalogueImportError(
+            f'{path}: the file name must be one of {", ".join(KINDS)}'
+        )
+    return kind
+
+
+def sort_files(paths):
+    """Return the paths in the order of the import."""
+    return sorted(paths, key=lambda path: KINDS.index(get_kind(path)))
+
+
+def read_rows(path, start=0):
+    """
+    Yield (line number, row) of a CSV or NDJSON file, skipping `start` rows.
+    """
+    path = Path(path)
+    if path.suffix not in ('.csv', '.ndjson', '.jsonl'):
+        raise CatalogueImportError(f'{path}: expected a .csv or .ndjson file')
+
+    with path.open(newline='', encoding='utf-8') as file:
+        if path.suffix == '.csv':
+            reader = csv.DictReader(file)
+            for row in islice(reader, start, None):
+                yield reader.line_num, row
+            return
+
+        lines = ((n, line) for n, line in enumerate(file, 1) if line.strip())
+        for line_number, line in islice(lines, start, None):
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                raise CatalogueImportError(f'{path}:{line_number}: {exc}') from None
+            if not isinstance(row, dict):
+                raise CatalogueImportError(f'{path}:{line_number}: expected an object')
+            yield line_number, row
+
+
+def get_value(row, key, default=_missing):
+    value = row.get(key)
+    if value is None or value == '':
+        if default is _missing:
+            raise CatalogueImportError(f'missing "{key}"')
+        return default
+    return value
+
+
+def get_text(row, key, default=_missing):
+    value = get_value(row, key, default)
+    # numbers of NDJSON, a column of a multi-row INSERT has a single type
+    return value if value is None else str(value)
+
+
+def get_bool(row, key):
+    value = get_value(row, key, False)
+    if isinstance(value, str):
+        if value.lower() not in TRUE_VALUES | FALSE_VALUES:
+            raise CatalogueImportError(f'"{key}" is not a boolean: {value}')
+        return value.lower() in TRUE_VALUES
+    return bool(value)
+
+
+def get_number(row, key, type, default=_missing):
+    value = get_value(row, key, default)
+    if value is None:
+        return None
+    try:
+        return type(str(value))
+    except (ValueError, InvalidOperation):
+        raise CatalogueImportError(f'"{key}" is not a number: {value}') from None
+
+
+def get_decimal(row, key, field, default=_missing):
+    """Return the number rounded half up to the decimal places of `field`."""
+    value = get_number(row, key, Decimal, default)
+    if value is None:
+        return None
+    limit = Decimal(10) ** (field.max_digits - field.decimal_places)
+    if value.is_finite() and abs(value) < limit:
+        value = value.quantize(
+            Decimal(1).scaleb(-field.decimal_places), rounding=ROUND_HALF_UP
+        )
+    if not value.is_finite() or abs(value) >= limit:
+        raise CatalogueImportError(f'"{key}" is out of range: {value}')
+    return value
+
+
+def get_list(row, key):
+    value = row.get(key) or []
+    if isinstance(value, str):
+        value = [item.strip() for item in value.split(LIST_SEPARATOR)]
+    return [item for item in value if item]
+
+
+def get_attribute_values(row):
+    """Return the (attribute, value) pairs of a product line row."""
+    value = row.get('attributes') or []
+    if isinstance(value, dict):
+        return [(str(name), str(item)) for name, item in value.items()]
+    pairs = []
+    for item in get_list(row, 'attributes'):
+        name, separator, item = item.partition(':')
+        if not separator:
+            raise CatalogueImportError(f'expected "attribute:value", got "{name}"')
+        pairs.append((name.strip(), item.strip()))
+    return pairs
+
+
+def check_unique(path, model, fields, rows, batch_size):
+    """
+    Raise CatalogueImportError for the first row whose value of a unique field
+    is taken by a row with another slug, in the file or in the table.
+
+    ON CONFLICT only updates the row with the same slug, a conflict on another
+    unique column fails the batch with an IntegrityError. Called once it
+    failed, a batch runs no query for it. `rows` are (line number, row) pairs
+    in the order of the file.
+    """
+    owners = {field: {} for field in fields}
+    rows = iter(rows)
+    while batch := list(islice(rows, batch_size)):
+        for field, field_owners in owners.items():
+            values = {get_text(row, field, '') for _, row in batch}
+            for value, owner in model.objects.filter(
+                **{f'{field}__in': values - field_owners.keys()}
+            ).values_list(field, 'slug'):
+                field_owners.setdefault(value, owner)
+            for line_number, row in batch:
+                value = get_text(row, field, '')
+                slug = get_text(row, 'slug', '')
+                owner = field_owners.setdefault(value, slug)
+                if owner != slug:
+                    raise CatalogueImportError(
+                        f'{path}:{line_number}: {field} "{value}" is already used '
+                        f'by "{owner}"'
+                    )
+
+
+def upsert(model, rows, unique_fields, update_fields=(), returning=()):
+    """
+    Insert the rows with INSERT ... ON CONFLICT in multi-row statements.
+
+    Args:
+        model: Model class of the rows.
+        rows (list): Dicts of field names and values, with the same keys.
+            The values are passed to the database as they are, the auto_now
+            and auto_now_add fields are set here.
+        unique_fields (list): Fields of the unique constraint of the conflict.
+        update_fields (list): Fields updated on conflict with the auto_now
+            fields, a conflicting row is skipped without them.
+        returning (list): Fields returned for the inserted and updated rows.
+
+    Returns:
+        list: The tuples of the `returning` fields, None when the database
+            cannot return rows from an INSERT (SQLite before 3.35).
+    """
+    connection = connections[router.db_for_write(model)]
+    can_return = connection.features.can_return_rows_from_bulk_insert
+    if not rows:
+        return [] if can_return else None
+    qn = connection.ops.quote_name
+    opts = model._meta
+    timestamps = [
+        field
+        for field in opts.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    fields = [opts.get_field(name) for name in rows[0]] + timestamps
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+
+    updated = [opts.get_field(name).column for name in update_fields]
+    if updated:
+        updated += [field.column for field in timestamps if field.auto_now]
+        on_conflict = 'DO UPDATE SET ' + ', '.join(
+            f'{qn(column)} = excluded.{qn(column)}' for column in updated
+        )
+    else:
+        on_conflict = 'DO NOTHING'
+    if returning and can_return:
+        on_conflict += ' RETURNING ' + ', '.join(
+            qn(opts.get_field(name).column) for name in returning
+        )
+    placeholders = f'({", ".join(["%s"] * len(fields))})'
+    batch_size = max(connection.ops.bulk_batch_size(fields, rows), 1)
+    returned = []
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start : start + batch_size]
+            cursor.execute(
+                f'INSERT INTO {qn(opts.db_table)} '
+                f'({", ".join(qn(field.column) for field in fields)}) VALUES '
+                + ', '.join([placeholders] * len(batch))
+                + ' ON CONFLICT ('
+                + ', '.join(qn(opts.get_field(name).column) for name in unique_fields)
+                + f') {on_conflict}',
+                [
+                    value
+                    for row in batch
+                    for value in (*row.values(), *[now] * len(timestamps))
+                ],
+            )
+            if returning and can_return:
+                returned.extend(cursor.fetchall())
+    return returned if can_return else None
+
+
+def get_id(ids, key, label):
+    try:
+        return ids[key]
+    except KeyError:
+        if isinstance(key, tuple):
+            key = ':'.join(key)
+        raise CatalogueImportError(f'unknown {label} "{key}"') from None
+
+
+class CatalogueImporter:
+    """
+    Import the files of a catalogue.
+
+    The slugs and names the rows refer to are resolved with maps of ids,
+    loaded once per import and updated by every batch. flush() has to be
+    called once the files are imported, also after an error.
+    """
+
+    def __init__(self, batch_size=IMPORT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self._ids = {}
+        # written since the last flush()
+        self._changed_product_ids = set()
+        self._searched_product_ids = set()
+        self._changed_product_line_ids = set()
+        self._changed_category_ids = set()
+
+    def get_ids(self, name):
+        if name not in self._ids:
+            self._ids[name] = self.load_ids(name)
+        return self._ids[name]
+
+    def load_ids(self, name, keys=None):
+        """
+        Return {key: id} of the rows with the keys, all rows without.
+
+        `product_type_attribute` is the set of (product type id, attribute
+        name) pairs allowed for product lines.
+        """
+        if name == 'product_type_attribute':
+            return set(
+                ProductTypeAttribute.objects.values_list(
+                    'product_type_id', 'attribute__name'
+                )
+            )
+        if name == 'attribute_value':
+            queryset = AttributeValue.objects.values_list(
+                'attribute_id__name', 'value', 'pk'
+            )
+            if keys is not None:
+                queryset = queryset.filter(
+                    attribute_id__name__in={attribute for attribute, _ in keys},
+                    value__in={value for _, value in keys},
+                )
+            # matched by name, the oldest of duplicates wins
+            return {
+                (attribute, value): pk
+                for attribute, value, pk in queryset.order_by('-pk')
+            }
+
+        model, key_field, value_field = {
+            'category': (Category, 'slug', 'pk'),
+            'attribute': (Attribute, 'name', 'pk'),
+            'product_type': (ProductType, 'type_name', 'pk'),
+            'product': (Product, 'slug', 'pk'),
+            'product_line': (ProductLine, 'slug', 'pk'),
+            # current parents, updated by the batches instead of reloaded
+            'product_category': (Product, 'slug', 'category_id'),
+            'product_line_product': (ProductLine, 'slug', 'product_id'),
+        }[name]
+        queryset = model.objects.values_list(key_field, value_field).order_by('-pk')
+        if keys is not None:
+            queryset = queryset.filter(**{f'{key_field}__in': keys})
+        return dict(queryset)
+
+    def update_ids(self, name, keys):
+        """Load the ids of rows written by a batch into the map."""
+        self.get_ids(name).update(self.load_ids(name, list(keys)))
+
+    def upsert_slugs(self, name, model, rows, update_fields):
+        """upsert() rows on their slug and put their ids into the map."""
+        ids = upsert(
+            model,
+            rows,
+            ['slug'],
+            update_fields,
+            returning=['slug', model._meta.pk.name],
+        )
+        if ids is None:
+            self.update_ids(name, [row['slug'] for row in rows])
+        else:
+            self.get_ids(name).update(ids)
+
+    def import_file(self, path, start=0, on_batch=None):
+        """
+        Import the rows of a file after the first `start` ones.
+
+        `on_batch(rows)` is called with the number of imported rows of the
+        file after every committed batch. Categories are imported from the
+        start of the file in a single transaction.
+
+        Returns:
+            int: The number of imported rows of the file.
+        """
+        kind = get_kind(path)
+        if kind == 'categories':
+            try:
+                with transaction.atomic():
+                    rows = self.import_categories(path, read_rows(path))
+            except IntegrityError as exc:
+                self.check_unique(kind, path, read_rows(path))
+                raise CatalogueImportError(f'{path}: {exc}') from None
+            if on_batch:
+                on_batch(rows)
+            return rows
+
+        import_batch = getattr(self, f'import_{kind}')
+        rows = read_rows(path, start)
+        count = start
+        while batch := list(islice(rows, self.batch_size)):
+            try:
+                with transaction.atomic():
+                    import_batch(path, batch)
+            except IntegrityError as exc:
+                self.check_unique(kind, path, batch)
+                # e.g. the display order of a line
+                raise CatalogueImportError(
+                    f'{path}:{batch[0][0]}-{batch[-1][0]}: {exc}'
+                ) from None
+            count += len(batch)
+            if on_batch:
+                on_batch(count)
+            if (
+                len(self._changed_product_ids) + len(self._changed_product_line_ids)
+                >= FLUSH_SIZE
+            ):
+                self.flush()
+        return count
+
+    def check_unique(self, kind, path, rows):
+        """Report a row of a failed batch taking a unique value of another row."""
+        if kind in UNIQUE_FIELDS:
+            model, fields = UNIQUE_FIELDS[kind]
+            check_unique(path, model, fields, rows, self.batch_size)
+
+    def flush(self):
+        """
+        Invalidate the cached responses and documents of the products changed
+        since the last call and reindex them, in batches of product ids.
+        """
+        product_ids = self._changed_product_ids
+        product_line_ids = sorted(self._changed_product_line_ids)
+        for start in range(0, len(product_line_ids), self.batch_size):
+            product_ids.update(
+                ProductLine.objects.filter(
+                    pk__in=product_line_ids[start : start + self.batch_size]
+                ).values_list('product_id', flat=True)
+            )
+
+        product_ids = sorted(product_ids)
+        for start in range(0, len(product_ids), self.batch_size):
+            bump_products(product_ids[start : start + self.batch_size])
+        if self._changed_category_ids:
+            # the categories the products were moved away from
+            bump_products([], category_ids=self._changed_category_ids)
+        searched_ids = sorted(self._searched_product_ids)
+        for start in range(0, len(searched_ids), self.batch_size):
+            update_search_index(searched_ids[start : start + self.batch_size])
+
+        self._changed_product_ids = set()
+        self._searched_product_ids = set()
+        self._changed_product_line_ids = set()
+        self._changed_category_ids = set()
+
+    def parse(self, path, batch, parse_row):
+        """
+        Return {key: parsed row} of a batch, a later row with the same key
+        replaces the earlier one, as ON CONFLICT cannot update a row twice.
+        """
+        parsed = {}
+        for line_number, row in batch:
+            try:
+                key, value = parse_row(row)
+            except CatalogueImportError as exc:
+                raise CatalogueImportError(f'{path}:{line_number}: {exc}') from None
+            parsed[key] = (line_number, value)
+        return parsed
+
+    def import_categories(self, path, rows):
+        parents = {}
+        objs = {}
+
+        def parse_row(row):
+            slug = get_value(row, 'slug')
+            category = Category(
+                slug=slug,
+                name=get_value(row, 'name'),
+                is_active=get_bool(row, 'is_active'),
+                # computed by the rebuild of the tree
+                lft=0,
+                rght=0,
+                tree_id=0,
+                level=0,
+            )
+            return slug, (category, get_value(row, 'parent', None))
+
+        count = 0
+        while batch := list(islice(rows, self.batch_size)):
+            count += len(batch)
+            parsed = self.parse(path, batch, parse_row)
+            Category.objects.bulk_create(
+                [category for _, (category, _) in parsed.values()],
+                update_conflicts=True,
+                unique_fields=['slug'],
+                update_fields=['name', 'is_active', 'updated_at'],
+            )
+            for slug, (line_number, (category, parent)) in parsed.items():
+                objs[slug] = category
+                parents[slug] = (line_number, parent)
+
+        # parents are set once all the categories exist, a parent may come
+        # after its children in the file
+        ids = self._ids['category'] = self.load_ids('category')
+        current_parents = dict(Category.objects.values_list('slug', 'parent_id'))
+        changed = []
+        for slug, category in objs.items():
+            line_number, parent = parents[slug]
+            category.pk = ids[slug]
+            try:
+                category.parent_id = get_id(ids, parent, 'category') if parent else None
+            except CatalogueImportError as exc:
+                raise CatalogueImportError(f'{path}:{line_number}: {exc}') from None
+            if category.parent_id != current_parents[slug]:
+                changed.append(category)
+        Category.objects.bulk_update(changed, ['parent'], batch_size=self.batch_size)
+
+        # Category.objects is a plain Manager, the MPTT one is _tree_manager
+        Category._tree_manager.rebuild()
+        # the rebuild sends no signals
+        post_bulk_create.send(
+            sender=Category, objs=list(objs.values()), using=Category.objects.db
+        )
+        return count
+
+    def import_attributes(self, path, batch):
+        parsed = self.parse(
+            path, batch, lambda row: (get_value(row, 'name'), get_list(row, 'values'))
+        )
+        attribute_ids = self.get_ids('attribute')
+        attributes = [
+            Attribute(name=name) for name in parsed if name not in attribute_ids
+        ]
+        Attribute.objects.bulk_create(attributes)
+        self.update_ids('attribute', [attribute.name for attribute in attributes])
+
+        value_ids = self.get_ids('attribute_value')
+        values = {
+            (name, value): AttributeValue(
+                attribute_id_id=attribute_ids[name], value=value
+            )
+            for name, (_, attribute_values) in parsed.items()
+            for value in attribute_values
+            if (name, value) not in value_ids
+        }
+        AttributeValue.objects.bulk_create(values.values())
+        self.update_ids('attribute_value', values)
+
+        post_bulk_create.send(
+            sender=Attribute, objs=attributes, using=Attribute.objects.db
+        )
+        post_bulk_create.send(
+            sender=AttributeValue,
+            objs=list(values.values()),
+            using=AttributeValue.objects.db,
+        )
+
+    def import_product_types(self, path, batch):
+        attribute_ids = self.get_ids('attribute')
+
+        def parse_row(row):
+            return get_value(row, 'name'), (
+                get_value(row, 'parent', None),
+                [
+                    get_id(attribute_ids, name, 'attribute')
+                    for name in get_list(row, 'attributes')
+                ],
+            )
+
+        parsed = self.parse(path, batch, parse_row)
+        ids = self.get_ids('product_type')
+        product_types = [
+            ProductType(type_name=name) for name in parsed if name not in ids
+        ]
+        ProductType.objects.bulk_create(product_types)
+        self.update_ids('product_type', parsed)
+
+        with_parent = []
+        links = []
+        for name, (line_number, (parent, attributes)) in parsed.items():
+            if parent is not None:
+                try:
+                    parent_id = get_id(ids, parent, 'product type')
+                except CatalogueImportError as exc:
+                    raise CatalogueImportError(f'{path}:{line_number}: {exc}') from None
+                with_parent.append(ProductType(pk=ids[name], parent_id=parent_id))
+            links.extend(
+                ProductTypeAttribute(product_type_id=ids[name], attribute_id=pk)
+                for pk in attributes
+            )
+        ProductType.objects.bulk_update(with_parent, ['parent'])
+        # attributes are added, the attributes a type already has are kept
+        ProductTypeAttribute.objects.bulk_create(links, ignore_conflicts=True)
+        # reloaded by the next batch of product lines
+        self._ids.pop('product_type_attribute', None)
+
+        post_bulk_create.send(
+            sender=ProductType,
+            objs=product_types + with_parent,
+            using=ProductType.objects.db,
+        )
+        post_bulk_create.send(
+            sender=ProductTypeAttribute,
+            objs=links,
+            using=ProductTypeAttribute.objects.db,
+        )
+
+    def import_products(self, path, batch):
+        category_ids = self.get_ids('category')
+        product_type_ids = self.get_ids('product_type')
+        product_categories = self.get_ids('product_category')
+
+        def parse_row(row):
+            category = get_value(row, 'category', None)
+            slug = get_text(row, 'slug')
+            return slug, {
+                'slug': slug,
+                'name': get_text(row, 'name'),
+                'pid': get_text(row, 'pid'),
+                'description': get_text(row, 'description', ''),
+                'is_digital': get_bool(row, 'is_digital'),
+                'is_active': get_bool(row, 'is_active'),
+                'category_id': (
+                    get_id(category_ids, category, 'category') if category else None
+                ),
+                'product_type_id': get_id(
+                    product_type_ids, get_value(row, 'product_type'), 'product type'
+                ),
+            }
+
+        parsed = self.parse(path, batch, parse_row)
+        products = [product for _, product in parsed.values()]
+        self.upsert_slugs('product', Product, products, PRODUCT_FIELDS)
+
+        ids = self.get_ids('product')
+        product_ids = {ids[product['slug']] for product in products}
+        self._changed_product_ids.update(product_ids)
+        self._searched_product_ids.update(product_ids)
+        for product in products:
+            # the products moved away from a category change its listings too
+            if product['slug'] in product_categories:
+                self._changed_category_ids.add(product_categories[product['slug']])
+            self._changed_category_ids.add(product['category_id'])
+            product_categories[product['slug']] = product['category_id']
+
+    def import_product_lines(self, path, batch):
+        product_ids = self.get_ids('product')
+        product_type_ids = self.get_ids('product_type')
+        value_ids = self.get_ids('attribute_value')
+        type_attributes = self.get_ids('product_type_attribute')
+        line_products = self.get_ids('product_line_product')
+        price_field = ProductLine._meta.get_field('price')
+        weight_field = ProductLine._meta.get_field('weight')
+
+        def parse_row(row):
+            slug = get_text(row, 'slug')
+            product_type = get_value(row, 'product_type')
+            product_type_id = get_id(product_type_ids, product_type, 'product type')
+            product_line = {
+                'slug': slug,
+                'sku': get_text(row, 'sku'),
+                'product_id': get_id(product_ids, get_value(row, 'product'), 'product'),
+                'product_type_id': product_type_id,
+                'price': get_decimal(row, 'price', price_field),
+                'quantity': get_number(row, 'quantity', int, 1),
+                'weight': get_decimal(row, 'weight', weight_field, Decimal('0.000')),
+                'display_order': get_number(row, 'display_order', int, None),
+                'second_name': get_text(row, 'second_name', ''),
+                'second_description': get_text(row, 'second_description', ''),
+                'is_active': get_bool(row, 'is_active'),
+            }
+            values = None
+            if 'attributes' in row:
+                # the rules of ProductLineAttributeValue.clean()
+                pairs = get_attribute_values(row)
+                names = set()
+                for name, _ in pairs:
+                    if (product_type_id, name) not in type_attributes:
+                        raise CatalogueImportError(
+                            f'attribute "{name}" is not allowed for the product '
+                            f'type "{product_type}"'
+                        )
+                    if name in names:
+                        raise CatalogueImportError(f'attribute "{name}" is repeated')
+                    names.add(name)
+                values = {get_id(value_ids, pair, 'attribute value') for pair in pairs}
+            return slug, (product_line, values)
+
+        parsed = self.parse(path, batch, parse_row)
+        existing_slugs = {slug for slug in parsed if slug in line_products}
+        product_lines = [product_line for _, (product_line, _) in parsed.values()]
+
+        # orders of the new lines, an existing line keeps its order and never
+        # conflicts with NULL
+        new_lines = [
+            line for line in product_lines if line['slug'] not in existing_slugs
+        ]
+        orders = ProductLine.objects.allocate_orders(
+            [(line['product_id'], line['display_order']) for line in new_lines]
+        )
+        for line, order in zip(new_lines, orders):
+            line['display_order'] = order
+        self.upsert_slugs(
+            'product_line', ProductLine, product_lines, PRODUCT_LINE_FIELDS
+        )
+
+        # the products of the lines and those the lines are moved away from
+        product_ids = {line_products[slug] for slug in existing_slugs}
+        for line in product_lines:
+            product_ids.add(line['product_id'])
+            line_products[line['slug']] = line['product_id']
+        self._changed_product_ids.update(product_ids)
+        self._searched_product_ids.update(product_ids)
+
+        # the attributes of a row replace those of the product line
+        ids = self.get_ids('product_line')
+        wanted = {
+            (ids[slug], value_id)
+            for slug, (_, (_, values)) in parsed.items()
+            if values is not None
+            for value_id in values
+        }
+        # the new lines have no attributes yet
+        replaced = [
+            ids[slug]
+            for slug, (_, (_, values)) in parsed.items()
+            if values is not None and slug in existing_slugs
+        ]
+        existing = {}
+        if replaced:
+            existing = {
+                (product_line_id, value_id): pk
+                for pk, product_line_id, value_id in ProductLineAttributeValue.objects.filter(
+                    product_line__in=replaced
+                ).values_list(
+                    'pk', 'product_line_id', 'attribute_value_id'
+                )
+            }
+        stale = [pk for pair, pk in existing.items() if pair not in wanted]
+        if stale:
+            ProductLineAttributeValue.objects.filter(pk__in=stale).delete()
+        upsert(
+            ProductLineAttributeValue,
+            [
+                {'product_line': product_line_id, 'attribute_value': value_id}
+                for product_line_id, value_id in sorted(wanted - existing.keys())
+            ],
+            ['product_line', 'attribute_value'],
+        )
+
+    def import_images(self, path, batch):
+        product_line_ids = self.get_ids('product_line')
+        default_url = ProductImage._meta.get_field('url').default
+
+        def parse_row(row):
+            image = {
+                'product_line_id': get_id(
+                    product_line_ids, get_value(row, 'product_line'), 'product line'
+                ),
+                'display_order': get_number(row, 'display_order', int, None),
+                'url': get_text(row, 'url', default_url),
+                'alternative_text': get_text(row, 'alternative_text', ''),
+            }
+            if image['display_order'] is None:
+                # the image of the line with the url, a string never equal to
+                # an order
+                return (image['product_line_id'], image['url']), image
+            return (image['product_line_id'], image['display_order']), image
+
+        parsed = self.parse(path, batch, parse_row)
+        images = [image for _, image in parsed.values()]
+        unordered = [image for image in images if image['display_order'] is None]
+        if unordered:
+            existing_orders = {
+                (product_line_id, url): display_order
+                for product_line_id, url, display_order in ProductImage.objects.filter(
+                    product_line_id__in={
+                        image['product_line_id'] for image in unordered
+                    },
+                    url__in={image['url'] for image in unordered},
+                )
+                # the first image of duplicated urls
+                .order_by('-display_order').values_list(
+                    'product_line_id', 'url', 'display_order'
+                )
+            }
+            for image in unordered:
+                image['display_order'] = existing_orders.get(
+                    (image['product_line_id'], image['url'])
+                )
+
+        orders = ProductImage.objects.allocate_orders(
+            [(image['product_line_id'], image['display_order']) for image in images]
+        )
+        for image, order in zip(images, orders):
+            image['display_order'] = order
+        self._changed_product_line_ids.update(
+            image['product_line_id'] for image in images
+        )
+        upsert(
+            ProductImage,
+            # a matched image may also be a row with its order
+            list(
+                {
+                    (image['product_line_id'], image['display_order']): image
+                    for image in images
+                }.values()
+            ),
+            ['product_line_id', 'display_order'],
+            ['url', 'alternative_text'],
+        )
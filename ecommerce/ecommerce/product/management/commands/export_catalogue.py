@@ -0,0 +1,80 @@
+import json
+import os
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ecommerce.product.exporter import EXPORT_BATCH_SIZE, export_catalogue
+
+
+def parse_timestamp(value):
+    timestamp = parse_datetime(value)
+    if timestamp is None:
+        raise CommandError(f'"{value}" is not an ISO 8601 timestamp')
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+    return timestamp
+
+
+class Command(BaseCommand):
+    help = (
+        'Export the products changed since the last export as gzipped NDJSON, '
+        'all active products on the first run'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            help='Gzipped NDJSON file, catalogue-<timestamp>.ndjson.gz by default',
+        )
+        parser.add_argument(
+            '--since',
+            help='Export the products changed after this ISO 8601 timestamp '
+            'instead of the stored watermark',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Export all active products',
+        )
+        parser.add_argument(
+            '--watermark-file',
+            default='export_catalogue.json',
+            help='File keeping the watermark of the next export',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=EXPORT_BATCH_SIZE,
+            help='Number of products serialized per query batch',
+        )
+
+    def handle(self, *args, **options):
+        watermark_file = Path(options['watermark_file'])
+        if options['full']:
+            since = None
+        elif options['since']:
+            since = parse_timestamp(options['since'])
+        elif watermark_file.exists():
+            since = parse_timestamp(json.loads(watermark_file.read_text())['watermark'])
+        else:
+            since = None
+
+        output = options['output'] or (
+            f'catalogue-{timezone.now():%Y%m%dT%H%M%S}.ndjson.gz'
+        )
+        count, watermark = export_catalogue(
+            output, since=since, batch_size=options['batch_size']
+        )
+
+        # written after the export, a failed run is repeated by the next one
+        temporary = watermark_file.with_suffix('.tmp')
+        temporary.write_text(json.dumps({'watermark': watermark.isoformat()}))
+        os.replace(temporary, watermark_file)
+
+        changed = f'changed since {since.isoformat()}' if since else 'active'
+        self.stdout.write(
+            self.style.SUCCESS(f'Exported {count} {changed} products to {output}')
+        )
@@ -0,0 +1,114 @@
+import json
+import os
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ecommerce.product.importer import (
+    IMPORT_BATCH_SIZE,
+    CatalogueImporter,
+    CatalogueImportError,
+    sort_files,
+)
+
+# seconds between the progress lines of a file
+PROGRESS_INTERVAL = 5
+
+
+class Command(BaseCommand):
+    help = (
+        'Import categories, attributes, product types, products, product lines '
+        'and images from CSV or NDJSON files'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'files',
+            nargs='+',
+            help='Files named after the kind of their rows, e.g. categories.csv '
+            'or product_lines.ndjson',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help='Number of rows written per transaction',
+        )
+        parser.add_argument(
+            '--state-file',
+            default='import_catalogue.json',
+            help='File recording the committed rows of every file, removed '
+            'when the import is complete',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Skip the rows committed by an interrupted import',
+        )
+
+    def handle(self, *args, **options):
+        state_file = Path(options['state_file'])
+        state = {}
+        if options['resume'] and state_file.exists():
+            state = json.loads(state_file.read_text())
+
+        def save_state():
+            # replaced atomically, an interruption never leaves a partial file
+            temporary = state_file.with_suffix('.tmp')
+            temporary.write_text(json.dumps(state, indent=2))
+            os.replace(temporary, state_file)
+
+        importer = CatalogueImporter(batch_size=options['batch_size'])
+        try:
+            files = sort_files(options['files'])
+            for path in files:
+                self.import_file(importer, path, state, save_state)
+        except CatalogueImportError as exc:
+            raise CommandError(exc)
+        finally:
+            # also the batches committed before an error or an interruption
+            started = time.perf_counter()
+            importer.flush()
+            self.stdout.write(
+                f'caches and search index updated in '
+                f'{time.perf_counter() - started:.1f}s'
+            )
+        state_file.unlink(missing_ok=True)
+
+    def import_file(self, importer, path, state, save_state):
+        key = str(Path(path).resolve())
+        size = os.path.getsize(path)
+        file_state = state.get(key, {'size': size, 'rows': 0, 'done': False})
+        if file_state['size'] != size:
+            raise CommandError(f'{path} changed since the interrupted import')
+        if file_state['done']:
+            self.stdout.write(f'{path}: already imported')
+            return
+
+        start = file_state['rows']
+        started = reported = time.perf_counter()
+
+        def on_batch(rows):
+            nonlocal reported
+            state[key] = {'size': size, 'rows': rows, 'done': False}
+            save_state()
+            now = time.perf_counter()
+            if now - reported >= PROGRESS_INTERVAL:
+                reported = now
+                self.stdout.write(
+                    f'{path}: {rows} rows '
+                    f'({(rows - start) / (now - started):.0f} rows/s)'
+                )
+
+        rows = importer.import_file(path, start=start, on_batch=on_batch)
+        state[key] = {'size': size, 'rows': rows, 'done': True}
+        save_state()
+
+        seconds = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{path}: imported {rows - start} rows in {seconds:.1f}s '
+                f'({(rows - start) / max(seconds, 1e-6):.0f} rows/s)'
+            )
+        )
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from ecommerce.product.documents import (
+    REBUILD_BATCH_SIZE,
+    mark_documents_dirty,
+    rebuild_documents,
+)
+from ecommerce.product.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Rebuild dirty product documents in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=REBUILD_BATCH_SIZE,
+            help='Number of documents rebuilt per query batch',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Mark every document dirty before rebuilding',
+        )
+
+    def handle(self, *args, **options):
+        if options['all']:
+            mark_documents_dirty(Product.objects.values('pk'))
+        rebuilt, deleted = rebuild_documents(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Rebuilt {rebuilt} product documents, deleted {deleted}'
+            )
+        )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from ecommerce.product.search import REBUILD_BATCH_SIZE, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Reindex all products for the product search'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=REBUILD_BATCH_SIZE,
+            help='Number of products reindexed per batch',
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_search_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Reindexed {count} products'))
@@ -1,6 +1,213 @@
-from django.db import models
+from collections import Counter, defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.dispatch import Signal
+
+from .fields import OrderingField
+
+# sent by OrderingQuerySet.bulk_create_ordered(), bulk_create() sends no post_save
+post_bulk_create = Signal()
 
 
 class IsActiveManager(models.Manager):
     def get_queryset(self):
         return super().get_queryset().filter(is_active=True)
+
+
+class OrderingQuerySet(models.QuerySet):
+    def allocate_orders(self, positions):
+        """
+        Allocate the orders of many new rows of a model with OrderingField.
+
+        Rows without an order get the next numbers of their scope in the order
+        they are passed, numbers for all the scopes are allocated with two
+        queries. Manually set orders are kept and raise the counters. Has to
+        be called in the transaction inserting the rows.
+
+        Args:
+            positions (list): (scope id, order or None) pairs of the rows.
+
+        Returns:
+            list: The order of every row.
+        """
+        field = next(
+            f for f in self.model._meta.concrete_fields if isinstance(f, OrderingField)
+        )
+        scope_counts = Counter()
+        scope_max_values = {}
+        for scope_id, value in positions:
+            if value is None:
+                scope_counts[scope_id] += 1
+            else:
+                scope_max_values[scope_id] = max(
+                    value, scope_max_values.get(scope_id, 0)
+                )
+
+        next_numbers = field.allocate_many(
+            self.model, self.db, scope_counts, scope_max_values
+        )
+        orders = []
+        for scope_id, value in positions:
+            if value is None:
+                value = next_numbers[scope_id]
+                next_numbers[scope_id] += 1
+            orders.append(value)
+        return orders
+
+    def bulk_create_ordered(self, objs, batch_size=1000, **kwargs):
+        """
+        Insert many objects of a model with OrderingField in batches.
+
+        Objects without an order get the next numbers of their scope in the
+        order they are passed. Numbers for all the scopes are allocated with
+        two queries, instead of the per-row queries of OrderingField.pre_save.
+        Manually set orders are kept and are not checked for uniqueness here,
+        the database constraint rejects duplicates.
+
+        Args:
+            objs (iterable): Unsaved model instances.
+            batch_size (int): Number of rows per INSERT statement.
+            **kwargs: Passed to bulk_create(), e.g. update_conflicts=True for
+                an upsert. Numbers are allocated for every object without an
+                order, also for those which update an existing row.
+
+        Returns:
+            list: The created objects.
+        """
+        objs = list(objs)
+        field = next(
+            f for f in self.model._meta.concrete_fields if isinstance(f, OrderingField)
+        )
+        scope_attname = self.model._meta.get_field(field.unique_for_field).attname
+
+        with transaction.atomic(using=self.db):
+            orders = self.allocate_orders(
+                [
+                    (getattr(obj, scope_attname), getattr(obj, field.attname))
+                    for obj in objs
+                ]
+            )
+            for obj, value in zip(objs, orders):
+                setattr(obj, field.attname, value)
+                obj._ordering_allocated = True
+            try:
+                self.bulk_create(objs, batch_size=batch_size, **kwargs)
+            finally:
+                for obj in objs:
+                    del obj._ordering_allocated
+
+        post_bulk_create.send(sender=self.model, objs=objs, using=self.db)
+        return objs
+
+
+class ProductLineQuerySet(OrderingQuerySet):
+    def bulk_create_ordered(self, objs, batch_size=1000, **kwargs):
+        objs = list(objs)
+        # ProductLine.save() is not called by bulk_create()
+        for obj in objs:
+            obj.round_decimal_fields()
+        return super().bulk_create_ordered(objs, batch_size=batch_size, **kwargs)
+
+
+class ProductLineAttributeValueQuerySet(models.QuerySet):
+    def bulk_attach(self, pairs, batch_size=1000):
+        """
+        Attach attribute values to product lines in bulk.
+
+        Validates the whole batch with the rules of ProductLineAttributeValue.clean()
+        in a constant number of queries: the attribute must be allowed by the product
+        type of the line, and a line can have only one value of each attribute.
+
+        Args:
+            pairs (iterable): (product_line, attribute_value) tuples of model
+                instances or primary keys.
+            batch_size (int): Number of rows per INSERT statement.
+
+        Raises:
+            ValidationError: With a message for every invalid pair, nothing is created.
+
+        Returns:
+            list: The created ProductLineAttributeValue objects.
+        """
+        # avoid circular import, models.py imports this module
+        from .models import AttributeValue, ProductLine, ProductTypeAttribute
+
+        pairs = [
+            (getattr(product_line, 'pk', product_line), getattr(value, 'pk', value))
+            for product_line, value in pairs
+        ]
+        product_line_ids = {product_line_id for product_line_id, _ in pairs}
+
+        product_types = {}
+        product_type_names = {}
+        for product_line_id, product_type_id, type_name in ProductLine.objects.filter(
+            pk__in=product_line_ids
+        ).values_list('pk', 'product_type_id', 'product_type_id__type_name'):
+            product_types[product_line_id] = product_type_id
+            product_type_names[product_type_id] = type_name
+        allowed_attributes = defaultdict(set)
+        for product_type_id, attribute_name in ProductTypeAttribute.objects.filter(
+            product_type__in=set(product_types.values())
+        ).values_list('product_type_id', 'attribute__name'):
+            allowed_attributes[product_type_id].add(attribute_name)
+        attribute_names = dict(
+            AttributeValue.objects.filter(
+                pk__in={value_id for _, value_id in pairs}
+            ).values_list('pk', 'attribute_id__name')
+        )
+        existing_attributes = set(
+            self.filter(product_line__in=product_line_ids).values_list(
+                'product_line_id', 'attribute_value__attribute_id__name'
+            )
+        )
+
+        errors = []
+        for product_line_id, value_id in pairs:
+            # unknown or unsaved rows
+            if product_line_id not in product_types:
+                errors.append(
+                    ValidationError(
+                        f"The product line '{product_line_id}' does not exist."
+                    )
+                )
+                continue
+            if value_id not in attribute_names:
+                errors.append(
+                    ValidationError(f"The attribute value '{value_id}' does not exist.")
+                )
+                continue
+            product_type_id = product_types[product_line_id]
+            attribute_name = attribute_names[value_id]
+
+            # validate only allowed by product type attributes
+            if attribute_name not in allowed_attributes[product_type_id]:
+                errors.append(
+                    ValidationError(
+                        f"The attribute '{attribute_name}' is not allowed for product lines of type '{product_type_names[product_type_id]}'."
+                    )
+                )
+            # validate duplicates, also within the batch
+            elif (product_line_id, attribute_name) in existing_attributes:
+                errors.append(
+                    ValidationError(
+                        f"The attribute '{attribute_name}' already exists for this product line."
+                    )
+                )
+            existing_attributes.add((product_line_id, attribute_name))
+
+        if errors:
+            raise ValidationError(errors)
+
+        with transaction.atomic(using=self.db):
+            objs = self.bulk_create(
+                [
+                    self.model(
+                        product_line_id=product_line_id, attribute_value_id=value_id
+                    )
+                    for product_line_id, value_id in pairs
+                ],
+                batch_size=batch_size,
+            )
+        post_bulk_create.send(sender=self.model, objs=objs, using=self.db)
+        return objs
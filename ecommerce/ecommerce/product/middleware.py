@@ -0,0 +1,185 @@
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+from .routers import PIN_COOKIE, record_writes
+from .utils import inspect_queries
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SQL_PROFILER = {
+    # number of queries per request above which the request is flagged
+    'QUERY_BUDGET': 50,
+    # number of the slowest statements reported
+    'SLOWEST': 5,
+    # log every query formatted and highlighted by utils.inspect_queries
+    'VERBOSE': False,
+}
+
+
+class QueryRecorder:
+    """
+    Execute wrapper collecting SQL, parameters and duration of every query.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            connection = context['connection']
+            self.queries.append(
+                {
+                    'alias': connection.alias,
+                    # statement with placeholders, identical for N+1 shaped queries
+                    'normalized': sql,
+                    'sql': (
+                        sql
+                        if many
+                        else connection.ops.last_executed_query(
+                            context['cursor'], sql, params
+                        )
+                    ),
+                    'time': time.perf_counter() - start,
+                }
+            )
+
+    def summary(self, slowest=5):
+        """
+        Returns:
+            dict: Query count, total SQL time in ms, normalized statements executed
+                more than once with their count, and the slowest statements.
+        """
+        duplicates = Counter(query['normalized'] for query in self.queries)
+        return {
+            'queries': len(self.queries),
+            'time_ms': round(sum(q['time'] for q in self.queries) * 1000, 3),
+            'duplicates': [
+                {'sql': sql, 'count': count}
+                for sql, count in duplicates.most_common()
+                if count > 1
+            ],
+            'slowest': [
+                {'sql': query['sql'], 'time_ms': round(query['time'] * 1000, 3)}
+                for query in sorted(
+                    self.queries, key=lambda q: q['time'], reverse=True
+                )[:slowest]
+            ],
+        }
+
+
+class SQLProfilerMiddleware:
+    """
+    Opt-in middleware reporting the SQL executed while handling a request.
+
+    Adds `X-DB-Queries` and `Server-Timing` response headers and writes a
+    structured log line per request. Requests over the query budget are logged
+    as warnings and marked with `X-DB-Query-Budget-Exceeded`.
+
+    Configured by the SQL_PROFILER setting, see DEFAULT_SQL_PROFILER.
+    Use `profile_queries` to profile a single view instead.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = {**DEFAULT_SQL_PROFILER, **getattr(settings, 'SQL_PROFILER', {})}
+        recorder = QueryRecorder()
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        summary = recorder.summary(slowest=config['SLOWEST'])
+        over_budget = summary['queries'] > config['QUERY_BUDGET']
+
+        response['X-DB-Queries'] = str(summary['queries'])
+        response['Server-Timing'] = (
+            f'db;dur={summary["time_ms"]};desc="{summary["queries"]} queries"'
+        )
+        if over_budget:
+            response['X-DB-Query-Budget-Exceeded'] = 'true'
+
+        logger.log(
+            logging.WARNING if over_budget else logging.INFO,
+            json.dumps(
+                {
+                    'method': request.method,
+                    'path': request.path,
+                    'status': response.status_code,
+                    'over_budget': over_budget,
+                    **summary,
+                }
+            ),
+        )
+        if config['VERBOSE']:
+            logger.debug(inspect_queries(recorder.queries))
+
+        return response
+
+
+def profile_queries(view_func):
+    """
+    View decorator applying SQLProfilerMiddleware to a single view.
+    """
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        middleware = SQLProfilerMiddleware(lambda r: view_func(r, *args, **kwargs))
+        return middleware(request)
+
+    return wrapper
+
+
+class ReplicaPinningMiddleware:
+    """
+    Pin a client to the primary database for CATALOGUE_REPLICA_PIN_SECONDS
+    after a request which wrote to it, see ecommerce.product.routers.
+
+    The middleware is async capable, so under ASGI the handler chain down to
+    the async views does not pass through a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with record_writes() as written_models:
+            response = self.get_response(request)
+        return self.pin(response, written_models)
+
+    async def __acall__(self, request):
+        # the context of sync views run by sync_to_async shares the set
+        with record_writes() as written_models:
+            response = await self.get_response(request)
+        return self.pin(response, written_models)
+
+    def pin(self, response, written_models):
+        if written_models and settings.CATALOGUE_REPLICA_DATABASE:
+            response.set_cookie(
+                PIN_COOKIE,
+                '1',
+                max_age=settings.CATALOGUE_REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
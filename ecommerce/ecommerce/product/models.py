@@ -1,10 +1,17 @@
 from decimal import Decimal, ROUND_HALF_UP
 
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from mptt.models import MPTTModel, TreeForeignKey
 
-from .managers import IsActiveManager
+from .managers import (
+    IsActiveManager,
+    OrderingQuerySet,
+    ProductLineAttributeValueQuerySet,
+    ProductLineQuerySet,
+)
 from .fields import OrderingField
+from .indexes import PostgresGinIndex
 
 from django.core.exceptions import ValidationError
 
@@ -20,6 +27,8 @@ class Category(MPTTModel):
         blank=True,
         related_name='children',
     )
+    created_at = models.DateTimeField(auto_now_add=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, editable=False)
 
     # Managers
     objects = models.Manager()
@@ -28,6 +37,18 @@ class Category(MPTTModel):
     class MPTTMeta:
         order_insertion_by = ['name']
 
+    class Meta:
+        # public querysets go through IsActiveManager, so the indexes only
+        # cover active rows; the lookup by slug uses the unique index of slug
+        indexes = [
+            # ordering of CatalogueCursorPagination
+            models.Index(
+                fields=['created_at', 'id'],
+                condition=models.Q(is_active=True),
+                name='category_active_created_idx',
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -67,11 +88,33 @@ class Product(models.Model):
         related_name='product_attribute_value',
     )
     created_at = models.DateTimeField(auto_now_add=True, editable=False)
+    # also moved by product/signals.py when its lines, images or attribute
+    # values change, so it dates the whole serialized product
+    updated_at = models.DateTimeField(auto_now=True, editable=False)
 
     # Managers
     objects = models.Manager()
     active = IsActiveManager()
 
+    class Meta:
+        # the lookup by slug is served by the unique index of slug
+        indexes = [
+            # ordering of CatalogueCursorPagination
+            models.Index(
+                fields=['created_at', 'id'],
+                condition=models.Q(is_active=True),
+                name='product_active_created_idx',
+            ),
+            # products of a category, in the order of the product list
+            models.Index(
+                fields=['category_id', 'created_at', 'id'],
+                condition=models.Q(is_active=True),
+                name='product_active_category_idx',
+            ),
+            # changes since the watermark of export_catalogue
+            models.Index(fields=['updated_at']),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -87,12 +130,15 @@ class ProductAttributeValue(models.Model):
         on_delete=models.CASCADE,
         related_name='product_attribute_value_av',
     )
+    updated_at = models.DateTimeField(auto_now=True, editable=False)
 
     class Meta:
         unique_together = (
             'product',
             'attribute_value',
         )
+        # unique_together covers lookups by product, this one by attribute value
+        indexes = [models.Index(fields=['attribute_value', 'product'])]
 
 
 class Attribute(models.Model):
@@ -120,6 +166,7 @@ class ProductTypeAttribute(models.Model):
     attribute = models.ForeignKey(
         Attribute, on_delete=models.CASCADE, related_name='product_type_attribute_a'
     )
+    updated_at = models.DateTimeField(auto_now=True, editable=False)
 
     class Meta:
         unique_together = (
@@ -157,9 +204,28 @@ class ProductLine(models.Model):
     updated_at = models.DateTimeField(auto_now=True, editable=False)
 
     # Managers
-    objects = models.Manager()
+    objects = ProductLineQuerySet.as_manager()
     active = IsActiveManager()
 
+    class Meta:
+        indexes = [
+            # ordering of CatalogueCursorPagination
+            models.Index(
+                fields=['created_at', 'id'],
+                condition=models.Q(is_active=True),
+                name='productline_active_created_idx',
+            ),
+            # active lines of a product, used by the product filters
+            models.Index(fields=['is_active', 'product_id']),
+            models.Index(fields=['updated_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product_id', 'display_order'],
+                name='unique_product_line_display_order',
+            )
+        ]
+
     def __str__(self):
         return f'{self.product_id.name} - {self.sku}'
 
@@ -170,12 +236,15 @@ class ProductLine(models.Model):
             rounding=ROUND_HALF_UP,
         )
 
-    def save(self, *args, **kwargs):
+    def round_decimal_fields(self):
         if self.price is not None:
             self.price = self._round_half_up(self.price, decimal_place=2)
         if self.weight is not None:
             self.weight = self._round_half_up(self.weight, decimal_place=3)
 
+    def save(self, *args, **kwargs):
+        self.round_decimal_fields()
+
         super().save(*args, **kwargs)
 
 
@@ -190,12 +259,22 @@ class ProductLineAttributeValue(models.Model):
         on_delete=models.CASCADE,
         related_name='product_line_attribute_value_av',
     )
+    updated_at = models.DateTimeField(auto_now=True, editable=False)
+
+    # Managers
+    objects = ProductLineAttributeValueQuerySet.as_manager()
 
     class Meta:
         unique_together = (
             'product_line',
             'attribute_value',
         )
+        # unique_together covers lookups by line, this one the product filters
+        # and facets by attribute value
+        indexes = [
+            models.Index(fields=['attribute_value', 'product_line']),
+            models.Index(fields=['updated_at']),
+        ]
 
     def clean(self):
         product_type = self.product_line.product_type_id
@@ -241,6 +320,115 @@ class ProductImage(models.Model):
     display_order = OrderingField(
         unique_for_field='product_line_id', blank=True, null=True
     )
+    updated_at = models.DateTimeField(auto_now=True, editable=False)
+
+    # Managers
+    objects = OrderingQuerySet.as_manager()
+
+    class Meta:
+        indexes = [models.Index(fields=['updated_at'])]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product_line_id', 'display_order'],
+                name='unique_product_image_display_order',
+            )
+        ]
 
     def __str__(self):
         return f'pl_{str(self.product_line_id.slug)}/order_{str(self.display_order)}'
+
+
+class OrderingCounter(models.Model):
+    """
+    Last display order allocated by OrderingField in scope of a related object.
+    """
+
+    model = models.CharField(max_length=100)
+    scope_id = models.BigIntegerField()
+    value = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = (
+            'model',
+            'scope_id',
+        )
+
+    def __str__(self):
+        return f'{self.model}:{self.scope_id}/{self.value}'
+
+
+class ProductDocument(models.Model):
+    """
+    Ready-to-serve JSON of an active product.
+
+    Changes of the rows a product is built from mark its document dirty,
+    `manage.py rebuild_product_documents` rebuilds dirty documents in batches.
+    """
+
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True, related_name='document'
+    )
+    slug = models.SlugField(max_length=250, db_index=True)
+    data = models.JSONField(default=dict)
+    is_dirty = models.BooleanField(default=True)
+    # incremented by every change, a rebuild only stores its data if the
+    # document has not been marked dirty again in the meantime
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['product'],
+                condition=models.Q(is_dirty=True),
+                name='product_document_dirty_idx',
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.slug}/v{self.version}'
+
+
+class ProductSearchVector(models.Model):
+    """
+    Weighted full-text vector of a product, searched on PostgreSQL.
+    """
+
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_vector',
+    )
+    vector = SearchVectorField(null=True)
+
+    class Meta:
+        indexes = [
+            PostgresGinIndex(fields=['vector'], name='product_search_vector_gin')
+        ]
+
+    def __str__(self):
+        return f'{self.product_id}: {self.vector}'
+
+
+class ProductSearchTerm(models.Model):
+    """
+    Inverted index of product terms, searched on databases without full-text
+    search (SQLite).
+    """
+
+    term = models.CharField(max_length=100)
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name='search_terms'
+    )
+    weight = models.FloatField()
+
+    class Meta:
+        # also the index of the term lookups
+        unique_together = (
+            'term',
+            'product',
+        )
+
+    def __str__(self):
+        return f'{self.term}: {self.product_id}/{self.weight}'
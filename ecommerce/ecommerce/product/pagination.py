@@ -0,0 +1,119 @@
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+
+class CatalogueCursorPagination(CursorPagination):
+    """
+    Keyset pagination for the catalogue listings.
+
+    Pages are fetched with `WHERE created_at > cursor` on the indexed
+    (created_at, id) ordering, rows sharing the created_at of the cursor are
+    skipped with an OFFSET, so deep pages cost about the same as the first one.
+    Page size defaults to REST_FRAMEWORK['PAGE_SIZE'] and can be lowered or
+    raised per request with `?page_size=` up to `max_page_size`.
+
+    `paginate_queryset` of DRF is split in get_page_queryset() and set_page(),
+    so async views fetch the same page with `apaginate_queryset`. Both are
+    copied from CursorPagination.paginate_queryset of DRF 3.15 (pinned in
+    requirements.txt) and have to follow it on an upgrade of DRF.
+    """
+
+    ordering = ('created_at', 'id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.get_page_queryset(queryset, request, view)
+        if page_queryset is None:
+            return None
+        return self.set_page(list(page_queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.get_page_queryset(queryset, request, view)
+        if page_queryset is None:
+            return None
+        return self.set_page([row async for row in page_queryset])
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """
+        Return the queryset of the requested page and one more row, None
+        when pagination is disabled.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (self.offset, self.reverse, self.current_position) = (0, False, None)
+        else:
+            (self.offset, self.reverse, self.current_position) = self.cursor
+
+        # Cursor pagination always enforces an ordering.
+        if self.reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        # If we have a cursor with a fixed position then filter by that.
+        if self.current_position is not None:
+            order = self.ordering[0]
+            is_reversed = order.startswith('-')
+            order_attr = order.lstrip('-')
+
+            # Test for: (cursor reversed) XOR (queryset reversed)
+            if self.cursor.reverse != is_reversed:
+                kwargs = {order_attr + '__lt': self.current_position}
+            else:
+                kwargs = {order_attr + '__gt': self.current_position}
+
+            queryset = queryset.filter(**kwargs)
+
+        # Always fetch an extra item to determine if there is a following page.
+        return queryset[self.offset : self.offset + self.page_size + 1]
+
+    def set_page(self, results):
+        """
+        Set the page and the cursor positions from the rows of the page queryset.
+        """
+        self.page = list(results[: self.page_size])
+
+        # Determine the position of the final item following the page.
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering
+            )
+        else:
+            has_following_position = False
+            following_position = None
+
+        if self.reverse:
+            # The query ordering was in reverse, reverse the items again.
+            self.page = list(reversed(self.page))
+
+            # Determine next and previous positions for reverse cursors.
+            self.has_next = (self.current_position is not None) or (self.offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = self.current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            # Determine next and previous positions for forward cursors.
+            self.has_next = has_following_position
+            self.has_previous = (self.current_position is not None) or (self.offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = self.current_position
+
+        # Display page controls in the browsable API if there is more
+        # than one page.
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
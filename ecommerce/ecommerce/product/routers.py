@@ -0,0 +1,125 @@
+"""
+Read replica routing of the catalogue api.
+
+With the CATALOGUE_REPLICA_DATABASE setting naming a database alias, safe
+requests (GET, HEAD, OPTIONS) of the catalogue view sets read the product
+tables from that alias; everything else, admin included, uses `default`.
+
+After a write a client is pinned to the primary for
+CATALOGUE_REPLICA_PIN_SECONDS, so it reads its own writes while the replica
+catches up. ReplicaPinningMiddleware sets the pinning cookie.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'catalogue_primary'
+
+# set by the catalogue view sets while they handle a safe request
+_read_from_replica = ContextVar('read_from_replica', default=False)
+# models written during the current request, see ReplicaPinningMiddleware
+_written_models = ContextVar('written_models', default=None)
+
+
+def get_replica_database():
+    """Return the replica alias while a catalogue read is routed to it."""
+    if _read_from_replica.get():
+        return settings.CATALOGUE_REPLICA_DATABASE
+    return None
+
+
+@contextmanager
+def record_writes():
+    """Collect the models written inside the block into the yielded set."""
+    written_models = set()
+    token = _written_models.set(written_models)
+    try:
+        yield written_models
+    finally:
+        _written_models.reset(token)
+
+
+class CatalogueReplicaRouter:
+    """
+    Database router sending the reads of the product app to the replica.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == 'product':
+            return get_replica_database()
+        return None
+
+    def db_for_write(self, model, **hints):
+        written_models = _written_models.get()
+        if written_models is not None:
+            written_models.add(model)
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replica holds the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, settings.CATALOGUE_REPLICA_DATABASE}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+def replica_stream(content):
+    """Yield the chunks of `content`, reading each one from the replica."""
+    iterator = iter(content)
+    while True:
+        # set and reset around every chunk, a WSGI or ASGI server may pull
+        # the chunks in another context than the one of the view
+        token = _read_from_replica.set(True)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _read_from_replica.reset(token)
+        yield chunk
+
+
+async def areplica_stream(content):
+    """replica_stream() of async streaming content."""
+    iterator = aiter(content)
+    while True:
+        token = _read_from_replica.set(True)
+        try:
+            chunk = await anext(iterator)
+        except StopAsyncIteration:
+            return
+        finally:
+            _read_from_replica.reset(token)
+        yield chunk
+
+
+class ReplicaReadsMixin:
+    """
+    View set mixin routing the reads of safe requests to the replica, unless
+    the client is pinned to the primary.
+
+    The body of a streaming response is read after the view returned, its
+    chunks are read from the replica by replica_stream().
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            settings.CATALOGUE_REPLICA_DATABASE
+            and request.method in ('GET', 'HEAD', 'OPTIONS')
+            and PIN_COOKIE not in request.COOKIES
+        ):
+            self._replica_token = _read_from_replica.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _read_from_replica.reset(token)
+            self._replica_token = None
+            if getattr(response, 'streaming', False):
+                stream = areplica_stream if response.is_async else replica_stream
+                response.streaming_content = stream(response.streaming_content)
+        return super().finalize_response(request, response, *args, **kwargs)
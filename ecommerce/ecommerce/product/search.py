@@ -0,0 +1,150 @@
+"""
+Full-text search of products.
+
+PostgreSQL searches a weighted `tsvector` per product (ProductSearchVector,
+GIN indexed), other databases an inverted index of terms built in Python
+(ProductSearchTerm). Both are updated by product/signals.py after a save of
+a product or its lines which changed searched fields commits, so a search
+never scans the product tables.
+
+Weights: product name A, description B, second name, second description
+and sku of the active lines C.
+"""
+
+import re
+from collections import Counter
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections, router
+from django.db.models import Count, F, Sum
+
+from .models import Product, ProductLine, ProductSearchTerm, ProductSearchVector
+
+SEARCH_CONFIG = 'english'
+# same as the default weights of PostgreSQL ts_rank
+WEIGHTS = {'A': 1.0, 'B': 0.4, 'C': 0.2}
+REBUILD_BATCH_SIZE = 500
+
+TERM_RE = re.compile(r'\w+')
+
+
+def is_postgres():
+    return connections[Product.objects.db].vendor == 'postgresql'
+
+
+def tokenize(text):
+    return [
+        term
+        for term in TERM_RE.findall(text.lower())
+        if len(term) <= ProductSearchTerm._meta.get_field('term').max_length
+    ]
+
+
+def get_search_texts(product_ids):
+    """
+    Return {product_id: {weight: text}} of the products.
+    """
+    texts = {
+        pk: {'A': name, 'B': description, 'C': ''}
+        for pk, name, description in Product.objects.filter(
+            pk__in=product_ids
+        ).values_list('pk', 'name', 'description')
+    }
+    for product_id, second_name, second_description, sku in ProductLine.active.filter(
+        product_id__in=texts
+    ).values_list('product_id', 'second_name', 'second_description', 'sku'):
+        texts[product_id]['C'] += f' {second_name} {second_description} {sku}'
+    return texts
+
+
+def update_search_index(product_ids):
+    """
+    Reindex the products, `product_ids` of deleted products are ignored.
+    """
+    texts = get_search_texts(set(product_ids))
+    if not texts:
+        return
+
+    if is_postgres():
+        # one upsert per batch, the vectors are computed by PostgreSQL
+        connection = connections[router.db_for_write(ProductSearchVector)]
+        qn = connection.ops.quote_name
+        vector = ' || '.join(
+            f"setweight(to_tsvector(%s::regconfig, %s), '{weight}')"
+            for weight in WEIGHTS
+        )
+        product_ids = list(texts)
+        with connection.cursor() as cursor:
+            for start in range(0, len(product_ids), REBUILD_BATCH_SIZE):
+                batch = product_ids[start : start + REBUILD_BATCH_SIZE]
+                cursor.execute(
+                    f'INSERT INTO {qn(ProductSearchVector._meta.db_table)} '
+                    '(product_id, vector) VALUES '
+                    + ', '.join([f'(%s, {vector})'] * len(batch))
+                    + ' ON CONFLICT (product_id) DO UPDATE SET vector = excluded.vector',
+                    [
+                        param
+                        for pk in batch
+                        for param in (
+                            pk,
+                            *(
+                                value
+                                for weight in WEIGHTS
+                                for value in (SEARCH_CONFIG, texts[pk][weight])
+                            ),
+                        )
+                    ],
+                )
+        return
+
+    ProductSearchTerm.objects.filter(product_id__in=texts).delete()
+    terms = []
+    for pk, weighted_texts in texts.items():
+        term_weights = Counter()
+        for weight, text in weighted_texts.items():
+            for term in tokenize(text):
+                term_weights[term] += WEIGHTS[weight]
+        terms.extend(
+            ProductSearchTerm(term=term, product_id=pk, weight=term_weight)
+            for term, term_weight in term_weights.items()
+        )
+    ProductSearchTerm.objects.bulk_create(terms, batch_size=1000)
+
+
+def search_product_ids(query, limit):
+    """
+    Return ids of the active products matching all terms of the query,
+    best ranked first.
+    """
+    if is_postgres():
+        search_query = SearchQuery(query, search_type='websearch', config=SEARCH_CONFIG)
+        return list(
+            ProductSearchVector.objects.filter(
+                vector=search_query, product__is_active=True
+            )
+            .annotate(rank=SearchRank(F('vector'), search_query))
+            .order_by('-rank', 'product_id')
+            .values_list('product_id', flat=True)[:limit]
+        )
+
+    terms = set(tokenize(query))
+    if not terms:
+        return []
+    return list(
+        ProductSearchTerm.objects.filter(term__in=terms, product__is_active=True)
+        .values('product_id')
+        .annotate(rank=Sum('weight'), matched=Count('term'))
+        .filter(matched=len(terms))
+        .order_by('-rank', 'product_id')
+        .values_list('product_id', flat=True)[:limit]
+    )
+
+
+def rebuild_search_index(batch_size=REBUILD_BATCH_SIZE):
+    """
+    Reindex all products, returns the number of products.
+    """
+    product_ids = list(Product.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(product_ids), batch_size):
+        update_search_index(product_ids[start : start + batch_size])
+    return len(product_ids)
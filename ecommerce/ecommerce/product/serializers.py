@@ -32,7 +32,7 @@ class AttributeValueSerializer(serializers.ModelSerializer):
 class ProductImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProductImage
-        exclude = ['id', 'product_line_id']
+        exclude = ['id', 'product_line_id', 'updated_at']
 
 
 class ProductLineSerializer(serializers.ModelSerializer):
@@ -104,15 +104,17 @@ class ProductSerializer(serializers.ModelSerializer):
         ]
 
     def get_product_line(self, obj):
-        active_product_lines = obj.product_line.filter(is_active=True)
+        # 'active_product_lines' is set by the Prefetch in ProductViewSet.queryset
+        active_product_lines = getattr(obj, 'active_product_lines', None)
+        if active_product_lines is None:
+            active_product_lines = obj.product_line.filter(is_active=True)
         return ProductLineSerializer(active_product_lines, many=True).data
 
     def get_product_attributes(self, obj):
         # func syntax: get_<field_name> or specify any name in method_name parameter
         # returns the attributes defined in the ProductType model for specific product
-        product_attributes = Attribute.objects.filter(
-            product_type_attribute__product_type=obj.id
-        )
+        # served from 'product_type_id__attributes' prefetch of ProductViewSet.queryset
+        product_attributes = obj.product_type_id.attributes.all()
         return AttributeSerializer(product_attributes, many=True).data
 
     def to_representation(self, instance):
@@ -0,0 +1,355 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from mptt.signals import node_moved
+
+from .cache import (
+    CATALOGUE_VERSION_KEY,
+    CATEGORY_LIST_VERSION_KEY,
+    CATEGORY_TREE_VERSION_KEY,
+    bump_versions,
+    category_products_version_key,
+    category_subtree_version_key,
+    category_version_key,
+    product_version_key,
+)
+from .documents import mark_documents_dirty
+from .managers import post_bulk_create
+from .search import update_search_index
+from .models import (
+    Attribute,
+    AttributeValue,
+    Category,
+    Product,
+    ProductImage,
+    ProductLine,
+    ProductLineAttributeValue,
+    ProductType,
+    ProductTypeAttribute,
+)
+
+# FK which attaches a row to its product; the old value is kept on pre_save
+# to invalidate the product the row was moved away from
+PARENT_FIELDS = {
+    Product: 'category_id_id',
+    ProductLine: 'product_id_id',
+    ProductImage: 'product_line_id_id',
+    ProductLineAttributeValue: 'product_line_id',
+}
+# fields of the search texts of product/search.py, also read on pre_save
+SEARCH_FIELDS = {
+    Product: ('name', 'description', 'is_active'),
+    ProductLine: (
+        'product_id',
+        'second_name',
+        'second_description',
+        'sku',
+        'is_active',
+    ),
+}
+
+
+def products_changed(product_ids):
+    """
+    Mark the documents of the products dirty and move their updated_at,
+    `product_ids` may be a queryset.
+    """
+    mark_documents_dirty(product_ids)
+    Product.objects.filter(pk__in=product_ids).update(updated_at=timezone.now())
+
+
+def bump_products(product_ids, category_ids=()):
+    """
+    Invalidate cached responses, documents and modification times of products
+    and cached responses of the categories they belong to.
+    """
+    product_ids = {pk for pk in product_ids if pk is not None}
+    if product_ids:
+        products_changed(product_ids)
+    category_ids = set(category_ids)
+    if product_ids:
+        category_ids.update(
+            Product.objects.filter(pk__in=product_ids).values_list(
+                'category_id', flat=True
+            )
+        )
+    category_ids.discard(None)
+    # subtree listings of the categories and of all their ancestors
+    ancestor_ids = (
+        # Category.objects is a plain Manager, the MPTT one is _tree_manager
+        Category._tree_manager.get_queryset_ancestors(
+            Category.objects.filter(pk__in=category_ids), include_self=True
+        ).values_list('pk', flat=True)
+        if category_ids
+        else []
+    )
+
+    bump_versions(
+        [product_version_key(pk) for pk in product_ids]
+        + [category_products_version_key(pk) for pk in category_ids]
+        + [category_subtree_version_key(pk) for pk in ancestor_ids]
+    )
+
+
+def bump_product_lines(product_line_ids):
+    product_line_ids = {pk for pk in product_line_ids if pk is not None}
+    bump_products(
+        ProductLine.objects.filter(pk__in=product_line_ids).values_list(
+            'product_id', flat=True
+        )
+    )
+
+
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=ProductLine)
+@receiver(pre_save, sender=ProductImage)
+@receiver(pre_save, sender=ProductLineAttributeValue)
+def remember_parent(sender, instance, **kwargs):
+    old_values = (
+        sender.objects.filter(pk=instance.pk)
+        .values_list(PARENT_FIELDS[sender], *get_search_attnames(sender))
+        .first()
+        if instance.pk is not None
+        else None
+    )
+    instance._cache_old_parent_id = old_values[0] if old_values else None
+    instance._cache_old_search_values = old_values[1:] if old_values else None
+
+
+def get_search_attnames(sender):
+    return [
+        sender._meta.get_field(name).attname for name in SEARCH_FIELDS.get(sender, ())
+    ]
+
+
+def search_fields_changed(sender, instance, created, update_fields):
+    """
+    Return whether a save changed the searched fields of the row.
+    """
+    old_values = getattr(instance, '_cache_old_search_values', None)
+    if created or old_values is None:
+        return True
+    attnames = get_search_attnames(sender)
+    if update_fields is not None and not set(update_fields) & {
+        *SEARCH_FIELDS[sender],
+        *attnames,
+    }:
+        return False
+    return tuple(getattr(instance, attname) for attname in attnames) != old_values
+
+
+def reindex_on_commit(product_ids):
+    # the texts are read once the writer commits, outside of its transaction
+    product_ids = set(product_ids) - {None}
+    if product_ids:
+        transaction.on_commit(lambda: update_search_index(product_ids))
+
+
+def get_parent_ids(sender, instance):
+    return {
+        getattr(instance, PARENT_FIELDS[sender]),
+        getattr(instance, '_cache_old_parent_id', None),
+    }
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance, **kwargs):
+    bump_products([instance.pk], category_ids=get_parent_ids(sender, instance))
+
+
+@receiver(post_save, sender=ProductLine)
+@receiver(post_delete, sender=ProductLine)
+def product_line_changed(sender, instance, **kwargs):
+    bump_products(get_parent_ids(sender, instance))
+
+
+@receiver(post_save, sender=Product)
+def product_search_changed(sender, instance, created, update_fields, **kwargs):
+    if search_fields_changed(sender, instance, created, update_fields):
+        reindex_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=ProductLine)
+def product_line_search_changed(sender, instance, created, update_fields, **kwargs):
+    # second name, second description and sku of active lines are searched
+    if search_fields_changed(sender, instance, created, update_fields):
+        reindex_on_commit(get_parent_ids(sender, instance))
+
+
+@receiver(post_delete, sender=ProductLine)
+def product_line_search_deleted(sender, instance, **kwargs):
+    reindex_on_commit(get_parent_ids(sender, instance))
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductLineAttributeValue)
+@receiver(post_delete, sender=ProductLineAttributeValue)
+def product_line_child_changed(sender, instance, **kwargs):
+    bump_product_lines(get_parent_ids(sender, instance))
+
+
+@receiver(post_bulk_create, sender=ProductLine)
+def product_lines_bulk_created(sender, objs, **kwargs):
+    product_ids = {obj.product_id_id for obj in objs}
+    bump_products(product_ids)
+    reindex_on_commit(product_ids)
+
+
+@receiver(post_bulk_create, sender=Product)
+def products_bulk_created(sender, objs, category_ids=(), **kwargs):
+    # `category_ids` of the categories the products were moved away from
+    product_ids = {obj.pk for obj in objs}
+    bump_products(
+        product_ids,
+        category_ids={obj.category_id_id for obj in objs} | set(category_ids),
+    )
+    reindex_on_commit(product_ids)
+
+
+@receiver(post_bulk_create, sender=ProductImage)
+def product_images_bulk_created(sender, objs, **kwargs):
+    bump_product_lines({obj.product_line_id_id for obj in objs})
+
+
+@receiver(post_bulk_create, sender=ProductLineAttributeValue)
+def product_line_attribute_values_bulk_created(sender, objs, **kwargs):
+    bump_product_lines({obj.product_line_id for obj in objs})
+
+
+@receiver(m2m_changed, sender=ProductLine.attributes.through)
+def product_line_attributes_changed(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if not reverse:
+        # instance is a ProductLine
+        bump_products([instance.product_id_id])
+    elif action == 'pre_clear':
+        # instance is an AttributeValue, pk_set is not provided on clear
+        bump_product_lines(
+            instance.product_line_attribute_value.values_list('pk', flat=True)
+        )
+    else:
+        bump_product_lines(pk_set)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    # category name and slug are part of the product documents
+    mark_documents_dirty(Product.objects.filter(category_id=instance.pk).values('pk'))
+    bump_versions(
+        [
+            category_version_key(instance.pk),
+            category_products_version_key(instance.pk),
+            CATEGORY_LIST_VERSION_KEY,
+            # the tree may have been restructured, changes of categories are rare
+            CATEGORY_TREE_VERSION_KEY,
+        ]
+    )
+
+
+@receiver(post_bulk_create, sender=Category)
+def categories_bulk_created(sender, objs, **kwargs):
+    category_ids = [obj.pk for obj in objs]
+    mark_documents_dirty(
+        Product.objects.filter(category_id__in=category_ids).values('pk')
+    )
+    bump_versions(
+        [category_version_key(pk) for pk in category_ids]
+        + [category_products_version_key(pk) for pk in category_ids]
+        + [CATEGORY_LIST_VERSION_KEY, CATEGORY_TREE_VERSION_KEY]
+    )
+
+
+@receiver(node_moved, sender=Category)
+def category_moved(sender, instance, **kwargs):
+    bump_versions([CATEGORY_TREE_VERSION_KEY])
+
+
+@receiver(post_save, sender=Attribute)
+@receiver(post_delete, sender=Attribute)
+@receiver(post_save, sender=AttributeValue)
+@receiver(post_delete, sender=AttributeValue)
+@receiver(post_save, sender=ProductType)
+@receiver(post_delete, sender=ProductType)
+@receiver(post_save, sender=ProductTypeAttribute)
+@receiver(post_delete, sender=ProductTypeAttribute)
+def catalogue_changed(sender, **kwargs):
+    # attributes and product types are shared by many products, changes are rare
+    bump_versions([CATALOGUE_VERSION_KEY])
+
+
+@receiver(post_bulk_create, sender=Attribute)
+@receiver(post_bulk_create, sender=AttributeValue)
+@receiver(post_bulk_create, sender=ProductType)
+@receiver(post_bulk_create, sender=ProductTypeAttribute)
+def catalogue_bulk_created(sender, objs, **kwargs):
+    if objs:
+        bump_versions([CATALOGUE_VERSION_KEY])
+
+
+@receiver(m2m_changed, sender=ProductType.attributes.through)
+def product_type_attributes_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_versions([CATALOGUE_VERSION_KEY])
+
+
+# The response cache above drops everything on a change of these shared rows,
+# documents and modification times are per product so only the affected ones change
+
+
+@receiver(post_save, sender=Attribute)
+def attribute_changed(sender, instance, **kwargs):
+    # the attribute name is part of product_attributes
+    products_changed(
+        Product.objects.filter(product_type_id__attributes=instance.pk).values('pk')
+    )
+
+
+@receiver(post_save, sender=AttributeValue)
+def attribute_value_changed(sender, instance, **kwargs):
+    # deletions cascade to ProductLineAttributeValue, handled above
+    products_changed(
+        Product.objects.filter(product_line__attributes=instance.pk).values('pk')
+    )
+
+
+@receiver(post_save, sender=ProductTypeAttribute)
+@receiver(post_delete, sender=ProductTypeAttribute)
+def product_type_attribute_changed(sender, instance, **kwargs):
+    products_changed(
+        Product.objects.filter(product_type_id=instance.product_type_id).values('pk')
+    )
+
+
+@receiver(post_bulk_create, sender=ProductTypeAttribute)
+def product_type_attributes_bulk_created(sender, objs, **kwargs):
+    products_changed(
+        Product.objects.filter(
+            product_type_id__in={obj.product_type_id for obj in objs}
+        ).values('pk')
+    )
+
+
+@receiver(m2m_changed, sender=ProductType.attributes.through)
+def product_type_attributes_documents(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if not reverse:
+        # instance is a ProductType
+        products = Product.objects.filter(product_type_id=instance.pk)
+    elif action == 'pre_clear':
+        # instance is an Attribute, pk_set is not provided on clear
+        products = Product.objects.filter(product_type_id__attributes=instance.pk)
+    else:
+        products = Product.objects.filter(product_type_id__in=pk_set)
+    products_changed(products.values('pk'))
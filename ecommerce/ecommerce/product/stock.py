@@ -0,0 +1,126 @@
+"""
+Reservation of the stock of product lines.
+
+The quantity of a line is changed with a single conditional UPDATE:
+
+    UPDATE ... SET quantity = quantity - n WHERE sku = ... AND quantity >= n
+
+The row lock of the UPDATE serializes concurrent reservations of a line and
+the condition is evaluated on the committed quantity, so the stock is never
+oversold and no lock is held between a read and a write. save() is not used,
+it would rerun the queries of OrderingField.pre_save and the price rounding.
+"""
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ProductLine
+from .signals import bump_products
+
+
+def get_quantities(items):
+    """
+    Return {sku: quantity} of a {sku: quantity} mapping or of (sku, quantity)
+    pairs, the quantities of a repeated sku are added up.
+    """
+    if isinstance(items, dict):
+        items = items.items()
+    quantities = {}
+    for sku, quantity in items:
+        if isinstance(quantity, bool) or not isinstance(quantity, int):
+            raise TypeError(f'the quantity of {sku!r} must be an integer')
+        if quantity < 1:
+            raise ValueError(f'the quantity of {sku!r} must be positive')
+        quantities[sku] = quantities.get(sku, 0) + quantity
+    return quantities
+
+
+def change_quantity(sku, quantity):
+    """
+    Add `quantity` to the stock of a line, a negative quantity is only taken
+    when enough stock is left. Returns whether the line was updated.
+    """
+    queryset = ProductLine.objects.filter(sku=sku)
+    if quantity < 0:
+        queryset = queryset.filter(quantity__gte=-quantity)
+    # QuerySet.update() does not set auto_now fields, export_catalogue reads them
+    return bool(
+        queryset.update(quantity=F('quantity') + quantity, updated_at=timezone.now())
+    )
+
+
+def stock_changed(skus):
+    """
+    Invalidate the responses and documents of the products of the lines once
+    the transaction commits, the quantity is part of the product endpoint.
+    """
+    skus = list(skus)
+    if not skus:
+        return
+    transaction.on_commit(
+        lambda: bump_products(
+            ProductLine.objects.filter(sku__in=skus).values_list(
+                'product_id', flat=True
+            )
+        )
+    )
+
+
+def reserve_many(items):
+    """
+    Reserve the stock of several lines in one transaction.
+
+    Either all the lines are reserved or, when the stock of one of them is
+    short or its sku is unknown, none of them. The lines are updated in the
+    order of their skus so that concurrent batches lock the rows in the same
+    order and do not deadlock.
+
+    Returns:
+        list: The sorted skus which could not be reserved, empty on success.
+    """
+    quantities = get_quantities(items)
+    with transaction.atomic():
+        failed = [
+            sku
+            for sku in sorted(quantities)
+            if not change_quantity(sku, -quantities[sku])
+        ]
+        if failed:
+            # only the savepoint of this block when called in a transaction
+            transaction.set_rollback(True)
+        else:
+            stock_changed(quantities)
+    return failed
+
+
+def release_many(items):
+    """
+    Return the reserved stock of several lines in one transaction.
+
+    Returns:
+        list: The sorted unknown skus, the other lines are released.
+    """
+    quantities = get_quantities(items)
+    with transaction.atomic():
+        failed = [
+            sku
+            for sku in sorted(quantities)
+            if not change_quantity(sku, quantities[sku])
+        ]
+        stock_changed(set(quantities) - set(failed))
+    return failed
+
+
+def reserve(sku, quantity=1):
+    """
+    Reserve `quantity` of the stock of a line, return whether it was reserved.
+    """
+    return not reserve_many([(sku, quantity)])
+
+
+def release(sku, quantity=1):
+    """
+    Return `quantity` to the stock of a line, return whether the sku exists.
+    """
+    return not release_many([(sku, quantity)])
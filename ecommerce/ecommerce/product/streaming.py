@@ -0,0 +1,76 @@
+"""
+Streaming of serialized querysets, used by the catalogue export.
+
+The a-prefixed async generators are consumed by StreamingHttpResponse under
+ASGI without collecting the content in a thread.
+"""
+
+from itertools import islice
+
+from rest_framework.renderers import JSONRenderer
+
+EXPORT_CHUNK_SIZE = 100
+
+renderer = JSONRenderer()
+
+
+def iter_serialized(queryset, serializer_class, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield the serialized rows of a queryset, holding one chunk in memory.
+
+    `iterator(chunk_size)` runs the prefetch lookups of the queryset per chunk,
+    each chunk is serialized with `many=True` so the `.values()` based fast
+    serializers load the related rows per chunk as well.
+    """
+    rows = queryset.iterator(chunk_size=chunk_size)
+    while chunk := list(islice(rows, chunk_size)):
+        yield from serializer_class(chunk, many=True).data
+
+
+async def aiter_serialized(rows, serializer_class, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    iter_serialized() of async views, yield the data of `.values()` rows
+    ordered by pk, holding one chunk in memory.
+
+    Each chunk is a query of its own starting after the last pk of the
+    previous one, and is serialized with the async ORM by `adata()`.
+    """
+    last_pk = None
+    while True:
+        chunk = rows if last_pk is None else rows.filter(pk__gt=last_pk)
+        chunk = [row async for row in chunk[:chunk_size]]
+        if not chunk:
+            return
+        for item in await serializer_class(chunk, many=True).adata():
+            yield item
+        last_pk = chunk[-1]['id']
+
+
+def stream_json_array(items):
+    yield b'['
+    for i, item in enumerate(items):
+        if i:
+            yield b','
+        yield renderer.render(item)
+    yield b']'
+
+
+def stream_ndjson(items):
+    for item in items:
+        yield renderer.render(item) + b'\n'
+
+
+async def astream_json_array(items):
+    yield b'['
+    first = True
+    async for item in items:
+        if not first:
+            yield b','
+        first = False
+        yield renderer.render(item)
+    yield b']'
+
+
+async def astream_ndjson(items):
+    async for item in items:
+        yield renderer.render(item) + b'\n'
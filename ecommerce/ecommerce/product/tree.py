@@ -0,0 +1,48 @@
+"""
+Nested tree of the active categories, served by /api/category/tree/.
+
+The tree is built in one pass over the categories ordered by MPTT
+`tree_id, lft` and cached as rendered JSON, invalidated through
+CATEGORY_TREE_VERSION_KEY which product/signals.py bumps on every save,
+delete and move of a category.
+"""
+
+from rest_framework.renderers import JSONRenderer
+
+from .cache import CATEGORY_TREE_VERSION_KEY, get_or_set_response_data
+from .models import Category
+
+CATEGORY_TREE_CACHE_KEY = 'category-tree'
+
+
+def build_category_tree():
+    """
+    Return the active root categories with their active descendants nested
+    in `children`, siblings in MPTT order. Descendants of an inactive
+    category are left out together with it.
+    """
+    roots = []
+    nodes = {}
+    for pk, parent_id, name, slug, is_active in Category.objects.order_by(
+        'tree_id', 'lft'
+    ).values_list('pk', 'parent_id', 'name', 'slug', 'is_active'):
+        # a parent always precedes its children in `lft` order
+        if not is_active or (parent_id is not None and parent_id not in nodes):
+            continue
+        node = nodes[pk] = {'category_name': name, 'slug': slug, 'children': []}
+        if parent_id is None:
+            roots.append(node)
+        else:
+            nodes[parent_id]['children'].append(node)
+    return roots
+
+
+def get_category_tree_json():
+    """
+    Return the rendered category tree, from the cache when it is up to date.
+    """
+    return get_or_set_response_data(
+        CATEGORY_TREE_CACHE_KEY,
+        lambda: JSONRenderer().render(build_category_tree()),
+        lambda: [CATEGORY_TREE_VERSION_KEY],
+    )
@@ -1,35 +1,117 @@
+from hashlib import md5
+
 from rest_framework import viewsets
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from django.conf import settings
 from django.db import connection
+from django.db.models import Exists, OuterRef, Prefetch
+from django.http import HttpResponse, StreamingHttpResponse
 
 
 from .utils import inspect_queries
+from .pagination import CatalogueCursorPagination
+from .routers import ReplicaReadsMixin
+from .conditional import (
+    category_list_validators,
+    conditional_response,
+    product_list_validators,
+    product_validators,
+)
+from .documents import get_documents
+from .filters import ProductFilter
+from .search import search_product_ids
+from .tree import get_category_tree_json
+from .streaming import (
+    EXPORT_CHUNK_SIZE,
+    iter_serialized,
+    stream_json_array,
+    stream_ndjson,
+)
+from .cache import (
+    CATALOGUE_VERSION_KEY,
+    CATEGORY_LIST_VERSION_KEY,
+    CATEGORY_TREE_VERSION_KEY,
+    category_products_version_key,
+    category_subtree_version_key,
+    category_version_key,
+    get_or_set_response_data,
+    product_version_key,
+)
 
 
-from .models import Category, Product, ProductLine
+from .models import Category, Product, ProductDocument, ProductLine
 from .serializers import (
     CategorySerializer,
     ProductSerializer,
     ProductLineSerializer,
 )
+from .fast_serializers import (
+    FastCategorySerializer,
+    FastProductSerializer,
+    FastProductLineSerializer,
+)
 
 
-class CategoryViewSet(viewsets.ViewSet):
+def serializer_for(endpoint, serializer_class, fast_serializer_class, queryset):
+    """
+    Return the serializer class and queryset of an endpoint, switching to the
+    `.values()` based fast serializer when the endpoint is listed in the
+    CATALOGUE_FAST_SERIALIZERS setting.
+    """
+    if endpoint in settings.CATALOGUE_FAST_SERIALIZERS:
+        return fast_serializer_class, fast_serializer_class.get_rows(queryset)
+    return serializer_class, queryset
+
+
+class CategoryViewSet(ReplicaReadsMixin, viewsets.ViewSet):
     """
     Simple view set to view all categories
     """
 
     queryset = Category.active.all()
     serializer_class = CategorySerializer
+    pagination_class = CatalogueCursorPagination
 
     # @extend_schema(responses=CategorySerializer)  # 0r add serializer_class
     def list(self, request):
-        serializer = CategorySerializer(self.queryset, many=True)
-        return Response(serializer.data)
+        def build():
+            serializer_class, queryset = serializer_for(
+                'category-list',
+                CategorySerializer,
+                FastCategorySerializer,
+                self.queryset.all(),
+            )
+            paginator = self.pagination_class()
+            page = paginator.paginate_queryset(queryset, request, view=self)
+            serializer = serializer_class(page, many=True)
+            return paginator.get_paginated_response(serializer.data).data
+
+        cache_key = self.get_list_cache_key(request)
+        return conditional_response(
+            request,
+            category_list_validators(),
+            lambda: Response(
+                get_or_set_response_data(
+                    cache_key, build, lambda: [CATEGORY_LIST_VERSION_KEY]
+                )
+            ),
+        )
+
+    def get_list_cache_key(self, request):
+        # pagination links are absolute, so the host is part of the key
+        return 'category-list:{}'.format(
+            md5(request.build_absolute_uri().encode()).hexdigest()
+        )
+
+    @action(detail=False, methods=['get'])
+    def tree(self, request):
+        # nested active categories, served from one cached JSON blob
+        return HttpResponse(get_category_tree_json(), content_type='application/json')
 
 
-class ProductViewSet(viewsets.ViewSet):
+class ProductViewSet(ReplicaReadsMixin, viewsets.ViewSet):
     """
     Simple view set to view all products,
     and all products by category
@@ -37,33 +119,108 @@ class ProductViewSet(viewsets.ViewSet):
 
     queryset = (
         Product.active.all()
-        .select_related('category_id')
+        .select_related('category_id', 'product_type_id')
         .prefetch_related(
-            'product_line__attributes__attribute_id',
-            'product_line__product_image',
+            # attributes of every distinct product type on the page in one query
+            'product_type_id__attributes',
+            # filter active lines inside the prefetch so the serializer
+            # reads them from memory instead of issuing a query per product
+            Prefetch(
+                'product_line',
+                queryset=ProductLine.active.prefetch_related(
+                    'attributes__attribute_id',
+                    'product_image',
+                ),
+                to_attr='active_product_lines',
+            ),
         )
     )
 
     serializer_class = ProductSerializer
+    pagination_class = CatalogueCursorPagination
     lookup_field = 'slug'
 
     def retrieve(self, request, slug=None):
-        serializer = ProductSerializer(self.queryset.filter(slug=slug), many=True)
+        def build():
+            if settings.CATALOGUE_PRODUCT_DOCUMENTS:
+                document = (
+                    ProductDocument.objects.filter(slug=slug, is_dirty=False)
+                    .values_list('data', flat=True)
+                    .first()
+                )
+                if document is not None:
+                    return [document]
+            serializer_class, queryset = serializer_for(
+                'product-detail',
+                ProductSerializer,
+                FastProductSerializer,
+                self.queryset.filter(slug=slug),
+            )
+            serializer = serializer_class(queryset, many=True)
+            return serializer.data
 
-        data = Response(serializer.data)
+        def get_version_keys():
+            product = Product.active.filter(slug=slug).values_list('id', 'category_id')
+            if not product:
+                return None
+            product_id, category_id = product[0]
+            return [
+                CATALOGUE_VERSION_KEY,
+                product_version_key(product_id),
+                category_version_key(category_id),
+            ]
+
+        data = conditional_response(
+            request,
+            product_validators(slug),
+            lambda: Response(
+                get_or_set_response_data(f'product:{slug}', build, get_version_keys)
+            ),
+        )
         # function from utils.py to inspect queries
         # print(inspect_queries(connection.queries))
 
         return data
 
     def list(self, request):
+        return conditional_response(
+            request, product_list_validators(), lambda: self.list_response(request)
+        )
+
+    def list_response(self, request):
         # connection.queries.clear()
 
-        serializer = ProductSerializer(
-            self.queryset,
-            many=True,
-        )
-        data = Response(serializer.data)
+        # ?attribute_value=, ?price_min=, ?price_max=, ?is_digital=
+        product_filter = ProductFilter(request.query_params)
+        paginator = self.pagination_class()
+
+        if settings.CATALOGUE_PRODUCT_DOCUMENTS:
+            page = paginator.paginate_queryset(
+                product_filter.filter_queryset(
+                    Product.active.values('id', 'created_at')
+                ),
+                request,
+                view=self,
+            )
+            data = paginator.get_paginated_response(
+                get_documents([row['id'] for row in page])
+            )
+        else:
+            serializer_class, queryset = serializer_for(
+                'product-list',
+                ProductSerializer,
+                FastProductSerializer,
+                product_filter.filter_queryset(self.queryset.all()),
+            )
+            page = paginator.paginate_queryset(queryset, request, view=self)
+            serializer = serializer_class(
+                page,
+                many=True,
+            )
+            data = paginator.get_paginated_response(serializer.data)
+
+        if product_filter.with_facets:
+            data.data['facets'] = product_filter.get_facets(Product.active.all())
 
         # print (inspect_queries(connection.queries))
         return data
@@ -74,15 +231,117 @@ class ProductViewSet(viewsets.ViewSet):
         url_path='category/(?P<category_slug>[\w-]+)',
     )
     def list_by_category_slug(self, request, category_slug=None):
-        products_by_category = self.queryset.filter(category_id__slug=category_slug)
-        serializer = ProductSerializer(products_by_category, many=True)
+        # ?descendants=true includes products of all subcategories
+        include_descendants = request.query_params.get('descendants', '').lower() in (
+            '1',
+            'true',
+        )
+
+        def build():
+            if include_descendants:
+                # MPTT range predicate: the product category lies within the
+                # lft/rght bounds of the requested category in the same tree
+                products_by_category = self.queryset.filter(
+                    Exists(
+                        Category.objects.filter(
+                            slug=category_slug,
+                            tree_id=OuterRef('category_id__tree_id'),
+                            lft__lte=OuterRef('category_id__lft'),
+                            rght__gte=OuterRef('category_id__rght'),
+                        )
+                    )
+                )
+            else:
+                products_by_category = self.queryset.filter(
+                    category_id__slug=category_slug
+                )
+            serializer_class, products_by_category = serializer_for(
+                'product-list-by-category-slug',
+                ProductSerializer,
+                FastProductSerializer,
+                # same order as the paginated product list
+                products_by_category.order_by(*self.pagination_class.ordering),
+            )
+            serializer = serializer_class(products_by_category, many=True)
+            return serializer.data
 
-        data = Response(serializer.data)
+        def get_version_keys():
+            category = Category.objects.filter(slug=category_slug).values_list(
+                'id', flat=True
+            )
+            if not category:
+                return None
+            if include_descendants:
+                return [
+                    CATALOGUE_VERSION_KEY,
+                    CATEGORY_TREE_VERSION_KEY,
+                    category_subtree_version_key(category[0]),
+                ]
+            return [
+                CATALOGUE_VERSION_KEY,
+                category_version_key(category[0]),
+                category_products_version_key(category[0]),
+            ]
+
+        cache_key = f'product-category:{category_slug}'
+        if include_descendants:
+            cache_key += ':descendants'
+        data = Response(get_or_set_response_data(cache_key, build, get_version_keys))
         # print (inspect_queries(connection.queries))
         return data
 
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        # ?q= terms matched in name, description and active lines, best first
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': 'This query parameter is required.'})
+
+        limit = self.pagination_class().get_page_size(request)
+        product_ids = search_product_ids(query, limit)
+        serializer_class, queryset = serializer_for(
+            'product-search',
+            ProductSerializer,
+            FastProductSerializer,
+            self.queryset.filter(pk__in=product_ids),
+        )
+        position = {pk: i for i, pk in enumerate(product_ids)}
+        products = sorted(
+            queryset,
+            key=lambda product: position[
+                product['id'] if isinstance(product, dict) else product.pk
+            ],
+        )
+        serializer = serializer_class(products, many=True)
+        return Response(serializer.data)
+
+    def get_export_output(self, request):
+        # ?output=ndjson streams one product per line instead of a JSON array
+        output = request.query_params.get('output', 'json')
+        if output not in ('json', 'ndjson'):
+            raise ValidationError({'output': 'Expected "json" or "ndjson".'})
+        return output
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        output = self.get_export_output(request)
+        serializer_class, queryset = serializer_for(
+            'product-export',
+            ProductSerializer,
+            FastProductSerializer,
+            self.queryset.order_by('pk'),
+        )
+        products = iter_serialized(queryset, serializer_class, EXPORT_CHUNK_SIZE)
+        if output == 'ndjson':
+            return StreamingHttpResponse(
+                stream_ndjson(products), content_type='application/x-ndjson'
+            )
+        return StreamingHttpResponse(
+            stream_json_array(products), content_type='application/json'
+        )
 
-class ProductLineViewSet(viewsets.ViewSet):
+
+class ProductLineViewSet(ReplicaReadsMixin, viewsets.ViewSet):
     """
     A simple view set to viewing the list of product lines
     and retrieving details for a single product line
@@ -90,12 +349,26 @@ class ProductLineViewSet(viewsets.ViewSet):
 
     queryset = ProductLine.active.all()
     serializer_class = ProductLineSerializer
+    pagination_class = CatalogueCursorPagination
 
     def list(self, request):
-        serializer = ProductLineSerializer(self.queryset, many=True)
-        return Response(serializer.data)
+        serializer_class, queryset = serializer_for(
+            'product_line-list',
+            ProductLineSerializer,
+            FastProductLineSerializer,
+            self.queryset.all(),
+        )
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = serializer_class(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     def retrieve(self, request, pk=None):
-        product_line = self.queryset.filter(pk=pk)
-        serializer = ProductLineSerializer(product_line, many=True)
+        serializer_class, product_line = serializer_for(
+            'product_line-detail',
+            ProductLineSerializer,
+            FastProductLineSerializer,
+            self.queryset.filter(pk=pk),
+        )
+        serializer = serializer_class(product_line, many=True)
         return Response(serializer.data)
@@ -54,6 +54,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'ecommerce.product.middleware.ReplicaPinningMiddleware',
 ]
 
 ROOT_URLCONF = 'ecommerce.urls'
@@ -88,6 +89,40 @@ WSGI_APPLICATION = 'ecommerce.wsgi.application'
 # }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Lifetime of cached catalogue responses in seconds. Entries are invalidated
+# on writes through version keys, the timeout only bounds the cache size.
+CATALOGUE_CACHE_TIMEOUT = 60 * 15
+
+# url names of the endpoints served by product/fast_serializers.py,
+# e.g. ['product-list', 'product_line-list']
+CATALOGUE_FAST_SERIALIZERS = []
+
+# serve product list and detail from ProductDocument rows,
+# rebuilt by `manage.py rebuild_product_documents`
+CATALOGUE_PRODUCT_DOCUMENTS = False
+
+# register the async view sets of product/async_views.py, for ASGI deployments
+CATALOGUE_ASYNC_VIEWS = False
+
+# database alias the reads of the catalogue api are sent to, e.g. 'replica',
+# see ecommerce.product.routers
+CATALOGUE_REPLICA_DATABASE = None
+# reads of a client stay on the primary this long after its last write,
+# responses cached from the replica expire after this as well
+CATALOGUE_REPLICA_PIN_SECONDS = 10
+
+DATABASE_ROUTERS = ['ecommerce.product.routers.CatalogueReplicaRouter']
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -130,4 +165,7 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
-REST_FRAMEWORK = {}
+REST_FRAMEWORK = {
+    # default page size of CatalogueCursorPagination
+    'PAGE_SIZE': 20,
+}
@@ -0,0 +1,12 @@
+from .local import *
+
+# Settings for the benchmark suite in ecommerce/tests/benchmarks.
+# BENCHMARK_DATABASE=sqlite runs it against SQLite instead of the local Postgres.
+
+if os.environ.get('BENCHMARK_DATABASE', 'postgres') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'benchmark.sqlite3',
+        }
+    }
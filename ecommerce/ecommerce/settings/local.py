@@ -9,6 +9,7 @@ from .base import *
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'PAGE_SIZE': 20,
 }
 
 
@@ -28,3 +29,15 @@ DATABASES = {
         'PORT': '5432',
     }
 }
+
+
+# Report SQL executed per request in response headers and logs,
+# see ecommerce.product.middleware.SQLProfilerMiddleware
+if os.environ.get('SQL_PROFILER'):
+    MIDDLEWARE += ['ecommerce.product.middleware.SQLProfilerMiddleware']
+
+SQL_PROFILER = {
+    'QUERY_BUDGET': 50,
+    'SLOWEST': 5,
+    'VERBOSE': False,
+}
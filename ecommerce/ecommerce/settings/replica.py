@@ -0,0 +1,17 @@
+from .local import *
+
+# Two SQLite databases standing in for a primary and its read replica, used by
+# ecommerce/tests/product/test_routers.py:
+#
+#     pytest --ds=ecommerce.settings.replica ecommerce/tests/product/test_routers.py
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'primary.sqlite3',
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'replica.sqlite3',
+    },
+}
@@ -0,0 +1,384 @@
+"""
+Benchmarks of the /api/ endpoints on a seeded catalogue.
+
+Skipped unless BENCHMARK=1 is set. Run with:
+
+    BENCHMARK=1 pytest --ds=ecommerce.settings.benchmark ecommerce/tests/benchmarks
+
+A catalogue of 100k product lines:
+
+    BENCHMARK=1 BENCHMARK_PRODUCTS=33334 BENCHMARK_ITERATIONS=10 pytest ...
+
+Environment variables:
+    BENCHMARK_DATABASE: 'postgres' (default) or 'sqlite'
+    BENCHMARK_PRODUCTS: number of products (200)
+    BENCHMARK_LINES: product lines per product (3)
+    BENCHMARK_IMAGES: images per product line (2)
+    BENCHMARK_ATTRIBUTES: attributes per product type (3)
+    BENCHMARK_ATTRIBUTE_VALUES: values per attribute (4)
+    BENCHMARK_CATEGORY_DEPTH: levels of the category tree (3)
+    BENCHMARK_CATEGORY_CHILDREN: subcategories per category (3)
+    BENCHMARK_ITERATIONS: requests per endpoint (30)
+    BENCHMARK_WORKERS: concurrent workers of the load benchmarks (8)
+    BENCHMARK_LOAD_REQUESTS: requests per endpoint of the load benchmarks (400)
+    BENCHMARK_OUTPUT: JSON file with the results (benchmark.json)
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from statistics import mean, quantiles
+
+import pytest
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from ecommerce.product.models import (
+    ProductImage,
+    ProductLine,
+    ProductLineAttributeValue,
+)
+from ecommerce.tests.factories import (
+    AttributeFactory,
+    AttributeValueFactory,
+    CategoryFactory,
+    ProductFactory,
+    ProductImageFactory,
+    ProductLineFactory,
+    ProductTypeFactory,
+)
+
+
+def env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+CATALOGUE_SIZE = {
+    'products': env_int('BENCHMARK_PRODUCTS', 200),
+    'lines_per_product': env_int('BENCHMARK_LINES', 3),
+    'images_per_line': env_int('BENCHMARK_IMAGES', 2),
+    'attributes': env_int('BENCHMARK_ATTRIBUTES', 3),
+    'attribute_values': env_int('BENCHMARK_ATTRIBUTE_VALUES', 4),
+    'category_depth': env_int('BENCHMARK_CATEGORY_DEPTH', 3),
+    'category_children': env_int('BENCHMARK_CATEGORY_CHILDREN', 3),
+}
+ITERATIONS = env_int('BENCHMARK_ITERATIONS', 30)
+WORKERS = env_int('BENCHMARK_WORKERS', 8)
+LOAD_REQUESTS = env_int('BENCHMARK_LOAD_REQUESTS', 400)
+
+
+def pytest_collection_modifyitems(config, items):
+    if os.environ.get('BENCHMARK'):
+        return
+    skip = pytest.mark.skip(reason='set BENCHMARK=1 to run the benchmarks')
+    for item in items:
+        if 'benchmarks' in item.nodeid.split('/'):
+            item.add_marker(skip)
+
+
+def seed_catalogue(size):
+    """
+    Create a catalogue of the given size with the factories of the test suite.
+
+    Categories and products are created one by one, product lines, images
+    and their attributes with the bulk paths of the product managers.
+    """
+    levels = [[CategoryFactory(slug='root', is_active=True)]]
+    for _ in range(1, size['category_depth']):
+        levels.append(
+            [
+                CategoryFactory(parent=parent, is_active=True)
+                for parent in levels[-1]
+                for _ in range(size['category_children'])
+            ]
+        )
+    leaves = levels[-1]
+
+    attributes = [
+        AttributeFactory(name=f'attribute-{n}') for n in range(size['attributes'])
+    ]
+    attribute_values = [
+        AttributeValueFactory.create_batch(size['attribute_values'], attribute_id=a)
+        for a in attributes
+    ]
+    product_type = ProductTypeFactory(attributes=attributes)
+
+    products = [
+        ProductFactory(
+            slug=f'product-{n}',
+            category_id=leaves[n % len(leaves)],
+            product_type_id=product_type,
+            is_digital=n % 5 == 0,
+            is_active=True,
+        )
+        for n in range(size['products'])
+    ]
+    product_lines = ProductLine.objects.bulk_create_ordered(
+        ProductLineFactory.build(
+            slug=f'{product.slug}-{n}',
+            product_id=product,
+            product_type_id=product_type,
+            display_order=None,
+            is_active=True,
+        )
+        for product in products
+        for n in range(size['lines_per_product'])
+    )
+    ProductImage.objects.bulk_create_ordered(
+        ProductImageFactory.build(product_line_id=product_line)
+        for product_line in product_lines
+        for _ in range(size['images_per_line'])
+    )
+    # one value per attribute, every combination of values occurs
+    ProductLineAttributeValue.objects.bulk_attach(
+        (product_line, values[n // len(values) ** i % len(values)])
+        for n, product_line in enumerate(product_lines)
+        for i, values in enumerate(attribute_values)
+    )
+
+    return {
+        'product': products[0],
+        'product_line': product_lines[0],
+        'category': leaves[0],
+        'root_category': levels[0][0],
+        'attribute_values': attribute_values,
+    }
+
+
+@pytest.fixture(scope='session')
+def catalogue(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        start = time.perf_counter()
+        objects = seed_catalogue(CATALOGUE_SIZE)
+        objects['seed_seconds'] = round(time.perf_counter() - start, 3)
+        yield objects
+        call_command('flush', interactive=False, verbosity=0)
+
+
+@pytest.fixture(scope='session')
+def benchmark_results(catalogue):
+    results = {}
+    yield results
+
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        commit = None
+    with open(os.environ.get('BENCHMARK_OUTPUT', 'benchmark.json'), 'w') as file:
+        json.dump(
+            {
+                'commit': commit,
+                'database': connection.vendor,
+                'catalogue': CATALOGUE_SIZE,
+                'seed_seconds': catalogue['seed_seconds'],
+                'iterations': ITERATIONS,
+                'endpoints': results,
+            },
+            file,
+            indent=2,
+        )
+
+
+@pytest.fixture
+def benchmark(benchmark_results):
+    """
+    Request an url repeatedly and record latency, query count and peak memory.
+
+    The response cache is cleared before every request, so the serializer
+    and view code is measured rather than the cache.
+    """
+
+    def get(client, url):
+        response = client.get(url)
+        if response.streaming:
+            # streamed responses are rendered while they are consumed
+            for _ in response.streaming_content:
+                pass
+        return response
+
+    def run(name, url, iterations=ITERATIONS):
+        client = APIClient()
+        timings = []
+        for _ in range(iterations):
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = get(client, url)
+                timings.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200
+            # connection.queries is reset by the next request
+            num_queries = len(context.captured_queries)
+
+        cache.clear()
+        tracemalloc.start()
+        get(client, url)
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        percentiles = quantiles(timings, n=100, method='inclusive')
+        benchmark_results[name] = {
+            'url': url,
+            'p50_ms': round(percentiles[49], 3),
+            'p90_ms': round(percentiles[89], 3),
+            'p99_ms': round(percentiles[98], 3),
+            'mean_ms': round(mean(timings), 3),
+            'queries': num_queries,
+            'peak_memory_kb': round(peak_memory / 1024, 1),
+        }
+        return benchmark_results[name]
+
+    return run
+
+
+def wsgi_get(handler, url):
+    path, _, query = url.partition('?')
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'testserver',
+        'wsgi.input': BytesIO(),
+        'wsgi.url_scheme': 'http',
+    }
+    status = []
+    response = handler(environ, lambda line, headers: status.append(line))
+    try:
+        for _ in response:
+            pass
+    finally:
+        # sends request_finished, which closes the database connection
+        response.close()
+    return int(status[0].split()[0])
+
+
+async def asgi_get(handler, url):
+    path, _, query = url.partition('?')
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [(b'host', b'testserver')],
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 0),
+    }
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if request_sent:
+            # the client stays connected until the response is sent
+            await asyncio.Future()
+        request_sent = True
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    await handler(scope, receive, send)
+    return messages[0]['status']
+
+
+def run_wsgi(url, workers, requests):
+    handler = WSGIHandler()
+
+    def worker(count):
+        timings = []
+        try:
+            for _ in range(count):
+                start = time.perf_counter()
+                assert wsgi_get(handler, url) == 200
+                timings.append((time.perf_counter() - start) * 1000)
+        finally:
+            connections.close_all()
+        return timings
+
+    with ThreadPoolExecutor(workers) as executor:
+        start = time.perf_counter()
+        timings = executor.map(worker, split(requests, workers))
+        timings = [timing for worker_timings in timings for timing in worker_timings]
+        return timings, time.perf_counter() - start
+
+
+def run_asgi(url, workers, requests):
+    handler = ASGIHandler()
+
+    async def worker(count):
+        timings = []
+        for _ in range(count):
+            start = time.perf_counter()
+            assert await asgi_get(handler, url) == 200
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    async def run():
+        start = time.perf_counter()
+        timings = await asyncio.gather(
+            *(worker(count) for count in split(requests, workers))
+        )
+        timings = [timing for worker_timings in timings for timing in worker_timings]
+        return timings, time.perf_counter() - start
+
+    return asyncio.run(run())
+
+
+def split(requests, workers):
+    return [requests // workers + (n < requests % workers) for n in range(workers)]
+
+
+@pytest.fixture
+def load_benchmark(benchmark_results, settings):
+    """
+    Serve requests of an url by a fixed number of concurrent workers and
+    record requests/sec and latency.
+
+    'wsgi' calls the WSGI handler from one thread per worker, like the
+    threads of a WSGI server, 'asgi' the ASGI handler from one task per
+    worker on a single event loop, like an ASGI server. Both run in process
+    without a server or sockets. The response cache is disabled, so the
+    view code is measured rather than the cache.
+    """
+    settings.CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+    }
+    runners = {'wsgi': run_wsgi, 'asgi': run_asgi}
+
+    def run(name, url, interface, workers=WORKERS, requests=LOAD_REQUESTS):
+        timings, seconds = runners[interface](url, workers, requests)
+
+        percentiles = quantiles(timings, n=100, method='inclusive')
+        benchmark_results[name] = {
+            'url': url,
+            'interface': interface,
+            'workers': workers,
+            'requests': requests,
+            'requests_per_second': round(requests / seconds, 1),
+            'p50_ms': round(percentiles[49], 3),
+            'p99_ms': round(percentiles[98], 3),
+            'mean_ms': round(mean(timings), 3),
+        }
+        return benchmark_results[name]
+
+    return run
@@ -0,0 +1,122 @@
+import pytest
+
+from ecommerce.product.documents import rebuild_documents
+
+pytestmark = pytest.mark.django_db
+
+
+class TestEndpointBenchmarks:
+    def test_category_list(self, catalogue, benchmark):
+        benchmark('category-list', '/api/category/?page_size=100')
+
+    def test_product_list(self, catalogue, benchmark):
+        benchmark('product-list', '/api/product/?page_size=100')
+
+    def test_product_detail(self, catalogue, benchmark):
+        benchmark('product-detail', f'/api/product/{catalogue["product"].slug}/')
+
+    def test_product_list_by_category(self, catalogue, benchmark):
+        benchmark(
+            'product-list-by-category',
+            f'/api/product/category/{catalogue["category"].slug}/',
+        )
+
+    def test_product_list_by_category_descendants(self, catalogue, benchmark):
+        benchmark(
+            'product-list-by-category-descendants',
+            f'/api/product/category/{catalogue["root_category"].slug}/'
+            '?descendants=true',
+        )
+
+    def test_product_line_list(self, catalogue, benchmark):
+        benchmark('product-line-list', '/api/product-line/?page_size=100')
+
+    def test_product_line_detail(self, catalogue, benchmark):
+        benchmark(
+            'product-line-detail',
+            f'/api/product-line/{catalogue["product_line"].pk}/',
+        )
+
+
+class TestFastSerializerBenchmarks:
+    """
+    Same endpoints served by product/fast_serializers.py, recorded as '<name>-fast'
+    """
+
+    @pytest.fixture(autouse=True)
+    def fast_serializers(self, settings):
+        settings.CATALOGUE_FAST_SERIALIZERS = [
+            'category-list',
+            'product-list',
+            'product-detail',
+            'product-list-by-category-slug',
+            'product_line-list',
+            'product_line-detail',
+        ]
+
+    def test_product_list(self, catalogue, benchmark):
+        benchmark('product-list-fast', '/api/product/?page_size=100')
+
+    def test_product_detail(self, catalogue, benchmark):
+        benchmark('product-detail-fast', f'/api/product/{catalogue["product"].slug}/')
+
+    def test_product_list_by_category(self, catalogue, benchmark):
+        benchmark(
+            'product-list-by-category-fast',
+            f'/api/product/category/{catalogue["category"].slug}/',
+        )
+
+    def test_product_line_list(self, catalogue, benchmark):
+        benchmark('product-line-list-fast', '/api/product-line/?page_size=100')
+
+
+class TestProductDocumentBenchmarks:
+    """
+    Product list and detail served from rebuilt ProductDocument rows
+    """
+
+    @pytest.fixture(autouse=True)
+    def product_documents(self, settings, catalogue):
+        settings.CATALOGUE_PRODUCT_DOCUMENTS = True
+        rebuild_documents()
+
+    def test_product_list(self, benchmark):
+        benchmark('product-list-documents', '/api/product/?page_size=100')
+
+    def test_product_detail(self, catalogue, benchmark):
+        benchmark(
+            'product-detail-documents', f'/api/product/{catalogue["product"].slug}/'
+        )
+
+
+class TestExportBenchmarks:
+    """
+    Peak memory of the streamed export must not grow with the catalogue size
+    """
+
+    def test_product_export(self, catalogue, benchmark):
+        benchmark('product-export', '/api/product/export/', iterations=3)
+
+    def test_product_export_ndjson(self, catalogue, benchmark):
+        benchmark(
+            'product-export-ndjson', '/api/product/export/?output=ndjson', iterations=3
+        )
+
+
+class TestFilterBenchmarks:
+    def test_product_list_by_attribute_values(self, catalogue, benchmark):
+        first, second = catalogue['attribute_values'][:2]
+        benchmark(
+            'product-list-attribute-filter',
+            f'/api/product/?page_size=100&attribute_value={first[0].pk},{first[1].pk}'
+            f'&attribute_value={second[0].pk}',
+        )
+
+    def test_product_list_by_price_and_is_digital(self, catalogue, benchmark):
+        benchmark(
+            'product-list-price-filter',
+            '/api/product/?page_size=100&price_min=100&price_max=5000&is_digital=false',
+        )
+
+    def test_product_list_facets(self, catalogue, benchmark):
+        benchmark('product-list-facets', '/api/product/?page_size=100&facets=true')
@@ -0,0 +1,123 @@
+import json
+import time
+
+import pytest
+
+from ecommerce.product.importer import IMPORT_BATCH_SIZE, CatalogueImporter
+
+from .conftest import CATALOGUE_SIZE
+
+pytestmark = pytest.mark.django_db
+
+
+def write_ndjson(path, rows):
+    with path.open('w') as file:
+        for row in rows:
+            file.write(json.dumps(row) + '\n')
+    return path
+
+
+@pytest.fixture
+def import_files(tmp_path):
+    """
+    Files of a catalogue of the benchmark size, next to the seeded one.
+    """
+    size = CATALOGUE_SIZE
+    categories = [f'import-{n}' for n in range(size['category_children'] ** 2)]
+    values = [f'value-{n}' for n in range(size['attribute_values'])]
+    attributes = [f'import-attribute-{n}' for n in range(size['attributes'])]
+    products = [f'import-product-{n}' for n in range(size['products'])]
+    product_lines = [
+        f'{product}-{n}'
+        for product in products
+        for n in range(size['lines_per_product'])
+    ]
+    return {
+        'categories': write_ndjson(
+            tmp_path / 'categories.ndjson',
+            (
+                {
+                    'slug': slug,
+                    'name': slug,
+                    'parent': (
+                        categories[n // size['category_children']]
+                        if n >= size['category_children']
+                        else None
+                    ),
+                    'is_active': True,
+                }
+                for n, slug in enumerate(categories)
+            ),
+        ),
+        'attributes': write_ndjson(
+            tmp_path / 'attributes.ndjson',
+            ({'name': name, 'values': values} for name in attributes),
+        ),
+        'product_types': write_ndjson(
+            tmp_path / 'product_types.ndjson',
+            [{'name': 'import-type', 'attributes': attributes}],
+        ),
+        'products': write_ndjson(
+            tmp_path / 'products.ndjson',
+            (
+                {
+                    'slug': slug,
+                    'name': slug,
+                    'pid': f'I{n}',
+                    'category': categories[n % len(categories)],
+                    'product_type': 'import-type',
+                    'is_active': True,
+                }
+                for n, slug in enumerate(products)
+            ),
+        ),
+        'product_lines': write_ndjson(
+            tmp_path / 'product_lines.ndjson',
+            (
+                {
+                    'slug': slug,
+                    'sku': slug,
+                    'product': slug.rsplit('-', 1)[0],
+                    'product_type': 'import-type',
+                    'price': '9.99',
+                    'is_active': True,
+                    'attributes': {
+                        name: values[n % len(values)] for name in attributes
+                    },
+                }
+                for n, slug in enumerate(product_lines)
+            ),
+        ),
+        'images': write_ndjson(
+            tmp_path / 'images.ndjson',
+            (
+                {'product_line': slug, 'display_order': n + 1, 'url': f'{slug}.jpg'}
+                for slug in product_lines
+                for n in range(size['images_per_line'])
+            ),
+        ),
+    }
+
+
+class TestImportBenchmarks:
+    def test_import_catalogue(self, import_files, benchmark_results):
+        importer = CatalogueImporter()
+        for kind, path in import_files.items():
+            start = time.perf_counter()
+            rows = importer.import_file(path)
+            seconds = time.perf_counter() - start
+
+            benchmark_results[f'import-{kind}'] = {
+                'rows': rows,
+                'batch_size': IMPORT_BATCH_SIZE,
+                'seconds': round(seconds, 3),
+                'rows_per_second': round(rows / seconds, 1),
+            }
+
+        # invalidation and search index of all the changed products
+        start = time.perf_counter()
+        importer.flush()
+        benchmark_results['import-flush'] = {
+            'products': CATALOGUE_SIZE['products'],
+            'seconds': round(time.perf_counter() - start, 3),
+        }
@@ -0,0 +1,34 @@
+import pytest
+
+pytestmark = pytest.mark.django_db
+
+
+class TestLoadBenchmarks:
+    """
+    The same endpoint at the same number of workers, recorded as
+    '<name>-wsgi': view sets of views.py under WSGI,
+    '<name>-wsgi-fast': the same with the fast serializers, which the async
+        view sets always use,
+    '<name>-asgi': async view sets under ASGI.
+    """
+
+    @pytest.fixture
+    def urls(self, catalogue):
+        return {
+            'category-list': '/api/category/?page_size=100',
+            'product-list': '/api/product/?page_size=100',
+            'product-detail': f'/api/product/{catalogue["product"].slug}/',
+            'product_line-list': '/api/product-line/?page_size=100',
+        }
+
+    @pytest.mark.parametrize(
+        'name', ['category-list', 'product-list', 'product-detail', 'product_line-list']
+    )
+    def test_wsgi_and_asgi(self, urls, load_benchmark, request, settings, name):
+        load_benchmark(f'{name}-wsgi', urls[name], 'wsgi')
+
+        settings.CATALOGUE_FAST_SERIALIZERS = [name]
+        load_benchmark(f'{name}-wsgi-fast', urls[name], 'wsgi')
+
+        request.getfixturevalue('async_views')
+        load_benchmark(f'{name}-asgi', urls[name], 'asgi')
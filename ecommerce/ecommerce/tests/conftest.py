@@ -1,3 +1,7 @@
+from importlib import reload
+
+from django.core.cache import cache
+from django.urls import clear_url_caches
 from pytest_factoryboy import register
 from rest_framework.test import APIClient
 import pytest
@@ -18,6 +22,31 @@ def api_client():
     return APIClient
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # cached responses outlive the rolled back database of the previous test
+    cache.clear()
+
+
+@pytest.fixture
+def async_views(settings):
+    """
+    Serve the api with the async view sets of product/async_views.py.
+    """
+    from ecommerce import urls
+
+    def reload_urls():
+        # the view sets are picked when urls.py is imported
+        reload(urls)
+        clear_url_caches()
+
+    settings.CATALOGUE_ASYNC_VIEWS = True
+    reload_urls()
+    yield
+    settings.CATALOGUE_ASYNC_VIEWS = False
+    reload_urls()
+
+
 register(CategoryFactory)
 register(ProductFactory)
 register(ProductLineFactory)  # fixture name: product_line_factory
@@ -0,0 +1,112 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+pytestmark = pytest.mark.django_db
+
+
+class TestAdminChangelists:
+    @pytest.mark.parametrize(
+        'model, factory',
+        [
+            ('category', 'category_factory'),
+            ('product', 'product_factory'),
+            ('productline', 'product_line_factory'),
+            ('productimage', 'product_image_factory'),
+            ('attributevalue', 'attribute_value_factory'),
+            ('attribute', 'attribute_factory'),
+            ('producttype', 'product_type_factory'),
+        ],
+    )
+    def test_queries_do_not_grow_with_rows(self, model, factory, admin_client, request):
+        # every row has its own related objects, shown by the __str__ methods
+        factory = request.getfixturevalue(factory)
+        url = f'/admin/product/{model}/'
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = admin_client.get(url)
+            assert response.status_code == 200
+            return len(queries)
+
+        factory.create_batch(2)
+        num_queries = count_queries()
+        factory.create_batch(8)
+
+        assert count_queries() == num_queries
+
+    def test_big_tables_skip_full_count(self, product_factory, admin_client):
+        product_factory.create_batch(3)
+
+        with CaptureQueriesContext(connection) as queries:
+            admin_client.get('/admin/product/product/')
+
+        counts = [q['sql'] for q in queries if 'COUNT(' in q['sql'].upper()]
+        # only the count of the result, not of the whole table
+        assert len(counts) == 1
+
+
+class TestAdminAutocomplete:
+    @pytest.mark.parametrize(
+        'model, field, factory',
+        [
+            ('productline', 'product_id', 'product_line_factory'),
+            ('productimage', 'product_line_id', 'product_image_factory'),
+            ('product', 'category_id', 'product_factory'),
+        ],
+    )
+    def test_foreign_keys_use_autocomplete(
+        self, model, field, factory, admin_client, request
+    ):
+        obj = request.getfixturevalue(factory)()
+
+        response = admin_client.get(f'/admin/product/{model}/{obj.pk}/change/')
+
+        assert response.status_code == 200
+        widget = response.context['adminform'].form.fields[field].widget
+        assert widget.widget.__class__.__name__ == 'AutocompleteSelect'
+
+    def test_autocomplete_search(self, product_factory, admin_client):
+        product_factory(name='Red shoe')
+        product_factory(name='Blue hat')
+
+        response = admin_client.get(
+            '/admin/autocomplete/',
+            {
+                'app_label': 'product',
+                'model_name': 'productline',
+                'field_name': 'product_id',
+                'term': 'shoe',
+            },
+        )
+
+        assert response.status_code == 200
+        assert [r['text'] for r in response.json()['results']] == ['Red shoe']
+
+
+class TestProductLineAdmin:
+    def test_add_page(self, admin_client):
+        # the attribute value inline of a product line without a product type
+        response = admin_client.get('/admin/product/productline/add/')
+
+        assert response.status_code == 200
+
+    def test_change_page_queries_do_not_grow_with_rows(
+        self, product_line_factory, attribute_value_factory, admin_client
+    ):
+        product_line = product_line_factory(attributes=[attribute_value_factory()])
+        url = f'/admin/product/productline/{product_line.pk}/change/'
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = admin_client.get(url)
+            assert response.status_code == 200
+            return len(queries)
+
+        num_queries = count_queries()
+        for _ in range(4):
+            value = attribute_value_factory()
+            product_line.product_type_id.attributes.add(value.attribute_id)
+            product_line.attributes.add(value)
+
+        assert count_queries() == num_queries
@@ -0,0 +1,117 @@
+import json
+from inspect import iscoroutinefunction
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import connection
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+
+pytestmark = pytest.mark.django_db
+
+
+def get(url, headers=None):
+    async def request():
+        return await AsyncClient().get(url, headers=headers)
+
+    return async_to_sync(request)()
+
+
+class TestAsyncViews:
+    @pytest.fixture
+    def catalogue(
+        self,
+        category_factory,
+        product_factory,
+        product_line_factory,
+        product_image_factory,
+        attribute_value_factory,
+    ):
+        category = category_factory(slug='category', is_active=True)
+        for n in range(3):
+            product = product_factory(
+                slug=f'product-{n}', category_id=category, is_active=True
+            )
+            for _ in range(2):
+                product_line = product_line_factory(
+                    product_id=product,
+                    is_active=True,
+                    attributes=[attribute_value_factory()],
+                )
+                product_image_factory(product_line_id=product_line)
+        product_factory(slug='no-category', category_id=None, is_active=True)
+
+        return [
+            '/api/category/',
+            '/api/category/tree/',
+            '/api/product/',
+            '/api/product/?page_size=2',
+            f'/api/product/{product.slug}/',
+            '/api/product/missing/',
+            '/api/product/?is_digital=false',
+            '/api/product/category/category/',
+            '/api/product-line/?page_size=4',
+            f'/api/product-line/{product_line.pk}/',
+        ]
+
+    def test_same_responses_as_sync_views(self, catalogue, api_client, request):
+        def get_pages(get, url):
+            # follow the cursor links of paginated lists
+            pages = []
+            while url:
+                response = get(url)
+                data = json.loads(response.content)
+                pages.append((response.status_code, data))
+                url = data.get('next') if isinstance(data, dict) else None
+            return pages
+
+        expected = {url: get_pages(api_client().get, url) for url in catalogue}
+        cache.clear()
+        request.getfixturevalue('async_views')
+
+        for url in catalogue:
+            assert get_pages(get, url) == expected[url], url
+
+    def test_views_are_coroutines(self, async_views):
+        for url in ('/api/category/', '/api/product/', '/api/product-line/'):
+            assert iscoroutinefunction(resolve(url).func)
+
+    def test_conditional_get(self, catalogue, async_views):
+        response = get('/api/product/')
+        assert response.status_code == 200
+
+        response = get('/api/product/', headers={'If-None-Match': response['ETag']})
+
+        assert response.status_code == 304
+
+    def test_product_detail_is_cached(self, catalogue, async_views):
+        url = '/api/product/product-0/'
+        get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = get(url)
+
+        assert response.status_code == 200
+        # only the ETag / Last-Modified validator query
+        assert len(queries) == 1
+
+    def test_export_is_streamed_asynchronously(
+        self, catalogue, api_client, request, monkeypatch
+    ):
+        from ecommerce.product import async_views
+
+        urls = ['/api/product/export/', '/api/product/export/?output=ndjson']
+        expected = [b''.join(api_client().get(url).streaming_content) for url in urls]
+        request.getfixturevalue('async_views')
+        # several chunks
+        monkeypatch.setattr(async_views, 'EXPORT_CHUNK_SIZE', 2)
+
+        async def export(url):
+            response = await AsyncClient().get(url)
+            # an async iterator, not collected with sync_to_async(list)
+            assert response.is_async
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        for url, content in zip(urls, expected):
+            assert async_to_sync(export)(url) == content, url
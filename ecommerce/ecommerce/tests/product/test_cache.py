@@ -0,0 +1,161 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from ecommerce.product.models import ProductImage
+
+pytestmark = pytest.mark.django_db
+
+
+def get(api_client, url):
+    with CaptureQueriesContext(connection) as context:
+        response = api_client().get(url)
+    assert response.status_code == 200
+    return response.data, len(context.captured_queries)
+
+
+class TestProductDetailCache:
+    endpoint = '/api/product/'
+
+    @pytest.fixture
+    def active_product_line(self, product_factory, product_line_factory):
+        product = product_factory(slug='product-1', is_active=True)
+        return product_line_factory(product_id=product, is_active=True, price=10)
+
+    def test_second_request_is_served_from_cache(self, active_product_line, api_client):
+        first, _ = get(api_client, f'{self.endpoint}product-1/')
+        second, num_queries = get(api_client, f'{self.endpoint}product-1/')
+
+        # only the ETag / Last-Modified validator query
+        assert num_queries == 1
+        assert second == first
+
+    def test_product_line_update(self, active_product_line, api_client):
+        get(api_client, f'{self.endpoint}product-1/')
+
+        active_product_line.price = 20
+        active_product_line.save()
+        data, num_queries = get(api_client, f'{self.endpoint}product-1/')
+
+        assert num_queries > 0
+        assert data[0]['product_line'][0]['price'] == '20.00'
+
+    def test_product_line_delete(self, active_product_line, api_client):
+        get(api_client, f'{self.endpoint}product-1/')
+
+        active_product_line.delete()
+        data, _ = get(api_client, f'{self.endpoint}product-1/')
+
+        assert data[0]['product_line'] == []
+
+    def test_product_image_create(
+        self, active_product_line, product_image_factory, api_client
+    ):
+        get(api_client, f'{self.endpoint}product-1/')
+
+        product_image_factory(
+            product_line_id=active_product_line, alternative_text='new'
+        )
+        data, _ = get(api_client, f'{self.endpoint}product-1/')
+
+        images = data[0]['product_line'][0]['product_image']
+        assert [image['alternative_text'] for image in images] == ['new']
+
+    def test_product_image_bulk_create(self, active_product_line, api_client):
+        get(api_client, f'{self.endpoint}product-1/')
+
+        ProductImage.objects.bulk_create_ordered(
+            [ProductImage(product_line_id=active_product_line) for _ in range(2)]
+        )
+        data, _ = get(api_client, f'{self.endpoint}product-1/')
+
+        assert len(data[0]['product_line'][0]['product_image']) == 2
+
+    def test_product_line_attributes_add(
+        self, active_product_line, attribute_value_factory, api_client
+    ):
+        get(api_client, f'{self.endpoint}product-1/')
+
+        attribute_value = attribute_value_factory(value='Red')
+        active_product_line.attributes.add(attribute_value)
+        data, _ = get(api_client, f'{self.endpoint}product-1/')
+
+        assert data[0]['product_line'][0]['attributes'] == {
+            attribute_value.attribute_id.id: 'Red'
+        }
+
+    def test_attribute_value_update(
+        self, active_product_line, attribute_value_factory, api_client
+    ):
+        attribute_value = attribute_value_factory(value='Red')
+        active_product_line.attributes.add(attribute_value)
+        get(api_client, f'{self.endpoint}product-1/')
+
+        attribute_value.value = 'Blue'
+        attribute_value.save()
+        data, _ = get(api_client, f'{self.endpoint}product-1/')
+
+        assert data[0]['product_line'][0]['attributes'] == {
+            attribute_value.attribute_id.id: 'Blue'
+        }
+
+    def test_category_rename(self, active_product_line, api_client):
+        get(api_client, f'{self.endpoint}product-1/')
+
+        category = active_product_line.product_id.category_id
+        category.name = 'renamed'
+        category.save()
+        data, _ = get(api_client, f'{self.endpoint}product-1/')
+
+        assert data[0]['category_name'] == 'renamed'
+
+    def test_product_deactivate(self, active_product_line, api_client):
+        get(api_client, f'{self.endpoint}product-1/')
+
+        product = active_product_line.product_id
+        product.is_active = False
+        product.save()
+        data, _ = get(api_client, f'{self.endpoint}product-1/')
+
+        assert data == []
+
+
+class TestCategoryCache:
+    def test_list_by_category_slug(self, category_factory, product_factory, api_client):
+        category = category_factory(slug='category-1', is_active=True)
+        product_factory(category_id=category, is_active=True)
+        url = '/api/product/category/category-1/'
+        get(api_client, url)
+        _, num_queries = get(api_client, url)
+        assert num_queries == 0
+
+        product_factory(category_id=category, is_active=True)
+        data, _ = get(api_client, url)
+
+        assert len(data) == 2
+
+    def test_list_by_category_slug_product_moved(
+        self, category_factory, product_factory, api_client
+    ):
+        category = category_factory(slug='category-1', is_active=True)
+        product = product_factory(category_id=category, is_active=True)
+        get(api_client, '/api/product/category/category-1/')
+
+        # the category the product was moved away from is invalidated too
+        product.category_id = category_factory(is_active=True)
+        product.save()
+        data, _ = get(api_client, '/api/product/category/category-1/')
+
+        assert data == []
+
+    def test_category_list(self, category_factory, api_client):
+        category_factory(is_active=True)
+        get(api_client, '/api/category/')
+        _, num_queries = get(api_client, '/api/category/')
+        # only the ETag / Last-Modified validator query
+        assert num_queries == 1
+
+        category_factory(is_active=True)
+        data, _ = get(api_client, '/api/category/')
+
+        assert len(data['results']) == 2
@@ -0,0 +1,104 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+pytestmark = pytest.mark.django_db
+
+
+class TestConditionalGet:
+    @pytest.fixture
+    def product(
+        self,
+        category_factory,
+        product_factory,
+        product_type_factory,
+        attribute_factory,
+        attribute_value_factory,
+        product_line_factory,
+        product_image_factory,
+    ):
+        attribute = attribute_factory()
+        product = product_factory(
+            slug='product-1',
+            category_id=category_factory(is_active=True),
+            product_type_id=product_type_factory(attributes=[attribute]),
+            is_active=True,
+        )
+        product_image_factory(
+            product_line_id=product_line_factory(
+                product_id=product,
+                is_active=True,
+                attributes=[attribute_value_factory(attribute_id=attribute)],
+            )
+        )
+        return product
+
+    def assert_not_modified(self, api_client, url, response):
+        client = api_client()
+        with CaptureQueriesContext(connection) as queries:
+            not_modified = client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        assert not_modified.status_code == 304
+        assert not_modified['ETag'] == response['ETag']
+        # the validator query only, nothing is serialized
+        assert len(queries) == 1
+
+        not_modified = client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        assert not_modified.status_code == 304
+
+    @pytest.mark.parametrize(
+        'url', ['/api/product/product-1/', '/api/product/', '/api/category/']
+    )
+    def test_unchanged_resource(self, product, api_client, url):
+        response = api_client().get(url)
+
+        assert response.status_code == 200
+        self.assert_not_modified(api_client, url, response)
+
+    @pytest.mark.parametrize(
+        'change',
+        [
+            lambda product: product.category_id.save(),
+            lambda product: product.product_line.get().save(),
+            lambda product: product.product_line.get().product_image.get().delete(),
+            lambda product: product.product_line.get().attributes.clear(),
+            lambda product: product.product_type_id.attributes.get().save(),
+        ],
+    )
+    @pytest.mark.parametrize('url', ['/api/product/product-1/', '/api/product/'])
+    def test_changed_product(self, product, api_client, change, url):
+        etag = api_client().get(url)['ETag']
+
+        change(product)
+        response = api_client().get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+
+    def test_deleted_product_changes_list(self, product_factory, api_client):
+        product = product_factory(is_active=True)
+        product_factory(is_active=True)
+        etag = api_client().get('/api/product/')['ETag']
+
+        product.delete()
+        response = api_client().get('/api/product/', HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == 200
+
+    def test_changed_category_list(self, category_factory, api_client):
+        category = category_factory(is_active=True)
+        etag = api_client().get('/api/category/')['ETag']
+
+        category.name = 'Renamed'
+        category.save()
+        response = api_client().get('/api/category/', HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == 200
+        assert response.data['results'][0]['category_name'] == 'Renamed'
+
+    def test_etag_depends_on_page(self, product_factory, api_client):
+        product_factory.create_batch(2, is_active=True)
+
+        first = api_client().get('/api/product/?page_size=1')
+        second = api_client().get(first.data['next'])
+
+        assert first['ETag'] != second['ETag']
@@ -0,0 +1,157 @@
+import json
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from ecommerce.product.documents import mark_documents_dirty, rebuild_documents
+from ecommerce.product.models import ProductDocument
+
+pytestmark = pytest.mark.django_db
+
+
+def dirty_products():
+    return set(
+        ProductDocument.objects.filter(is_dirty=True).values_list(
+            'product__slug', flat=True
+        )
+    )
+
+
+class TestProductDocuments:
+    @pytest.fixture
+    def products(
+        self,
+        category_factory,
+        product_factory,
+        product_type_factory,
+        attribute_factory,
+        attribute_value_factory,
+        product_line_factory,
+        product_image_factory,
+    ):
+        attribute = attribute_factory()
+        products = {}
+        for slug in ('first', 'second'):
+            product = product_factory(
+                slug=slug,
+                category_id=category_factory(),
+                product_type_id=product_type_factory(attributes=[attribute]),
+                is_active=True,
+            )
+            product_line = product_line_factory(
+                product_id=product,
+                is_active=True,
+                attributes=[attribute_value_factory(attribute_id=attribute)],
+            )
+            product_image_factory(product_line_id=product_line)
+            products[slug] = product
+        rebuild_documents()
+        return products
+
+    def test_rebuild_creates_documents_of_active_products(
+        self, products, product_factory, api_client
+    ):
+        product_factory(slug='inactive', is_active=False)
+
+        assert rebuild_documents() == (0, 0)
+        assert set(ProductDocument.objects.values_list('slug', flat=True)) == {
+            'first',
+            'second',
+        }
+        assert dirty_products() == set()
+        response = api_client().get('/api/product/first/')
+        document = ProductDocument.objects.get(slug='first')
+        assert json.loads(response.content) == [document.data]
+
+    @pytest.mark.parametrize(
+        'change',
+        [
+            lambda product: product.category_id.save(),
+            lambda product: product.product_line.get().save(),
+            lambda product: product.product_line.get().product_image.get().save(),
+            lambda product: product.product_line.get().attributes.get().save(),
+            lambda product: product.product_line.get().attributes.clear(),
+        ],
+    )
+    def test_change_marks_only_affected_product_dirty(self, products, change):
+        change(products['first'])
+
+        assert dirty_products() == {'first'}
+
+    def test_shared_attribute_change_marks_products_dirty(self, products):
+        products['first'].product_type_id.attributes.get().save()
+
+        assert dirty_products() == {'first', 'second'}
+
+    def test_deactivated_product_document_is_deleted(self, products):
+        products['first'].is_active = False
+        products['first'].save()
+
+        assert rebuild_documents() == (0, 1)
+        assert not ProductDocument.objects.filter(product=products['first']).exists()
+
+    def test_document_marked_dirty_during_rebuild_stays_dirty(
+        self, products, monkeypatch
+    ):
+        from ecommerce.product import documents
+
+        build_documents = documents.build_documents
+
+        def build_and_change(queryset):
+            built = build_documents(queryset)
+            # another change is committed while the batch is being built
+            mark_documents_dirty([products['first'].pk])
+            return built
+
+        mark_documents_dirty([products['first'].pk, products['second'].pk])
+        monkeypatch.setattr(documents, 'build_documents', build_and_change)
+
+        assert rebuild_documents() == (1, 0)
+        assert dirty_products() == {'first'}
+
+    def test_command_rebuilds_all_documents(self, products):
+        ProductDocument.objects.update(data={})
+
+        call_command('rebuild_product_documents', '--all', '--batch-size', '1')
+
+        assert dirty_products() == set()
+        assert all(ProductDocument.objects.values_list('data', flat=True))
+
+
+class TestProductDocumentEndpoints:
+    endpoint = '/api/product/'
+
+    def test_list_served_from_documents(
+        self, settings, product_factory, product_line_factory, api_client
+    ):
+        for _ in range(3):
+            product_line_factory(
+                product_id=product_factory(is_active=True), is_active=True
+            )
+        expected = json.loads(api_client().get(self.endpoint).content)
+        rebuild_documents()
+        # a dirty document is serialized on the fly
+        product_line_factory(product_id=product_factory(is_active=True))
+        expected_dirty = json.loads(api_client().get(self.endpoint).content)
+        settings.CATALOGUE_PRODUCT_DOCUMENTS = True
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client().get(f'{self.endpoint}?page_size=3')
+
+        assert json.loads(response.content)['results'] == expected['results']
+        # validators, page of products and their documents
+        assert len(queries) == 3
+        response = api_client().get(self.endpoint)
+        assert json.loads(response.content) == expected_dirty
+
+    def test_retrieve_served_from_document(self, settings, product_factory, api_client):
+        product = product_factory(is_active=True)
+        rebuild_documents()
+        ProductDocument.objects.update(data={'served': 'from document'})
+        settings.CATALOGUE_PRODUCT_DOCUMENTS = True
+
+        response = api_client().get(f'{self.endpoint}{product.slug}/')
+
+        assert response.data == [{'served': 'from document'}]
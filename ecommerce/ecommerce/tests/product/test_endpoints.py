@@ -1,7 +1,11 @@
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 import json
 
+from ecommerce.product.models import Category
+
 # provides access to db
 pytestmark = pytest.mark.django_db
 
@@ -17,7 +21,68 @@ class TestCategoryEndpoint:
         response = api_client().get(self.endpoint)
         # Assert
         assert response.status_code == 200
-        assert len(json.loads(response.content)) == 2
+        assert len(json.loads(response.content)['results']) == 2
+
+
+class TestCategoryTree:
+    endpoint = '/api/category/tree/'
+
+    def get_tree(self, api_client):
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client().get(self.endpoint)
+        assert response.status_code == 200
+        return json.loads(response.content), len(queries)
+
+    def slugs(self, nodes):
+        return [(node['slug'], self.slugs(node['children'])) for node in nodes]
+
+    def test_nested_active_tree(self, category_factory, api_client):
+        shoes = category_factory(name='shoes', slug='shoes', is_active=True)
+        boots = category_factory(
+            name='boots', slug='boots', parent=shoes, is_active=True
+        )
+        category_factory(name='winter', slug='winter', parent=boots, is_active=True)
+        category_factory(name='heels', slug='heels', parent=shoes, is_active=True)
+        hidden = category_factory(name='hidden', slug='hidden', parent=shoes)
+        # under an inactive category, left out with it
+        category_factory(name='orphan', slug='orphan', parent=hidden, is_active=True)
+        category_factory(name='bags', slug='bags', is_active=True)
+
+        tree, _ = self.get_tree(api_client)
+
+        assert tree[0] == {
+            'category_name': 'bags',
+            'slug': 'bags',
+            'children': [],
+        }
+        assert self.slugs(tree) == [
+            ('bags', []),
+            ('shoes', [('boots', [('winter', [])]), ('heels', [])]),
+        ]
+
+    def test_cached_until_category_changes(self, category_factory, api_client):
+        parent = category_factory(name='parent', slug='parent', is_active=True)
+        child = category_factory(name='child', slug='child', is_active=True)
+        self.get_tree(api_client)
+
+        tree, num_queries = self.get_tree(api_client)
+        assert num_queries == 0
+
+        # inserting the child root renumbered the tree of the parent
+        parent.refresh_from_db()
+        child.move_to(parent)
+        tree, _ = self.get_tree(api_client)
+        assert self.slugs(tree) == [('parent', [('child', [])])]
+
+        child.is_active = False
+        child.save()
+        tree, _ = self.get_tree(api_client)
+        assert self.slugs(tree) == [('parent', [])]
+
+        child.delete()
+        category_factory(name='other', slug='other', is_active=True)
+        tree, _ = self.get_tree(api_client)
+        assert [slug for slug, _ in self.slugs(tree)] == ['other', 'parent']
 
 
 class TestProductEndpoint:
@@ -30,7 +95,7 @@ class TestProductEndpoint:
         response = api_client().get(self.endpoint)
         # Assert
         assert response.status_code == 200
-        assert len(json.loads(response.content)) == 4
+        assert len(json.loads(response.content)['results']) == 4
 
     def test_return_single_product_by_slug(self, product_factory, api_client):
         product = product_factory(slug='product-1', is_active=True)
@@ -56,3 +121,349 @@ class TestProductEndpoint:
 
         assert len(json.loads(response.content)) == 2
         assert response.data[0]['category_slug'] == category.slug
+
+
+class TestProductEndpointQueries:
+    """
+    Query count of the product endpoints must not grow with the catalogue size
+    """
+
+    endpoint = '/api/product/'
+
+    def add_product_lines(
+        self,
+        products,
+        product_line_factory,
+        product_image_factory,
+        attribute_value_factory,
+        lines_per_product,
+    ):
+        for product in products:
+            for _ in range(lines_per_product):
+                product_line = product_line_factory(
+                    product_id=product,
+                    is_active=True,
+                    attributes=[attribute_value_factory()],
+                )
+                product_image_factory.create_batch(2, product_line_id=product_line)
+            # inactive lines are filtered inside the prefetch
+            product_line_factory(product_id=product, is_active=False)
+
+    def count_queries(self, url, api_client):
+        with CaptureQueriesContext(connection) as context:
+            response = api_client().get(url)
+        assert response.status_code == 200
+        # the paginated list wraps the products into 'results'
+        data = response.data
+        if isinstance(data, dict):
+            data = data['results']
+        return len(context.captured_queries), data
+
+    @pytest.mark.parametrize('url', ['', 'category/test-category/', 'product-1/'])
+    def test_queries_do_not_grow_with_product_lines(
+        self,
+        url,
+        category_factory,
+        product_factory,
+        product_line_factory,
+        product_image_factory,
+        attribute_value_factory,
+        api_client,
+    ):
+        category = category_factory(slug='test-category', is_active=True)
+        products = [
+            product_factory(slug=f'product-{n}', category_id=category, is_active=True)
+            for n in range(1, 4)
+        ]
+        seed_args = (
+            products,
+            product_line_factory,
+            product_image_factory,
+            attribute_value_factory,
+        )
+
+        self.add_product_lines(*seed_args, lines_per_product=1)
+        small_count, _ = self.count_queries(f'{self.endpoint}{url}', api_client)
+
+        self.add_product_lines(*seed_args, lines_per_product=5)
+        large_count, data = self.count_queries(f'{self.endpoint}{url}', api_client)
+
+        assert len(data[0]['product_line']) == 6
+        assert large_count == small_count
+
+    @pytest.mark.parametrize('url', ['', 'category/test-category/'])
+    def test_queries_do_not_grow_with_products(
+        self,
+        url,
+        category_factory,
+        product_factory,
+        product_type_factory,
+        attribute_factory,
+        api_client,
+    ):
+        category = category_factory(slug='test-category', is_active=True)
+
+        def create_products(size):
+            for _ in range(size):
+                product_type = product_type_factory(
+                    attributes=attribute_factory.create_batch(2)
+                )
+                product_factory(
+                    category_id=category, product_type_id=product_type, is_active=True
+                )
+
+        create_products(2)
+        small_count, _ = self.count_queries(f'{self.endpoint}{url}', api_client)
+
+        create_products(10)
+        large_count, data = self.count_queries(f'{self.endpoint}{url}', api_client)
+
+        assert len(data) == 12
+        assert large_count == small_count
+
+    def test_product_attributes_of_product_type(
+        self, product_factory, product_type_factory, attribute_factory, api_client
+    ):
+        color = attribute_factory(name='Color')
+        size = attribute_factory(name='Size')
+        product_type = product_type_factory(attributes=[color, size])
+        # another product type, so product pk and product type pk do not match
+        product_type_factory(attributes=[attribute_factory(name='Material')])
+        product = product_factory(product_type_id=product_type, is_active=True)
+
+        response = api_client().get(f'{self.endpoint}{product.slug}/')
+
+        assert response.data[0]['product_attributes'] == {
+            color.id: 'Color',
+            size.id: 'Size',
+        }
+
+
+class TestCataloguePagination:
+    def collect_pages(self, api_client, url):
+        slugs = []
+        while url:
+            response = api_client().get(url)
+            assert response.status_code == 200
+            slugs += [item['slug'] for item in response.data['results']]
+            url = response.data['next']
+        return slugs
+
+    @pytest.mark.parametrize(
+        'endpoint, factory_name',
+        [
+            ('/api/category/', 'category_factory'),
+            ('/api/product/', 'product_factory'),
+            ('/api/product-line/', 'product_line_factory'),
+        ],
+    )
+    def test_walk_all_pages(self, endpoint, factory_name, request, api_client):
+        factory = request.getfixturevalue(factory_name)
+        objs = factory.create_batch(7, is_active=True)
+        factory(is_active=False)
+
+        slugs = self.collect_pages(api_client, f'{endpoint}?page_size=3')
+
+        # oldest first, every active row exactly once
+        assert slugs == [obj.slug for obj in objs]
+
+    def test_page_size_default(self, category_factory, api_client):
+        category_factory.create_batch(25, is_active=True)
+
+        response = api_client().get('/api/category/')
+
+        assert len(response.data['results']) == 20
+        assert response.data['next'] is not None
+        assert response.data['previous'] is None
+
+    def test_page_size_max(self, category_factory, api_client):
+        category_factory.create_batch(101, is_active=True)
+
+        response = api_client().get('/api/category/?page_size=1000')
+
+        assert len(response.data['results']) == 100
+
+    def test_deep_page_has_no_offset(self, product_factory, api_client):
+        product_factory.create_batch(6, is_active=True)
+        response = api_client().get('/api/product/?page_size=2')
+        url = response.data['next']
+
+        with CaptureQueriesContext(connection) as context:
+            response = api_client().get(url)
+
+        assert len(response.data['results']) == 2
+        assert 'OFFSET' not in context.captured_queries[0]['sql']
+
+
+class TestProductsByCategoryDescendants:
+    endpoint = '/api/product/category/'
+
+    def build_tree(self, depth, children_per_node):
+        """
+        Bulk insert a category tree level by level and compute MPTT fields once.
+
+        Returns the categories grouped by level.
+        """
+        levels = [
+            Category.objects.bulk_create(
+                [Category(name='root', slug='root', lft=0, rght=0, tree_id=0, level=0)]
+            )
+        ]
+        for level in range(1, depth):
+            levels.append(
+                Category.objects.bulk_create(
+                    [
+                        Category(
+                            name=f'{parent.slug}-{n}',
+                            slug=f'{parent.slug}-{n}',
+                            parent=parent,
+                            lft=0,
+                            rght=0,
+                            tree_id=0,
+                            level=level,
+                        )
+                        for parent in levels[-1]
+                        for n in range(children_per_node)
+                    ]
+                )
+            )
+        Category._tree_manager.rebuild()
+        return levels
+
+    def test_include_descendants(self, category_factory, product_factory, api_client):
+        parent = category_factory(slug='parent')
+        child = category_factory(slug='child', parent=parent)
+        grandchild = category_factory(slug='grandchild', parent=child)
+        other = category_factory(slug='other')
+        for category in (parent, child, grandchild, other):
+            product_factory(category_id=category, is_active=True)
+
+        response = api_client().get(f'{self.endpoint}parent/?descendants=true')
+        assert sorted(item['category_slug'] for item in response.data) == [
+            'child',
+            'grandchild',
+            'parent',
+        ]
+
+        response = api_client().get(f'{self.endpoint}child/?descendants=true')
+        assert sorted(item['category_slug'] for item in response.data) == [
+            'child',
+            'grandchild',
+        ]
+
+        response = api_client().get(f'{self.endpoint}parent/')
+        assert [item['category_slug'] for item in response.data] == ['parent']
+
+    def test_include_descendants_cache_invalidation(
+        self, category_factory, product_factory, api_client
+    ):
+        parent = category_factory(slug='parent')
+        child = category_factory(slug='child', parent=parent)
+        grandchild = category_factory(slug='grandchild', parent=child)
+        url = f'{self.endpoint}parent/?descendants=true'
+        api_client().get(url)
+
+        product_factory(category_id=grandchild, is_active=True)
+        response = api_client().get(url)
+
+        assert [item['category_slug'] for item in response.data] == ['grandchild']
+
+    def test_queries_do_not_grow_with_tree_size(self, product_factory, api_client):
+        """
+        Products of a 6 levels deep tree with thousands of categories are
+        selected with the same number of queries as products of a single leaf.
+        """
+        levels = self.build_tree(depth=6, children_per_node=5)
+        assert sum(len(level) for level in levels) == 3906
+        for category in levels[-1][:20] + levels[3][:5]:
+            product_factory(category_id=category, is_active=True)
+
+        with CaptureQueriesContext(connection) as deep_tree:
+            response = api_client().get(f'{self.endpoint}root/?descendants=true')
+        assert len(response.data) == 25
+
+        with CaptureQueriesContext(connection) as leaf:
+            response = api_client().get(
+                f'{self.endpoint}{levels[-1][0].slug}/?descendants=true'
+            )
+        assert len(response.data) == 1
+
+        assert len(deep_tree.captured_queries) == len(leaf.captured_queries)
+        # range predicate on the MPTT columns, not an IN list of category ids
+        products_sql = next(
+            query['sql']
+            for query in deep_tree.captured_queries
+            if 'FROM "product_product"' in query['sql']
+            and '"product_category"."lft"' in query['sql']
+        )
+        assert ' IN (' not in products_sql
+
+
+class TestProductExport:
+    endpoint = '/api/product/export/'
+
+    @pytest.fixture
+    def products(self, product_factory, product_line_factory, product_image_factory):
+        products = product_factory.create_batch(5, is_active=True)
+        for product in products:
+            product_image_factory(
+                product_line_id=product_line_factory(product_id=product, is_active=True)
+            )
+        product_factory(is_active=False)
+        return products
+
+    def get_content(self, response):
+        assert response.status_code == 200
+        return b''.join(response.streaming_content)
+
+    def test_json_array(self, products, api_client):
+        listed = api_client().get('/api/product/').data['results']
+
+        response = api_client().get(self.endpoint)
+
+        assert response['Content-Type'] == 'application/json'
+        assert json.loads(self.get_content(response)) == json.loads(json.dumps(listed))
+
+    def test_ndjson(self, products, api_client):
+        response = api_client().get(self.endpoint, {'output': 'ndjson'})
+
+        assert response['Content-Type'] == 'application/x-ndjson'
+        lines = self.get_content(response).splitlines()
+        assert [json.loads(line)['slug'] for line in lines] == [
+            product.slug for product in products
+        ]
+
+    def test_fast_serializer(self, products, api_client, settings):
+        expected = self.get_content(api_client().get(self.endpoint))
+        settings.CATALOGUE_FAST_SERIALIZERS = ['product-export']
+
+        assert self.get_content(api_client().get(self.endpoint)) == expected
+
+    def test_queries_per_chunk(self, products, api_client, monkeypatch):
+        from ecommerce.product import views
+
+        monkeypatch.setattr(views, 'EXPORT_CHUNK_SIZE', 2)
+        response = api_client().get(self.endpoint)
+
+        # rows are loaded while the response is consumed
+        with CaptureQueriesContext(connection) as queries:
+            self.get_content(response)
+
+        # per chunk of 2 products: lines, attribute values, images and
+        # product type attributes
+        product_queries = [
+            query
+            for query in queries.captured_queries
+            if 'FROM "product_product"' in query['sql']
+        ]
+        assert len(queries) - len(product_queries) == 3 * 4
+
+    def test_empty_catalogue(self, api_client):
+        response = api_client().get(self.endpoint)
+
+        assert json.loads(self.get_content(response)) == []
+
+    def test_invalid_output(self, api_client):
+        response = api_client().get(self.endpoint, {'output': 'xml'})
+
+        assert response.status_code == 400
@@ -0,0 +1,92 @@
+import gzip
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from ecommerce.product import exporter
+from ecommerce.product.models import ProductImage
+
+pytestmark = pytest.mark.django_db
+
+
+class TestExportCatalogue:
+    @pytest.fixture
+    def products(
+        self,
+        product_factory,
+        product_line_factory,
+        product_image_factory,
+        attribute_value_factory,
+        monkeypatch,
+    ):
+        # consecutive runs in a test are not apart by the overlap
+        monkeypatch.setattr(exporter, 'EXPORT_OVERLAP', exporter.timedelta(0))
+        products = {}
+        for slug in ('chair', 'table', 'lamp'):
+            product = products[slug] = product_factory(slug=slug, is_active=True)
+            product_line = product_line_factory(
+                product_id=product,
+                is_active=True,
+                attributes=[attribute_value_factory()],
+            )
+            product_image_factory(product_line_id=product_line)
+        product_factory(slug='hidden', is_active=False)
+        return products
+
+    def export(self, tmp_path, *args):
+        output = tmp_path / 'catalogue.ndjson.gz'
+        call_command(
+            'export_catalogue',
+            '--output',
+            str(output),
+            '--watermark-file',
+            str(tmp_path / 'watermark.json'),
+            *args,
+            stdout=StringIO(),
+        )
+        with gzip.open(output, 'rt') as file:
+            return [json.loads(line) for line in file]
+
+    def test_first_export_has_all_active_products(self, products, tmp_path, api_client):
+        exported = self.export(tmp_path)
+
+        assert [product['slug'] for product in exported] == ['chair', 'table', 'lamp']
+        # the format of the product endpoint
+        assert exported[0] == api_client().get('/api/product/chair/').json()[0]
+        assert (tmp_path / 'watermark.json').exists()
+
+    def test_next_export_has_changed_products(self, products, tmp_path):
+        self.export(tmp_path)
+        assert self.export(tmp_path) == []
+
+        products['table'].name = 'Oak table'
+        products['table'].save()
+        # bulk_create() sends no signals, the image has a new updated_at
+        ProductImage.objects.bulk_create(
+            [
+                ProductImage(
+                    product_line_id=products['lamp'].product_line.get(),
+                    display_order=9,
+                )
+            ]
+        )
+        products['chair'].is_active = False
+        products['chair'].save()
+
+        exported = self.export(tmp_path)
+
+        assert [product['slug'] for product in exported] == ['table', 'lamp', 'chair']
+        assert exported[0]['name'] == 'Oak table'
+        assert len(exported[1]['product_line'][0]['product_image']) == 2
+        assert exported[2] == {'slug': 'chair', 'is_active': False}
+
+    def test_since_and_full(self, products, tmp_path):
+        self.export(tmp_path)
+
+        since = self.export(tmp_path, '--since', '2000-01-01T00:00:00')
+        # inactive products are exported as changed, not in a full export
+        assert since[-1] == {'slug': 'hidden', 'is_active': False}
+        assert len(since) == 4
+        assert len(self.export(tmp_path, '--full')) == 3
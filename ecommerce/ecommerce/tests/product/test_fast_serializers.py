@@ -0,0 +1,101 @@
+import json
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+pytestmark = pytest.mark.django_db
+
+
+class TestFastSerializers:
+    """
+    Endpoints served by the fast serializers return exactly the same JSON
+    """
+
+    @pytest.fixture
+    def catalogue(
+        self,
+        category_factory,
+        product_factory,
+        product_type_factory,
+        attribute_factory,
+        attribute_value_factory,
+        product_line_factory,
+        product_image_factory,
+    ):
+        category = category_factory(slug='fast-category', is_active=True)
+        attributes = attribute_factory.create_batch(2)
+        product_type = product_type_factory(attributes=attributes)
+        for i in range(3):
+            product = product_factory(
+                category_id=category, product_type_id=product_type, is_active=True
+            )
+            for _ in range(2):
+                product_line = product_line_factory(
+                    product_id=product,
+                    is_active=True,
+                    attributes=[
+                        attribute_value_factory(attribute_id=attribute)
+                        for attribute in attributes
+                    ],
+                )
+                product_image_factory.create_batch(2, product_line_id=product_line)
+            # empty and inactive lines are serialized as before
+            product_line_factory(
+                product_id=product, is_active=True, second_name='', price='1.5'
+            )
+            product_line_factory(product_id=product, is_active=False)
+        # a product without category nor product type attributes
+        product_factory(slug='no-category', category_id=None, is_active=True)
+
+    def get_both(self, settings, api_client, url, endpoint):
+        settings.CATALOGUE_FAST_SERIALIZERS = []
+        expected = api_client().get(url)
+        cache.clear()
+        settings.CATALOGUE_FAST_SERIALIZERS = [endpoint]
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client().get(url)
+        assert expected.status_code == response.status_code == 200
+        return json.loads(expected.content), json.loads(response.content), queries
+
+    @pytest.mark.parametrize(
+        'url, endpoint',
+        [
+            ('/api/category/', 'category-list'),
+            ('/api/product/?page_size=2', 'product-list'),
+            ('/api/product/no-category/', 'product-detail'),
+            ('/api/product/category/fast-category/', 'product-list-by-category-slug'),
+            (
+                '/api/product/category/fast-category/?descendants=true',
+                'product-list-by-category-slug',
+            ),
+            ('/api/product-line/', 'product_line-list'),
+        ],
+    )
+    def test_same_json(self, catalogue, settings, api_client, url, endpoint):
+        expected, data, _ = self.get_both(settings, api_client, url, endpoint)
+
+        assert data == expected
+
+    def test_product_line_detail(
+        self, catalogue, settings, api_client, product_line_factory
+    ):
+        product_line = product_line_factory(is_active=True)
+        url = f'/api/product-line/{product_line.pk}/'
+
+        expected, data, _ = self.get_both(
+            settings, api_client, url, 'product_line-detail'
+        )
+
+        assert data == expected
+        assert len(data) == 1
+
+    def test_product_list_queries(self, catalogue, settings, api_client):
+        # validators, products, lines, attribute values, images and
+        # product type attributes
+        *_, queries = self.get_both(
+            settings, api_client, '/api/product/', 'product-list'
+        )
+
+        assert len(queries) == 6
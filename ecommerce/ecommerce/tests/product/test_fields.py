@@ -1,5 +1,12 @@
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
 import pytest
 from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from ecommerce.product.models import ProductImage, ProductLine
 from ecommerce.tests.factories import (
     ProductFactory,
     ProductLineFactory,
@@ -36,3 +43,94 @@ class TestOrderingField:
             ValidationError, match="The display order .* is already in use."
         ):
             ProductLineFactory(product_id=product, display_order=1)
+
+    def test_unchanged_order_is_not_allocated(self):
+        product_line = ProductLineFactory(display_order=None)
+        product_line = ProductLine.objects.get(pk=product_line.pk)
+
+        product_line.price = Decimal('2.00')
+        with CaptureQueriesContext(connection) as queries:
+            product_line.save()
+
+        # neither the uniqueness check nor the counter of the product
+        assert not [
+            query['sql']
+            for query in queries
+            if 'orderingcounter' in query['sql'] or query['sql'].startswith('SELECT 1')
+        ]
+
+    def test_changed_order_is_checked(self):
+        product = ProductFactory()
+        ProductLineFactory(product_id=product, display_order=1)
+        product_line = ProductLineFactory(product_id=product, display_order=2)
+
+        product_line.display_order = 1
+        with pytest.raises(ValidationError, match='is already in use'):
+            with transaction.atomic():
+                product_line.save()
+
+        # moved to another product with the same order
+        product_line.display_order = 2
+        product_line.product_id = ProductFactory()
+        product_line.save()
+        assert (
+            ProductLineFactory(
+                product_id=product_line.product_id, display_order=None
+            ).display_order
+            == 3
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+class TestOrderingFieldConcurrency:
+    THREADS = 8
+    ROWS = 200
+
+    def insert_concurrently(self, create):
+        def worker(n):
+            try:
+                return create(n).display_order
+            finally:
+                # every thread opens its own database connection
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.THREADS) as executor:
+            return list(executor.map(worker, range(self.ROWS)))
+
+    def test_product_lines_of_one_product(self):
+        product_type = ProductTypeFactory()
+        product = ProductFactory(product_type_id=product_type)
+
+        orders = self.insert_concurrently(
+            lambda n: ProductLine.objects.create(
+                product_id=product,
+                product_type_id=product_type,
+                price=Decimal('1.00'),
+                slug=f'line-{n}',
+                sku=f'sku-{n}',
+            )
+        )
+
+        # gap-free and unique
+        assert sorted(orders) == list(range(1, self.ROWS + 1))
+        assert sorted(
+            ProductLine.objects.filter(product_id=product).values_list(
+                'display_order', flat=True
+            )
+        ) == list(range(1, self.ROWS + 1))
+
+    def test_product_images_of_one_product_line(self):
+        product_line = ProductLineFactory(display_order=None)
+
+        orders = self.insert_concurrently(
+            lambda n: ProductImage.objects.create(
+                product_line_id=product_line, alternative_text=f'image-{n}'
+            )
+        )
+
+        assert sorted(orders) == list(range(1, self.ROWS + 1))
+        assert sorted(
+            ProductImage.objects.filter(product_line_id=product_line).values_list(
+                'display_order', flat=True
+            )
+        ) == list(range(1, self.ROWS + 1))
@@ -0,0 +1,130 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+pytestmark = pytest.mark.django_db
+
+
+class TestProductFilters:
+    endpoint = '/api/product/'
+
+    @pytest.fixture
+    def values(self, attribute_factory, attribute_value_factory):
+        colour = attribute_factory(name='colour')
+        size = attribute_factory(name='size')
+        return {
+            value: attribute_value_factory(attribute_id=attribute, value=value)
+            for attribute, value in [
+                (colour, 'red'),
+                (colour, 'blue'),
+                (size, 'S'),
+                (size, 'M'),
+            ]
+        }
+
+    @pytest.fixture
+    def products(self, values, product_factory, product_line_factory):
+        def create(slug, lines, is_digital=False):
+            product = product_factory(slug=slug, is_digital=is_digital, is_active=True)
+            for attributes, price, is_active in lines:
+                product_line_factory(
+                    product_id=product,
+                    price=price,
+                    is_active=is_active,
+                    attributes=[values[value] for value in attributes],
+                )
+
+        create('red-m-blue-s', [(('red', 'M'), 10, True), (('blue', 'S'), 50, True)])
+        create('red-s', [(('red', 'S'), 20, True)])
+        create('blue-m-digital', [(('blue', 'M'), 30, True)], is_digital=True)
+        create('inactive-red-m', [(('red', 'M'), 10, False)])
+
+    def get(self, api_client, **params):
+        response = api_client().get(self.endpoint, params)
+        assert response.status_code == 200
+        return response
+
+    def get_slugs(self, api_client, **params):
+        response = self.get(api_client, **params)
+        return {product['slug'] for product in response.data['results']}
+
+    def ids(self, values, *names):
+        return ','.join(str(values[name].pk) for name in names)
+
+    def test_attribute_values_of_different_attributes_match_the_same_line(
+        self, products, values, api_client
+    ):
+        assert self.get_slugs(
+            api_client, attribute_value=self.ids(values, 'red', 'M')
+        ) == {'red-m-blue-s'}
+        assert self.get_slugs(
+            api_client, attribute_value=self.ids(values, 'red', 'S')
+        ) == {'red-s'}
+
+    def test_attribute_values_of_same_attribute_are_alternatives(
+        self, products, values, api_client
+    ):
+        assert self.get_slugs(
+            api_client, attribute_value=self.ids(values, 'red', 'blue', 'M')
+        ) == {'red-m-blue-s', 'blue-m-digital'}
+
+    @pytest.mark.parametrize(
+        'params, slugs',
+        [
+            ({'price_min': '25'}, {'red-m-blue-s', 'blue-m-digital'}),
+            ({'price_min': '15', 'price_max': '25'}, {'red-s'}),
+            ({'is_digital': 'true'}, {'blue-m-digital'}),
+            ({'is_digital': 'false', 'price_max': '10'}, {'red-m-blue-s'}),
+            # bounds of 5 digits, prices go up to 99999.99
+            ({'price_min': '20000'}, set()),
+            ({'price_max': '99999.99'}, {'red-m-blue-s', 'red-s', 'blue-m-digital'}),
+        ],
+    )
+    def test_price_and_is_digital(self, products, api_client, params, slugs):
+        assert self.get_slugs(api_client, **params) == slugs
+
+    def test_facets(self, products, values, api_client):
+        response = self.get(api_client, attribute_value=values['red'].pk)
+
+        counts = {facet['value']: facet['count'] for facet in response.data['facets']}
+        # colour counts ignore the selected colour
+        assert counts == {'red': 2, 'blue': 2, 'S': 1, 'M': 1}
+
+    def test_no_facets_without_filters(self, products, api_client):
+        assert 'facets' not in self.get(api_client).data
+        assert 'facets' in self.get(api_client, facets='true').data
+
+    def test_bounded_queries(
+        self, products, values, api_client, product_factory, product_line_factory
+    ):
+        params = {'attribute_value': self.ids(values, 'red', 'blue', 'M')}
+        with CaptureQueriesContext(connection) as queries:
+            self.get(api_client, **params)
+
+        for _ in range(5):
+            product_line_factory(
+                product_id=product_factory(is_active=True),
+                is_active=True,
+                attributes=[values['blue'], values['M']],
+            )
+        with CaptureQueriesContext(connection) as more_queries:
+            self.get(api_client, **params)
+
+        assert len(more_queries) == len(queries)
+
+    @pytest.mark.parametrize(
+        'params',
+        [
+            {'attribute_value': '999999'},
+            {'attribute_value': 'red'},
+            {'price_min': 'cheap'},
+            {'price_min': '-1'},
+            {'price_max': '100000'},
+            {'price_min': '20', 'price_max': '10'},
+            {'is_digital': 'maybe'},
+        ],
+    )
+    def test_invalid_filters(self, products, api_client, params):
+        response = api_client().get(self.endpoint, params)
+
+        assert response.status_code == 400
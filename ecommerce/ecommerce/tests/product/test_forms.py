@@ -1,6 +1,8 @@
 import pytest
 
 from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.forms.models import inlineformset_factory
 
 from collections import Counter
@@ -88,3 +90,56 @@ class TestProductLineAttributeValueFormSet:
         )
         # Validate formset
         assert formset_instance.is_valid()
+
+    def get_formset_class(self, extra=3):
+        return inlineformset_factory(
+            ProductLine,
+            ProductLineAttributeValue,
+            form=ProductLineAttributeValueForm,
+            formset=ProductLineAttributeValueFormSet,
+            can_delete=True,
+            extra=extra,
+        )
+
+    def get_formset(self, values):
+        prefix = 'product_line_attribute_value_pl'
+        data = {
+            f'{prefix}-TOTAL_FORMS': len(values),
+            f'{prefix}-INITIAL_FORMS': 0,
+            f'{prefix}-MIN_NUM_FORMS': 0,
+            f'{prefix}-MAX_NUM_FORMS': 1000,
+        }
+        for n, value in enumerate(values):
+            data[f'{prefix}-{n}-attribute_value'] = value.pk
+        return self.get_formset_class()(instance=self.product_line, data=data)
+
+    def test_choices_are_queried_once(self):
+        def render(extra):
+            formset = self.get_formset_class(extra)(instance=self.product_line)
+            with CaptureQueriesContext(connection) as queries:
+                for form in formset.forms:
+                    str(form['attribute_value'])
+            return formset, len(queries)
+
+        _, num_queries = render(extra=1)
+        formset, more_num_queries = render(extra=5)
+
+        # the inline rows and the choices
+        assert more_num_queries == num_queries == 2
+        assert formset.forms[0].fields['attribute_value'].choices == (
+            formset.forms[4].fields['attribute_value'].choices
+        )
+
+    def test_duplicate_attribute(self):
+        blue = AttributeValueFactory(value="Blue", attribute_id=self.attribute1)
+        formset = self.get_formset([self.attribute_value1, blue])
+
+        assert not formset.is_valid()
+        assert formset.non_form_errors() == [
+            'Allowed only one unique attribute name per product line.'
+        ]
+
+    def test_unsaved_product_line(self):
+        formset = self.get_formset_class()(instance=ProductLine())
+
+        assert list(formset.forms[0].fields['attribute_value'].queryset) == []
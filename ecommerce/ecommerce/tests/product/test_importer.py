@@ -0,0 +1,367 @@
+import csv
+import json
+from io import StringIO
+from decimal import Decimal
+from unittest.mock import Mock
+
+import pytest
+from django.core.management import CommandError, call_command
+from mptt.managers import TreeManager
+
+from ecommerce.product.importer import CatalogueImporter
+from ecommerce.product.models import (
+    Category,
+    Product,
+    ProductImage,
+    ProductLine,
+    ProductType,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+def write_csv(path, rows):
+    with path.open('w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+
+def write_ndjson(path, rows):
+    path.write_text(''.join(json.dumps(row) + '\n' for row in rows))
+    return str(path)
+
+
+@pytest.fixture
+def catalogue_files(tmp_path):
+    return [
+        write_csv(
+            tmp_path / 'categories.csv',
+            [
+                # the parent comes after its child
+                {'slug': 'boots', 'name': 'Boots', 'parent': 'shoes', 'is_active': 1},
+                {'slug': 'shoes', 'name': 'Shoes', 'parent': '', 'is_active': 1},
+                {'slug': 'bags', 'name': 'Bags', 'parent': '', 'is_active': 0},
+            ],
+        ),
+        write_csv(
+            tmp_path / 'attributes.csv',
+            [
+                {'name': 'Color', 'values': 'Red|Blue'},
+                {'name': 'Size', 'values': '40|41'},
+            ],
+        ),
+        write_csv(
+            tmp_path / 'product_types.csv',
+            [{'name': 'Shoe', 'parent': '', 'attributes': 'Color|Size'}],
+        ),
+        write_ndjson(
+            tmp_path / 'products.ndjson',
+            [
+                {
+                    'slug': f'boot-{n}',
+                    'name': f'Boot {n}',
+                    'pid': f'B{n}',
+                    'category': 'boots',
+                    'product_type': 'Shoe',
+                    'is_active': True,
+                }
+                for n in range(5)
+            ],
+        ),
+        write_ndjson(
+            tmp_path / 'product_lines.ndjson',
+            [
+                {
+                    'slug': f'boot-{n}-red',
+                    'sku': f'B{n}-R',
+                    'product': f'boot-{n}',
+                    'product_type': 'Shoe',
+                    'price': '10.005',
+                    'is_active': True,
+                    'attributes': {'Color': 'Red', 'Size': '40'},
+                }
+                for n in range(5)
+            ],
+        ),
+        write_csv(
+            tmp_path / 'images.csv',
+            [
+                {
+                    'product_line': 'boot-0-red',
+                    'display_order': n,
+                    'url': f'boot-{n}.jpg',
+                    'alternative_text': '',
+                }
+                for n in (1, 2)
+            ],
+        ),
+    ]
+
+
+def import_catalogue(*files, tmp_path, batch_size=2, **options):
+    call_command(
+        'import_catalogue',
+        *files,
+        batch_size=batch_size,
+        state_file=str(tmp_path / 'state.json'),
+        stdout=StringIO(),
+        **options,
+    )
+
+
+class TestImportCatalogue:
+    def test_import(self, catalogue_files, tmp_path):
+        # files are imported in the order of their kinds
+        import_catalogue(*reversed(catalogue_files), tmp_path=tmp_path)
+
+        shoes = Category.objects.get(slug='shoes')
+        assert [c.slug for c in shoes.get_descendants()] == ['boots']
+        assert Category.objects.get(slug='bags').is_root_node()
+        assert Product.objects.filter(category_id__slug='boots').count() == 5
+
+        product_line = ProductLine.objects.get(slug='boot-0-red')
+        assert product_line.price == Decimal('10.01')
+        assert product_line.display_order == 1
+        assert sorted(str(value) for value in product_line.attributes.all()) == [
+            'Color: Red',
+            'Size: 40',
+        ]
+        assert list(
+            ProductImage.objects.filter(product_line_id=product_line).values_list(
+                'display_order', 'url'
+            )
+        ) == [(1, 'boot-1.jpg'), (2, 'boot-2.jpg')]
+        assert not (tmp_path / 'state.json').exists()
+
+    def test_import_again_updates_rows(self, catalogue_files, tmp_path):
+        import_catalogue(*catalogue_files, tmp_path=tmp_path)
+        write_ndjson(
+            tmp_path / 'product_lines.ndjson',
+            [
+                {
+                    'slug': 'boot-0-red',
+                    'sku': 'B0-R',
+                    'product': 'boot-0',
+                    'product_type': 'Shoe',
+                    'price': '12',
+                    'attributes': ['Color:Blue'],
+                }
+            ],
+        )
+
+        import_catalogue(*catalogue_files, tmp_path=tmp_path)
+
+        assert ProductType.objects.count() == 1
+        assert Product.objects.count() == 5
+        assert ProductImage.objects.count() == 2
+        product_line = ProductLine.objects.get(slug='boot-0-red')
+        assert (product_line.price, product_line.is_active) == (12, False)
+        # the attributes of the row replace the old ones
+        assert [str(value) for value in product_line.attributes.all()] == [
+            'Color: Blue'
+        ]
+
+    def test_tree_is_rebuilt_once(self, catalogue_files, tmp_path, monkeypatch):
+        calls = []
+        rebuild = TreeManager.rebuild
+        monkeypatch.setattr(
+            TreeManager,
+            'rebuild',
+            lambda manager: calls.append(manager.model) or rebuild(manager),
+        )
+
+        import_catalogue(catalogue_files[0], tmp_path=tmp_path, batch_size=1)
+
+        assert calls == [Category]
+
+    def test_tree_cache_is_invalidated(self, catalogue_files, tmp_path, api_client):
+        assert api_client().get('/api/category/tree/').json() == []
+
+        import_catalogue(catalogue_files[0], tmp_path=tmp_path)
+
+        tree = api_client().get('/api/category/tree/').json()
+        assert [node['slug'] for node in tree] == ['shoes']
+
+    def test_resume(self, catalogue_files, tmp_path, monkeypatch):
+        import_products = CatalogueImporter.import_products
+        batches = []
+        interrupt = [True]
+
+        def record_batches(importer, path, batch):
+            if batches and interrupt:
+                interrupt.pop()
+                raise KeyboardInterrupt
+            batches.append([row['slug'] for _, row in batch])
+            import_products(importer, path, batch)
+
+        monkeypatch.setattr(CatalogueImporter, 'import_products', record_batches)
+        with pytest.raises(KeyboardInterrupt):
+            import_catalogue(*catalogue_files, tmp_path=tmp_path)
+        assert Product.objects.count() == 2
+        assert (tmp_path / 'state.json').exists()
+
+        import_catalogue(*catalogue_files, tmp_path=tmp_path, resume=True)
+
+        assert batches == [['boot-0', 'boot-1'], ['boot-2', 'boot-3'], ['boot-4']]
+        assert Product.objects.count() == 5
+        assert ProductImage.objects.count() == 2
+
+    def test_unknown_reference(self, catalogue_files, tmp_path):
+        path = write_csv(
+            tmp_path / 'products.csv',
+            [
+                {
+                    'slug': 'lost',
+                    'name': 'Lost',
+                    'pid': 'L1',
+                    'category': 'missing',
+                    'product_type': 'Shoe',
+                }
+            ],
+        )
+
+        with pytest.raises(CommandError, match='products.csv:2: unknown category'):
+            import_catalogue(*catalogue_files[:3], path, tmp_path=tmp_path)
+
+    def test_changed_products_are_reindexed_once(
+        self, catalogue_files, tmp_path, monkeypatch
+    ):
+        from ecommerce.product import importer
+
+        reindexed = []
+        monkeypatch.setattr(importer, 'update_search_index', reindexed.extend)
+
+        # products and their lines are imported in different files and batches
+        import_catalogue(*catalogue_files, tmp_path=tmp_path)
+
+        assert sorted(reindexed) == sorted(Product.objects.values_list('pk', flat=True))
+
+    def test_interrupted_import_is_flushed(
+        self, catalogue_files, tmp_path, monkeypatch
+    ):
+        from ecommerce.product import importer
+
+        reindexed = []
+        monkeypatch.setattr(importer, 'update_search_index', reindexed.extend)
+        monkeypatch.setattr(
+            CatalogueImporter,
+            'import_product_lines',
+            Mock(side_effect=KeyboardInterrupt),
+        )
+
+        with pytest.raises(KeyboardInterrupt):
+            import_catalogue(*catalogue_files, tmp_path=tmp_path)
+
+        assert len(reindexed) == 5
+
+    @pytest.mark.parametrize(
+        'row, error',
+        [
+            (
+                {'slug': 'boot-new', 'pid': 'B0'},
+                ':1: pid "B0" is already used by "boot-0"',
+            ),
+            (
+                {'slug': 'boot-new', 'name': 'Boot 0'},
+                ':1: name "Boot 0" is already used',
+            ),
+        ],
+    )
+    def test_unique_conflict_of_products(self, catalogue_files, tmp_path, row, error):
+        import_catalogue(*catalogue_files, tmp_path=tmp_path)
+        path = write_ndjson(
+            tmp_path / 'products.ndjson',
+            [
+                {
+                    'name': 'New boot',
+                    'pid': 'N1',
+                    'category': 'boots',
+                    'product_type': 'Shoe',
+                    **row,
+                }
+            ],
+        )
+
+        with pytest.raises(CommandError, match=f'products.ndjson{error}'):
+            import_catalogue(path, tmp_path=tmp_path)
+
+    def test_unique_conflict_in_batch(self, catalogue_files, tmp_path):
+        path = write_ndjson(
+            tmp_path / 'product_lines.ndjson',
+            [
+                {
+                    'slug': slug,
+                    'sku': 'SAME',
+                    'product': 'boot-0',
+                    'product_type': 'Shoe',
+                    'price': '1',
+                }
+                for slug in ('first', 'second')
+            ],
+        )
+
+        with pytest.raises(
+            CommandError,
+            match='product_lines.ndjson:2: sku "SAME" is already used by "first"',
+        ):
+            import_catalogue(*catalogue_files[:4], path, tmp_path=tmp_path)
+        assert not ProductLine.objects.filter(sku='SAME').exists()
+
+    def test_images_without_order_are_matched_by_url(self, catalogue_files, tmp_path):
+        import_catalogue(*catalogue_files, tmp_path=tmp_path)
+        path = write_ndjson(
+            tmp_path / 'images.ndjson',
+            [
+                {'product_line': 'boot-0-red', 'url': url, 'alternative_text': url}
+                for url in ('boot-2.jpg', 'boot-3.jpg')
+            ],
+        )
+
+        import_catalogue(path, tmp_path=tmp_path)
+        import_catalogue(path, tmp_path=tmp_path)
+
+        assert list(
+            ProductImage.objects.order_by('display_order').values_list(
+                'display_order', 'url', 'alternative_text'
+            )
+        ) == [
+            (1, 'boot-1.jpg', ''),
+            (2, 'boot-2.jpg', 'boot-2.jpg'),
+            (3, 'boot-3.jpg', 'boot-3.jpg'),
+        ]
+
+    def test_attribute_not_allowed(self, catalogue_files, tmp_path):
+        (tmp_path / 'extra').mkdir()
+        attributes = write_ndjson(
+            tmp_path / 'extra' / 'attributes.ndjson',
+            [{'name': 'Material', 'values': ['Leather']}],
+        )
+        path = write_ndjson(
+            tmp_path / 'product_lines.ndjson',
+            [
+                {
+                    'slug': 'boot-0-leather',
+                    'sku': 'B0-L',
+                    'product': 'boot-0',
+                    'product_type': 'Shoe',
+                    'price': '1',
+                    'attributes': {'Material': 'Leather'},
+                }
+            ],
+        )
+
+        with pytest.raises(
+            CommandError,
+            match='product_lines.ndjson:1: attribute "Material" is not allowed '
+            'for the product type "Shoe"',
+        ):
+            import_catalogue(*catalogue_files[:4], attributes, path, tmp_path=tmp_path)
+        assert not ProductLine.objects.filter(slug='boot-0-leather').exists()
+
+    def test_unknown_file(self, tmp_path):
+        path = write_csv(tmp_path / 'orders.csv', [{'id': 1}])
+
+        with pytest.raises(CommandError, match='the file name must be one of'):
+            import_catalogue(path, tmp_path=tmp_path)
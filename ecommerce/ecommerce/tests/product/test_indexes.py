@@ -0,0 +1,94 @@
+import pytest
+from django.db import connection
+
+from ecommerce.product.models import Category, Product, ProductLine
+
+pytestmark = pytest.mark.django_db
+
+
+class TestActiveIndexes:
+    """
+    The planner uses the partial and composite indexes for the public querysets
+    """
+
+    @pytest.fixture(autouse=True)
+    def catalogue(self, category_factory, product_factory, product_line_factory):
+        categories = [
+            category_factory(is_active=is_active) for is_active in (True, False)
+        ]
+        for n in range(20):
+            product = product_factory(
+                category_id=categories[n % 2], is_active=n % 3 != 0
+            )
+            for is_active in (True, False):
+                product_line_factory(product_id=product, is_active=is_active)
+
+        if connection.vendor == 'postgresql':
+            # the tables are far too small to make an index cheaper than a
+            # sequential scan and a sort, only allow plans reading the rows in
+            # order from an index
+            with connection.cursor() as cursor:
+                for setting in ('enable_seqscan', 'enable_bitmapscan', 'enable_sort'):
+                    cursor.execute(f'SET LOCAL {setting} = off')
+        return categories
+
+    @pytest.mark.parametrize(
+        'get_queryset, index',
+        [
+            (
+                lambda: Category.active.order_by('created_at', 'id')[:20],
+                'category_active_created_idx',
+            ),
+            (
+                lambda: Product.active.order_by('created_at', 'id')[:20],
+                'product_active_created_idx',
+            ),
+            (
+                # several categories, so only this index returns them in order
+                lambda: Product.active.filter(
+                    category_id__in=Category.objects.all()
+                ).order_by('category_id', 'created_at', 'id'),
+                'product_active_category_idx',
+            ),
+            (
+                lambda: ProductLine.active.order_by('created_at', 'id')[:20],
+                'productline_active_created_idx',
+            ),
+            (
+                # active lines of a product in display order, the unique
+                # constraint serves them without a partial index
+                lambda: ProductLine.active.filter(
+                    product_id=Product.objects.first()
+                ).order_by('display_order'),
+                'unique_product_line_display_order',
+            ),
+        ],
+    )
+    def test_index_is_used(self, get_queryset, index):
+        plan = get_queryset().explain()
+        assert index in plan, plan
+
+    def test_product_slug_lookup_uses_unique_index(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, Product._meta.db_table
+            )
+            slug_indexes = {
+                name: constraint
+                for name, constraint in constraints.items()
+                if constraint['columns'] == ['slug']
+            }
+            # the varchar_pattern_ops index PostgreSQL gets for LIKE lookups
+            # costs the same for an equality, dropped until the rollback
+            for name in slug_indexes:
+                if name.endswith('_like'):
+                    cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+        (index,) = [
+            name for name, constraint in slug_indexes.items() if constraint['unique']
+        ]
+
+        plan = Product.active.filter(slug=Product.objects.first().slug).explain()
+
+        # Index Scan or Index Only Scan, SEARCH ... USING INDEX on SQLite
+        assert index in plan, plan
+        assert 'Seq Scan' not in plan, plan
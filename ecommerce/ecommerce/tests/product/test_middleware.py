@@ -0,0 +1,120 @@
+import json
+import logging
+
+import pytest
+from asgiref.sync import AsyncToSync, SyncToAsync
+from django.core.handlers.asgi import ASGIHandler
+from django.http import JsonResponse
+from django.test import RequestFactory
+
+from ecommerce.product.middleware import profile_queries
+from ecommerce.product.models import Category
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def profiler(settings):
+    settings.MIDDLEWARE = [
+        *settings.MIDDLEWARE,
+        'ecommerce.product.middleware.SQLProfilerMiddleware',
+    ]
+    settings.SQL_PROFILER = {'QUERY_BUDGET': 5, 'SLOWEST': 2}
+    return settings.SQL_PROFILER
+
+
+def get_log_record(caplog):
+    records = [
+        record
+        for record in caplog.records
+        if record.name == 'ecommerce.product.middleware'
+    ]
+    assert len(records) == 1
+    return records[0]
+
+
+class TestSQLProfilerMiddleware:
+    def test_headers(self, profiler, product_factory, api_client):
+        product_factory(slug='product-1', is_active=True)
+
+        response = api_client().get('/api/product/product-1/')
+
+        num_queries = int(response['X-DB-Queries'])
+        assert num_queries > 0
+        assert response['Server-Timing'].startswith('db;dur=')
+        assert response['Server-Timing'].endswith(f'desc="{num_queries} queries"')
+        assert not response.has_header('X-DB-Query-Budget-Exceeded')
+
+    def test_log_line(self, profiler, category_factory, api_client, caplog):
+        category_factory(is_active=True)
+
+        with caplog.at_level(logging.INFO, logger='ecommerce.product.middleware'):
+            response = api_client().get('/api/category/')
+
+        record = get_log_record(caplog)
+        data = json.loads(record.getMessage())
+        assert record.levelno == logging.INFO
+        assert data['path'] == '/api/category/'
+        assert data['status'] == 200
+        assert data['queries'] == int(response['X-DB-Queries'])
+        assert len(data['slowest']) <= 2
+        assert data['over_budget'] is False
+
+    def test_over_budget_duplicates(self, profiler, category_factory, caplog):
+        categories = category_factory.create_batch(6)
+
+        @profile_queries
+        def view(request):
+            # N+1 shaped: the same statement for every category
+            return JsonResponse(
+                {
+                    'names': [
+                        Category.objects.get(pk=category.pk).name
+                        for category in categories
+                    ]
+                }
+            )
+
+        with caplog.at_level(logging.INFO, logger='ecommerce.product.middleware'):
+            response = view(RequestFactory().get('/'))
+
+        assert response['X-DB-Queries'] == '6'
+        assert response['X-DB-Query-Budget-Exceeded'] == 'true'
+        record = get_log_record(caplog)
+        data = json.loads(record.getMessage())
+        assert record.levelno == logging.WARNING
+        assert data['over_budget'] is True
+        assert len(data['duplicates']) == 1
+        assert data['duplicates'][0]['count'] == 6
+        assert '%s' in data['duplicates'][0]['sql']
+
+    def test_verbose(self, profiler, category_factory, caplog):
+        profiler['VERBOSE'] = True
+        category_factory()
+
+        @profile_queries
+        def view(request):
+            return JsonResponse({'count': Category.objects.count()})
+
+        with caplog.at_level(logging.DEBUG, logger='ecommerce.product.middleware'):
+            view(RequestFactory().get('/'))
+
+        assert 'Number of queries: 1' in caplog.records[-1].getMessage()
+
+    def test_disabled_by_default(self, category_factory, api_client):
+        response = api_client().get('/api/category/')
+
+        assert not response.has_header('X-DB-Queries')
+
+
+class TestReplicaPinningMiddleware:
+    def test_asgi_chain_stays_async(self):
+        handler = ASGIHandler()
+        chain = handler._middleware_chain
+        # every middleware calls the next one without a thread adapter
+        while hasattr(chain, 'get_response'):
+            assert not isinstance(chain, (AsyncToSync, SyncToAsync)), chain
+            chain = chain.get_response
+
+        # convert_exception_to_response() wraps every step
+        assert chain.__wrapped__ == handler._get_response_async
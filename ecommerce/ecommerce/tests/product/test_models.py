@@ -5,6 +5,8 @@ from django.db.utils import DataError
 from django.core.exceptions import ValidationError
 from django.db.models.deletion import ProtectedError
 from django.db.utils import IntegrityError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from ecommerce.product.models import (
     Category,
@@ -647,3 +649,242 @@ class TestProductLineAttributeValue:
         assert (
             str_tested == str_expected
         ), f"Expected: '{str_expected}', but got: '{str_tested}'"
+
+
+@pytest.mark.django_db
+class TestBulkCreateOrdered:
+    def build_product_lines(self, products, product_type, lines_per_product):
+        return [
+            ProductLine(
+                product_id=product,
+                product_type_id=product_type,
+                price=Decimal('123.465'),
+                weight=Decimal('1.0005'),
+                slug=f'{product.slug}-line-{n}',
+                sku=f'{product.pid}-{n}',
+            )
+            for product in products
+            for n in range(lines_per_product)
+        ]
+
+    def test_product_lines_display_order(
+        self, product_factory, product_type_factory, product_line_factory
+    ):
+        product_type = product_type_factory()
+        product_1 = product_factory()
+        product_2 = product_factory()
+        # continue after the existing lines
+        product_line_factory(product_id=product_1, display_order=4)
+
+        ProductLine.objects.bulk_create_ordered(
+            self.build_product_lines([product_1, product_2], product_type, 3)
+        )
+
+        assert list(
+            product_1.product_line.order_by('display_order').values_list(
+                'display_order', flat=True
+            )
+        ) == [4, 5, 6, 7]
+        assert list(
+            product_2.product_line.order_by('display_order').values_list(
+                'display_order', flat=True
+            )
+        ) == [1, 2, 3]
+
+        # save() keeps allocating after the bulk created lines
+        assert (
+            product_line_factory(product_id=product_2, display_order=None).display_order
+            == 4
+        )
+
+    def test_product_lines_rounding(self, product_factory, product_type_factory):
+        product_lines = ProductLine.objects.bulk_create_ordered(
+            self.build_product_lines([product_factory()], product_type_factory(), 1)
+        )
+
+        # half-up as in ProductLine.save(), the database would round half-even
+        product_line = ProductLine.objects.get(pk=product_lines[0].pk)
+        assert product_line.price == Decimal('123.47')
+        assert product_line.weight == Decimal('1.001')
+
+    def test_manual_display_order(self, product_factory, product_type_factory):
+        product = product_factory()
+        product_lines = self.build_product_lines([product], product_type_factory(), 3)
+        product_lines[1].display_order = 10
+
+        ProductLine.objects.bulk_create_ordered(product_lines)
+
+        assert [obj.display_order for obj in product_lines] == [11, 10, 12]
+
+    def test_queries_do_not_grow_with_rows(self, product_factory, product_type_factory):
+        product_type = product_type_factory()
+
+        def count_queries(num_products, lines_per_product):
+            products = product_factory.create_batch(num_products)
+            with CaptureQueriesContext(connection) as context:
+                ProductLine.objects.bulk_create_ordered(
+                    self.build_product_lines(products, product_type, lines_per_product)
+                )
+            return len(context.captured_queries)
+
+        assert count_queries(1, 1) == count_queries(20, 10)
+
+    def test_product_images_display_order(
+        self, product_line_factory, product_image_factory
+    ):
+        product_line_1 = product_line_factory()
+        product_line_2 = product_line_factory()
+        product_image_factory(product_line_id=product_line_1, display_order=None)
+
+        images = ProductImage.objects.bulk_create_ordered(
+            ProductImage(product_line_id=product_line)
+            for product_line in [product_line_1, product_line_2, product_line_1]
+        )
+
+        assert [image.display_order for image in images] == [2, 1, 3]
+        assert ProductImage.objects.count() == 4
+
+    def test_duplicate_manual_display_order(self, product_line_factory):
+        product_line = product_line_factory()
+        ProductImage.objects.create(product_line_id=product_line, display_order=1)
+
+        with pytest.raises(IntegrityError):
+            ProductImage.objects.bulk_create_ordered(
+                [ProductImage(product_line_id=product_line, display_order=1)]
+            )
+
+
+@pytest.mark.django_db
+class TestProductLineAttributeValueBulkAttach:
+    @pytest.fixture
+    def color(self, attribute_factory):
+        return attribute_factory(name='Color')
+
+    @pytest.fixture
+    def product_type(self, product_type_factory, color):
+        return product_type_factory(type_name='Shirt', attributes=[color])
+
+    def test_attach(
+        self, product_line_factory, attribute_value_factory, product_type, color
+    ):
+        product_lines = product_line_factory.create_batch(
+            3, product_type_id=product_type
+        )
+        red = attribute_value_factory(attribute_id=color, value='Red')
+
+        ProductLineAttributeValue.objects.bulk_attach(
+            [(product_line, red) for product_line in product_lines]
+        )
+
+        assert (
+            ProductLineAttributeValue.objects.filter(attribute_value=red).count() == 3
+        )
+
+    def test_attach_by_primary_keys(
+        self, product_line_factory, attribute_value_factory, product_type, color
+    ):
+        product_line = product_line_factory(product_type_id=product_type)
+        red = attribute_value_factory(attribute_id=color)
+
+        ProductLineAttributeValue.objects.bulk_attach([(product_line.pk, red.pk)])
+
+        assert list(product_line.attributes.all()) == [red]
+
+    def test_not_allowed_attribute(
+        self, product_line_factory, attribute_value_factory, product_type
+    ):
+        product_line = product_line_factory(product_type_id=product_type)
+        size = attribute_value_factory(attribute_id__name='Size')
+
+        with pytest.raises(ValidationError) as exc_info:
+            ProductLineAttributeValue.objects.bulk_attach([(product_line, size)])
+
+        assert exc_info.value.messages == [
+            "The attribute 'Size' is not allowed for product lines of type 'Shirt'."
+        ]
+        assert not ProductLineAttributeValue.objects.exists()
+
+    def test_existing_duplicate_attribute(
+        self, product_line_factory, attribute_value_factory, product_type, color
+    ):
+        product_line = product_line_factory(product_type_id=product_type)
+        ProductLineAttributeValue.objects.create(
+            product_line=product_line,
+            attribute_value=attribute_value_factory(attribute_id=color),
+        )
+
+        with pytest.raises(ValidationError) as exc_info:
+            ProductLineAttributeValue.objects.bulk_attach(
+                [(product_line, attribute_value_factory(attribute_id=color))]
+            )
+
+        assert exc_info.value.messages == [
+            "The attribute 'Color' already exists for this product line."
+        ]
+
+    def test_duplicate_attribute_in_batch(
+        self, product_line_factory, attribute_value_factory, product_type, color
+    ):
+        product_line = product_line_factory(product_type_id=product_type)
+        red = attribute_value_factory(attribute_id=color)
+        blue = attribute_value_factory(attribute_id=color)
+
+        with pytest.raises(ValidationError) as exc_info:
+            ProductLineAttributeValue.objects.bulk_attach(
+                [(product_line, red), (product_line, blue)]
+            )
+
+        assert exc_info.value.messages == [
+            "The attribute 'Color' already exists for this product line."
+        ]
+        assert not ProductLineAttributeValue.objects.exists()
+
+    def test_unknown_rows(
+        self, product_line_factory, attribute_value_factory, product_type, color
+    ):
+        product_line = product_line_factory(product_type_id=product_type)
+        red = attribute_value_factory(attribute_id=color)
+
+        with pytest.raises(ValidationError) as exc_info:
+            ProductLineAttributeValue.objects.bulk_attach(
+                [(99999, red), (product_line, 99999), (product_line, red)]
+            )
+
+        assert exc_info.value.messages == [
+            "The product line '99999' does not exist.",
+            "The attribute value '99999' does not exist.",
+        ]
+        assert not ProductLineAttributeValue.objects.exists()
+
+    def test_queries_do_not_grow_with_pairs(
+        self,
+        product_line_factory,
+        product_type_factory,
+        attribute_factory,
+        attribute_value_factory,
+    ):
+        def count_queries(num_lines, num_attributes):
+            # unique names, one value per attribute is allowed on a line
+            attributes = [
+                attribute_factory(name=f'attribute-{num_lines}-{n}')
+                for n in range(num_attributes)
+            ]
+            product_type = product_type_factory(attributes=attributes)
+            product_lines = product_line_factory.create_batch(
+                num_lines, product_type_id=product_type
+            )
+            values = [
+                attribute_value_factory(attribute_id=attribute)
+                for attribute in attributes
+            ]
+            with CaptureQueriesContext(connection) as context:
+                ProductLineAttributeValue.objects.bulk_attach(
+                    [
+                        (product_line, value)
+                        for product_line in product_lines
+                        for value in values
+                    ]
+                )
+            return len(context.captured_queries)
+
+        assert count_queries(1, 1) == count_queries(20, 5)
@@ -0,0 +1,131 @@
+import json
+
+import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory
+
+from ecommerce.product import cache
+from ecommerce.product.middleware import ReplicaPinningMiddleware
+from ecommerce.product.models import Category, Product, ProductType
+from ecommerce.product.routers import PIN_COOKIE
+
+pytestmark = [
+    pytest.mark.skipif(
+        'replica' not in settings.DATABASES,
+        reason='run with --ds=ecommerce.settings.replica',
+    ),
+    pytest.mark.django_db(databases=['default', 'replica']),
+]
+
+
+@pytest.fixture
+def product(settings, product_factory):
+    """
+    An active product whose name differs between the primary and the replica.
+    """
+    settings.CATALOGUE_REPLICA_DATABASE = 'replica'
+    product = product_factory(
+        name='primary', slug='product', category_id__is_active=True, is_active=True
+    )
+    # the rows the replication copied before the rename below
+    for model in (Category, ProductType, Product):
+        model.objects.using('replica').bulk_create(model.objects.all())
+    Product.objects.using('replica').filter(pk=product.pk).update(name='replica')
+    return product
+
+
+def write_response(product):
+    def get_response(request):
+        Product.objects.filter(pk=product.pk).update(name='written')
+        return HttpResponse()
+
+    return ReplicaPinningMiddleware(get_response)(RequestFactory().post('/'))
+
+
+class TestReplicaRouting:
+    def test_catalogue_reads_use_replica(self, product, api_client):
+        response = api_client().get('/api/product/product/')
+
+        assert response.data[0]['name'] == 'replica'
+        assert PIN_COOKIE not in response.cookies
+
+    def test_other_reads_use_primary(self, product, api_client):
+        api_client().get('/api/product/product/')
+
+        assert Product.objects.get(pk=product.pk).name == 'primary'
+
+    def test_async_views_read_replica(self, product, async_views):
+        async def get():
+            return await AsyncClient().get('/api/product/product/')
+
+        response = async_to_sync(get)()
+
+        assert response.json()[0]['name'] == 'replica'
+
+    def test_export_reads_replica(self, product, api_client):
+        response = api_client().get('/api/product/export/')
+
+        # streamed after the view returned
+        assert [
+            row['name'] for row in json.loads(b''.join(response.streaming_content))
+        ] == ['replica']
+        assert Product.objects.get(pk=product.pk).name == 'primary'
+
+    def test_async_export_reads_replica(self, product, async_views):
+        async def get():
+            response = await AsyncClient().get('/api/product/export/?output=ndjson')
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        rows = async_to_sync(get)().splitlines()
+
+        assert [json.loads(row)['name'] for row in rows] == ['replica']
+
+    def test_write_pins_client_to_primary(self, product, api_client):
+        response = write_response(product)
+
+        cookie = response.cookies[PIN_COOKIE]
+        assert cookie['max-age'] == settings.CATALOGUE_REPLICA_PIN_SECONDS
+        client = api_client()
+        client.cookies[PIN_COOKIE] = cookie.value
+        assert client.get('/api/product/product/').data[0]['name'] == 'written'
+
+    def test_async_write_pins_client_to_primary(self, product):
+        async def get_response(request):
+            await Product.objects.filter(pk=product.pk).aupdate(name='written')
+            return HttpResponse()
+
+        middleware = ReplicaPinningMiddleware(get_response)
+        assert iscoroutinefunction(middleware)
+
+        response = async_to_sync(middleware)(RequestFactory().post('/'))
+
+        assert PIN_COOKIE in response.cookies
+
+    def test_no_pinning_without_replica(self, product, settings):
+        settings.CATALOGUE_REPLICA_DATABASE = None
+
+        assert PIN_COOKIE not in write_response(product).cookies
+
+    def test_replica_responses_expire_after_pin_window(
+        self, product, api_client, monkeypatch
+    ):
+        timeouts = []
+        set_cache = cache.cache.set
+        monkeypatch.setattr(
+            cache.cache,
+            'set',
+            lambda key, value, timeout: timeouts.append(timeout)
+            or set_cache(key, value, timeout),
+        )
+
+        api_client().get('/api/product/product/')
+        client = api_client()
+        client.cookies[PIN_COOKIE] = '1'
+        client.get('/api/category/')
+
+        assert timeouts == [
+            settings.CATALOGUE_REPLICA_PIN_SECONDS,
+            settings.CATALOGUE_CACHE_TIMEOUT,
+        ]
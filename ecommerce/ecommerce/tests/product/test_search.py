@@ -0,0 +1,158 @@
+import pytest
+from django.core.management import call_command
+from django.db import connection, transaction
+
+from ecommerce.product import search, signals
+from ecommerce.product.models import (
+    ProductLine,
+    ProductSearchTerm,
+    ProductSearchVector,
+)
+
+# the index is updated once the transaction of a save commits
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+@pytest.fixture(params=['postgres', 'inverted-index'])
+def search_backend(request, monkeypatch):
+    if request.param == 'postgres':
+        if connection.vendor != 'postgresql':
+            pytest.skip('full-text search needs PostgreSQL')
+    else:
+        monkeypatch.setattr(search, 'is_postgres', lambda: False)
+    return request.param
+
+
+class TestProductSearch:
+    endpoint = '/api/product/search/'
+
+    def get_slugs(self, api_client, query, **params):
+        response = api_client().get(self.endpoint, {'q': query, **params})
+        assert response.status_code == 200
+        return [product['slug'] for product in response.data]
+
+    def test_name_ranks_before_description(
+        self, search_backend, product_factory, api_client
+    ):
+        product_factory(
+            slug='in-description', description='A lamp for a desk', is_active=True
+        )
+        product_factory(
+            slug='in-name', name='Desk lamp', description='Bright', is_active=True
+        )
+        product_factory(slug='no-match', description='A chair', is_active=True)
+
+        assert self.get_slugs(api_client, 'desk lamp') == ['in-name', 'in-description']
+
+    def test_active_product_line_fields(
+        self, search_backend, product_factory, product_line_factory, api_client
+    ):
+        product = product_factory(slug='with-line', is_active=True)
+        product_line_factory(
+            product_id=product, sku='ZX-991', second_name='Walnut', is_active=True
+        )
+        product_line_factory(product_id=product, second_name='Oak', is_active=False)
+
+        assert self.get_slugs(api_client, 'walnut') == ['with-line']
+        assert self.get_slugs(api_client, 'ZX-991') == ['with-line']
+        assert self.get_slugs(api_client, 'oak') == []
+
+    def test_index_is_updated_on_save(
+        self, search_backend, product_factory, product_line_factory, api_client
+    ):
+        product = product_factory(slug='renamed', name='Old name', is_active=True)
+        product_line = product_line_factory(
+            product_id=product, second_name='Teak', is_active=True
+        )
+        inactive = product_factory(name='Hidden thing', is_active=False)
+
+        product.name = 'Fresh name'
+        product.save()
+        product_line.delete()
+
+        assert self.get_slugs(api_client, 'fresh') == ['renamed']
+        assert self.get_slugs(api_client, 'old') == []
+        assert self.get_slugs(api_client, 'teak') == []
+        assert self.get_slugs(api_client, 'hidden') == []
+        inactive.is_active = True
+        inactive.save()
+        assert self.get_slugs(api_client, 'hidden') == [inactive.slug]
+
+    def test_limit(self, search_backend, product_factory, api_client):
+        product_factory.create_batch(3, description='common word', is_active=True)
+
+        assert len(self.get_slugs(api_client, 'common', page_size=2)) == 2
+
+    def test_rebuild_command(self, search_backend, product_factory, api_client):
+        product = product_factory(name='Reindexed', is_active=True)
+        ProductSearchVector.objects.all().delete()
+        ProductSearchTerm.objects.all().delete()
+
+        call_command('rebuild_search_index', '--batch-size', '1')
+
+        assert self.get_slugs(api_client, 'reindexed') == [product.slug]
+
+    def test_query_is_required(self, api_client):
+        response = api_client().get(self.endpoint, {'q': ' '})
+
+        assert response.status_code == 400
+
+
+class TestSearchSignals:
+    @pytest.fixture
+    def reindexed(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(signals, 'update_search_index', calls.append)
+        return calls
+
+    def test_only_searched_fields_reindex(
+        self, product_factory, product_line_factory, reindexed
+    ):
+        product = product_factory(is_active=True)
+        product_line = product_line_factory(product_id=product, is_active=True)
+        reindexed.clear()
+
+        product_line.price = 5
+        product_line.save()
+        product.is_digital = True
+        product.save()
+        # the unsaved name is not written with update_fields
+        product.name = 'Renamed'
+        product.save(update_fields=['is_digital'])
+        assert reindexed == []
+
+        product_line.sku = 'NEW-SKU'
+        product_line.save()
+        product.save(update_fields=['name'])
+        assert reindexed == [{product.pk}, {product.pk}]
+
+    def test_reindex_after_commit(self, product_factory, reindexed):
+        product = product_factory(is_active=True)
+        reindexed.clear()
+
+        with transaction.atomic():
+            product.name = 'Renamed'
+            product.save()
+            assert reindexed == []
+
+        assert reindexed == [{product.pk}]
+
+    def test_bulk_create_reindexes_after_commit(
+        self, product_factory, product_line_factory, reindexed
+    ):
+        product = product_factory(is_active=True)
+        reindexed.clear()
+
+        with transaction.atomic():
+            ProductLine.objects.bulk_create_ordered(
+                [
+                    product_line_factory.build(
+                        product_id=product,
+                        product_type_id=product.product_type_id,
+                        display_order=None,
+                    )
+                ]
+            )
+            assert reindexed == []
+
+        assert reindexed == [{product.pk}]
@@ -0,0 +1,115 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.db import connection
+
+from ecommerce.product import stock
+from ecommerce.product.models import ProductLine
+
+
+def get_quantity(sku):
+    return ProductLine.objects.get(sku=sku).quantity
+
+
+@pytest.mark.django_db
+class TestStock:
+    @pytest.fixture(autouse=True)
+    def product_lines(self, product_line_factory):
+        return [
+            product_line_factory(sku=sku, quantity=quantity)
+            for sku, quantity in (('A', 5), ('B', 1), ('C', 0))
+        ]
+
+    def test_reserve_and_release(self):
+        assert stock.reserve('A', 2)
+        assert get_quantity('A') == 3
+        assert stock.release('A', 2)
+        assert get_quantity('A') == 5
+
+    def test_reserve_short_stock(self):
+        assert not stock.reserve('A', 6)
+        assert not stock.reserve('C')
+        assert not stock.reserve('missing')
+        assert not stock.release('missing')
+        assert (get_quantity('A'), get_quantity('C')) == (5, 0)
+
+    def test_reserve_does_not_save(self, django_assert_max_num_queries):
+        # a savepoint and a single UPDATE, no OrderingField.pre_save queries
+        with django_assert_max_num_queries(3):
+            assert stock.reserve('A')
+
+    def test_reserve_many_is_all_or_nothing(self):
+        assert stock.reserve_many({'A': 2, 'B': 2, 'missing': 1}) == ['B', 'missing']
+        assert (get_quantity('A'), get_quantity('B')) == (5, 1)
+
+        # the quantities of a repeated sku are added up
+        assert stock.reserve_many([('A', 2), ('B', 1), ('A', 3)]) == []
+        assert (get_quantity('A'), get_quantity('B')) == (0, 0)
+
+    def test_release_many_returns_unknown_skus(self):
+        assert stock.release_many({'A': 1, 'missing': 1, 'C': 2}) == ['missing']
+        assert (get_quantity('A'), get_quantity('C')) == (6, 2)
+
+    @pytest.mark.parametrize('quantity', [0, -1, 1.5, True])
+    def test_invalid_quantity(self, quantity):
+        with pytest.raises((TypeError, ValueError)):
+            stock.reserve('A', quantity)
+
+    def test_product_endpoint_is_invalidated(
+        self, product_lines, api_client, django_capture_on_commit_callbacks
+    ):
+        product = product_lines[0].product_id
+        product.is_active = True
+        product.category_id.is_active = True
+        product.category_id.save()
+        product.save()
+        ProductLine.objects.filter(sku='A').update(is_active=True)
+        url = f'/api/product/{product.slug}/'
+        assert api_client().get(url).json()[0]['product_line'][0]['quantity'] == 5
+
+        with django_capture_on_commit_callbacks(execute=True):
+            stock.reserve('A', 2)
+
+        assert api_client().get(url).json()[0]['product_line'][0]['quantity'] == 3
+
+
+@pytest.mark.django_db(transaction=True)
+class TestStockConcurrency:
+    THREADS = 8
+
+    def run_concurrently(self, function, args):
+        def worker(arg):
+            try:
+                return function(arg)
+            finally:
+                # every thread opens its own database connection
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.THREADS) as executor:
+            return list(executor.map(worker, args))
+
+    def test_stock_is_never_oversold(self, product_line_factory):
+        product_line_factory(sku='A', quantity=50)
+
+        reserved = self.run_concurrently(lambda n: stock.reserve('A'), range(200))
+
+        assert reserved.count(True) == 50
+        assert get_quantity('A') == 0
+
+    def test_concurrent_batches(self, product_line_factory):
+        product_line_factory(sku='A', quantity=30)
+        product_line_factory(sku='B', quantity=60)
+
+        # the skus of a batch in both orders, and releases of some reservations
+        def reserve_and_release(n):
+            items = [('A', 1), ('B', 2)] if n % 2 else [('B', 2), ('A', 1)]
+            failed = stock.reserve_many(items)
+            if not failed and n % 3 == 0:
+                assert stock.release_many(items) == []
+                return 0
+            return 0 if failed else 1
+
+        kept = sum(self.run_concurrently(reserve_and_release, range(200)))
+
+        assert 0 < kept <= 30
+        assert (get_quantity('A'), get_quantity('B')) == (30 - kept, 60 - 2 * kept)
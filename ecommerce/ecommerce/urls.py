@@ -1,15 +1,26 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
-from .product import views
+from .product import async_views, views
 
 
+if settings.CATALOGUE_ASYNC_VIEWS:
+    # coroutine handlers for ASGI deployments, see product/async_views.py
+    category_viewset = async_views.AsyncCategoryViewSet
+    product_viewset = async_views.AsyncProductViewSet
+    product_line_viewset = async_views.AsyncProductLineViewSet
+else:
+    category_viewset = views.CategoryViewSet
+    product_viewset = views.ProductViewSet
+    product_line_viewset = views.ProductLineViewSet
+
 router = DefaultRouter()
-router.register(r'category', views.CategoryViewSet, basename='category')
-router.register(r'product', views.ProductViewSet, basename='product')
-router.register(r'product-line', views.ProductLineViewSet, basename='product_line')
+router.register(r'category', category_viewset, basename='category')
+router.register(r'product', product_viewset, basename='product')
+router.register(r'product-line', product_line_viewset, basename='product_line')
 
 urlpatterns = [
     path('admin/', admin.site.urls),